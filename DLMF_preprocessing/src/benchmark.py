@@ -0,0 +1,98 @@
+"""Times the preprocessing steps on chapters of growing size, to see whether their time grows linearly with the length of the chapter."""
+
+import math
+import sys
+import time
+
+import math_mode
+import prepare_annotations
+from utilities import readin
+
+# Steps that can be timed, each taking the text of a chapter.
+STEPS = {"math_mode": math_mode.find_math_ranges,
+         "prepare_annotations": prepare_annotations.prepare_annotations}
+
+
+def chapter(sample, size):
+    # type: (str, int) -> str
+    """
+    Builds a chapter of at least a given size out of copies of a sample.
+    :param sample: The text of the sample, such as a DLMF section.
+    :param size: The least number of characters of the chapter.
+    :return: The text of the chapter.
+    """
+    return sample * max(1, -(-size // len(sample)))
+
+
+def time_step(step, text, repeat=3):
+    # type: (function, str, int) -> float
+    """
+    Times a step on a text.
+    :param step: The step to time.
+    :param text: The text to run it on.
+    :param repeat: The number of times it is run.
+    :return: The shortest time it took, in seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        step(text)
+        seconds = time.time() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best
+
+
+def growth_exponent(timings):
+    # type: (list) -> float
+    """
+    Fits the times to a power of the sizes, by least squares on their
+    logarithms: 1 if the step takes linear time, 2 if it takes quadratic time.
+    :param timings: The (size, seconds) of every run.
+    :return: The exponent, or None with fewer than two different sizes.
+    """
+    points = [(math.log(size), math.log(seconds))
+              for size, seconds in timings if seconds > 0]
+    if len(set(x for x, _ in points)) < 2:
+        return None
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / \
+        sum((x - mean_x) ** 2 for x, _ in points)
+
+
+def run(step, sample, sizes, repeat=3):
+    # type: (function, str, list, int) -> tuple
+    """
+    Times a step on chapters of every size.
+    :param step: The step to time.
+    :param sample: The text the chapters are built from.
+    :param sizes: The least number of characters of every chapter.
+    :param repeat: The number of times every chapter is run.
+    :return: The (size, seconds) of every chapter, and the growth exponent.
+    """
+    timings = []
+    for size in sizes:
+        text = chapter(sample, size)
+        timings.append((len(text), time_step(step, text, repeat)))
+    return timings, growth_exponent(timings)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("usage: benchmark.py STEP SAMPLE [SIZE ...]")
+        print("steps: " + ", ".join(sorted(STEPS)))
+        sys.exit(1)
+
+    sizes = [int(size) for size in sys.argv[3:]] or \
+        [1 << 18, 1 << 19, 1 << 20, 1 << 21, 1 << 22]
+    timings, exponent = run(STEPS[sys.argv[1]], readin(sys.argv[2]), sizes)
+    for size, seconds in timings:
+        print("%10d chars %9.3f s" % (size, seconds))
+    if exponent is not None:
+        print("growth exponent: %.2f" % exponent)
+
+
+if __name__ == "__main__":
+    main()
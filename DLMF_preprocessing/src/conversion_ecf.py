@@ -2,12 +2,7 @@ __author__ = "Divya Gandla"
 __status__ = "Development"
 
 import re
-
-# existing file named text.txt
-existing_file = open('test1.txt', 'r').read()
-
-# output written to newText.txt
-newFile = open('newIdentities.txt', 'w')
+import sys
 
 listOfGVars = [
     "Alpha",
@@ -60,40 +55,74 @@ listOfGVars = [
     "omega"]
 
 
+GREEK = re.compile(r"\\\[(" + "|".join(listOfGVars) + r")\]([A-Za-z]?)")
+
+
+def polygamma(argument, convert):
+    """Fills in Polygamma[n, x], which is the digamma function for n = 0."""
+    commaLoc = argument.find(",")
+    if argument[0:1] != "0":
+        return "\\polygamma{" + convert(argument[:commaLoc]) + "}@{" + \
+            convert(argument[commaLoc + 1:]) + "}"
+    return "\\digamma@{" + convert(argument[2:]) + "}"
+
+
+def continuedFractionK(argument, convert):
+    """Fills in ContinuedFractionK[f, {k, 1, Infinity}]."""
+    location = argument.find(",{")
+    if location < 0:
+        location = argument.find(", {")
+    if location < 0:
+        location = len(argument)
+    return "\\ContinuedFractionK{k}{1}{\\infty}@{" + \
+        convert(argument[:location]) + "}"
+
+
+# templates of the functions by head: {0} is the converted argument, and {1}
+# is "@@" if the argument is a single character and "@" otherwise; functions
+# are given the argument and the conversion to fill in themselves
+TEMPLATES = {
+    "Inactive": "{0}",
+    "Sqrt": "\\sqrt{{{0}}}",
+    "Abs": "\\Abs@{{{0}}}",
+    "Polygamma": polygamma,
+    "ContinuedFractionK": continuedFractionK,
+    "Cos": "\\cos{1}{{{0}}}",
+    "Sin": "\\sin{1}{{{0}}}",
+    "Tan": "\\tan{1}{{{0}}}",
+    "Csc": "\\csc{1}{{{0}}}",
+    "Sec": "\\sec{1}{{{0}}}",
+    "Cot": "\\cot{1}{{{0}}}",
+    "Cosh": "\\cosh{1}{{{0}}}",
+    "Sinh": "\\sinh{1}{{{0}}}",
+    "Tanh": "\\tanh{1}{{{0}}}",
+    "Csch": "\\csch{1}{{{0}}}",
+    "Sech": "\\sech{1}{{{0}}}",
+    "Coth": "\\coth{1}{{{0}}}",
+    "ArcCos": "\\acos{1}{{{0}}}",
+    "ArcSin": "\\asin{1}{{{0}}}",
+    "ArcTan": "\\atan{1}{{{0}}}",
+    "ArcCsc": "\\acsc{1}{{{0}}}",
+    "ArcSec": "\\asec{1}{{{0}}}",
+    "ArcCot": "\\acot{1}{{{0}}}",
+}
+# calls, with the head in group 1 if it is Inactive[head][...]
+HEADS = re.compile(r"(?:Inactive\[({0})\]|({0}))\[".format("|".join(
+    sorted(TEMPLATES, key=len, reverse=True))))
+BRACKETS = re.compile(r"[\[\]]")
+
+
 def replaceGreekVars(s):
-    newFile = s
-    for gvar in listOfGVars:
-        # original ex: \[Delta]
-        oldGVar = "\[" + gvar + "]"
-
-        # replacement ex: \delta
-        newGVar = chr(92) + gvar.lower()
-        newFile = (newFile.replace(oldGVar, newGVar))
-
-        # adds a space after the replacement of the greek letter if it's
-        # followed by A-Z or a-z
-        for i in range(len(newFile)):
-            if newFile[i:i + len(newGVar)] == newGVar:
-                if ord(
-                    newFile[
-                        i +
-                        len(newGVar): i +
-                        len(newGVar) +
-                        1]) >= 65 and ord(
-                    newFile[
-                        i +
-                        len(newGVar): i +
-                        len(newGVar) +
-                        1]) <= 90:
-                    newFile = (newFile.replace(newGVar, newGVar + " "))
-                elif ord(newFile[i + len(newGVar): i + len(newGVar) + 1]) >= 97 and ord(
-                        newFile[i + len(newGVar): i + len(newGVar) + 1]) <= 122:
-                    newFile = newFile.replace(newGVar, newGVar + " ")
-
-        # special case: replace "pi" with "\cpi" <-- circular pi
-        newFile = newFile.replace("Pi", "\cpi")
+    """Replaces the greek letters with their macros, and Pi with \\cpi."""
+    def greek(match):
+        letter = "\\" + match.group(1).lower()
+        # adds a space after the greek letter if it's followed by A-Z or a-z
+        if match.group(2):
+            letter += " " + match.group(2)
+        return letter
 
-    return newFile
+    # special case: replace "pi" with "\cpi" <-- circular pi
+    return GREEK.sub(greek, s).replace("Pi", "\\cpi")
 
 
 def findArgs(s, functionName):
@@ -134,242 +163,46 @@ def findArgs(s, functionName):
     return newReplacings
 
 
-def replaceSqrt(s):
-    arguments = findArgs(s, "Sqrt")
-    for i in arguments:
-        s = s.replace("Sqrt" + i, "\\sqrt{" + i[1:-1] + "}")
-    return (s)
-
-
-def replacePolygamma(s):
-    arguments = findArgs(s, "Polygamma")
-    for i in arguments:
-        commaLoc = i.find(',')
-        if i[1:2] != "0":
-            s = s.replace("Polygamma" +
-                          i, "\\polygamma{" +
-                          i[1:commaLoc] +
-                          "}@{" +
-                          i[commaLoc + 1:-1] +
-                          "}")
-        elif i[1:2] == "0":
-            s = s.replace("Polygamma" + i,
-                          "\\digamma@{" + i[3:-1] + "}")
-    return s
-
-
-def removeInactive(s):
-    arguments = findArgs(s, "Inactive")
-    for i in arguments:
-        s = s.replace("Inactive" + i, i[1:-1])
-    return s
-
-
-def replaceCos(s):
-    arguments = findArgs(s, "Cos")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Cos" + i, "\\cos@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Cos" + i, "\\cos@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceSin(s):
-    arguments = findArgs(s, "Sin")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Sin" + i, "\\sin@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Sin" + i, "\\sin@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceTan(s):
-    arguments = findArgs(s, "Tan")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Tan" + i, "\\tan@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Tan" + i, "\\tan@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceCsc(s):
-    arguments = findArgs(s, "Csc")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Csc" + i, "\\csc@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Csc" + i, "\\csc@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceSec(s):
-    arguments = findArgs(s, "Sec")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Sec" + i, "\\sec@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Sec" + i, "\\sec@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceCot(s):
-    arguments = findArgs(s, "Cot")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Cot" + i, "\\cot@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Cot" + i, "\\cot@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceCosh(s):
-    arguments = findArgs(s, "Cosh")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Cosh" + i, "\\cosh@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Cosh" + i, "\\cosh@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceSinh(s):
-    arguments = findArgs(s, "Sinh")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Sinh" + i, "\\sinh@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Sinh" + i, "\\sinh@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceTanh(s):
-    arguments = findArgs(s, "Tanh")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Tanh" + i, "\\tanh@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Tanh" + i, "\\tanh@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceCsch(s):
-    arguments = findArgs(s, "Csch")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Csch" + i, "\\csch@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Csch" + i, "\\csch@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceSech(s):
-    arguments = findArgs(s, "Sech")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Sech" + i, "\\sech@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Sech" + i, "\\sech@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceCoth(s):
-    arguments = findArgs(s, "Coth")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("Coth" + i, "\\coth@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("Coth" + i, "\\coth@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceArcCos(s):
-    arguments = findArgs(s, "ArcCos")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("ArcCos" + i, "\\acos@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("ArcCos" + i, "\\acos@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceArcSin(s):
-    arguments = findArgs(s, "ArcSin")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("ArcSin" + i, "\\asin@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("ArcSin" + i, "\\asin@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceArcTan(s):
-    arguments = findArgs(s, "ArcTan")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("ArcTan" + i, "\\atan@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("ArcTan" + i, "\\atan@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceArcCsc(s):
-    arguments = findArgs(s, "ArcCsc")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("ArcCsc" + i, "\\acsc@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("ArcCsc" + i, "\\acsc@{" + i[1:-1] + "}")
-    return s
-
-
-def replaceArcSec(s):
-    arguments = findArgs(s, "ArcSec")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("ArcSec" + i, "\\asec@@{" + i[1:-1] + "}")
+def replaceCalls(s):
+    """Replaces the calls of the functions in TEMPLATES, in one scan.
+
+    :param s: Mathematica text
+    :returns: the text, with the calls and the calls in their arguments filled
+    in
+    """
+    pieces = []
+    position = 0
+    match = HEADS.search(s)
+    while match:
+        # finds the ] that closes the call
+        depth = 0
+        for bracket in BRACKETS.finditer(s, match.end() - 1):
+            depth += 1 if bracket.group() == "[" else -1
+            if depth == 0:
+                break
+        if depth:
+            # calls that are never closed are left as they are, and the calls
+            # in them are still filled in
+            match = HEADS.search(s, match.end())
+            continue
+
+        argument = s[match.end():bracket.start()]
+        template = TEMPLATES[match.group(1) or match.group(2)]
+        pieces.append(s[position:match.start()])
+        if callable(template):
+            pieces.append(template(argument, replaceCalls))
         else:
-            s = s.replace("ArcSec" + i, "\\asec@{" + i[1:-1] + "}")
-    return s
+            pieces.append(template.format(replaceCalls(argument),
+                                          "@@" if len(argument) == 1 else "@"))
+        position = bracket.end()
+        match = HEADS.search(s, position)
 
-
-def replaceArcCot(s):
-    arguments = findArgs(s, "ArcCot")
-    for i in arguments:
-        if len(i) == 3:
-            s = s.replace("ArcCot" + i, "\\acot@@{" + i[1:-1] + "}")
-        else:
-            s = s.replace("ArcCot" + i, "\\acot@{" + i[1:-1] + "}")
-    return s
+    pieces.append(s[position:])
+    return "".join(pieces)
 
 
 def replaceInfinity(s):
-    recurse = s.find("Infinity")
-    while recurse >= 0:
-        s = s.replace("Infinity", "\infty")
-        recurse = s.find("Infinity")
-    return s
-
-
-def ContinuedFractionK(s):
-    arguments = findArgs(s, "ContinuedFractionK")
-    for i in arguments:
-        location = i.find(",{")
-        if location < 0:
-            location = i.find(", {")
-        var = i[1:location]
-        s = s.replace("ContinuedFractionK" + i,
-                      "\ContinuedFractionK{k}{1}{\infty}@{" + var + "}")
-    return s
-
-
-def replaceAbs(s):
-    arguments = findArgs(s, "Abs")
-    for i in arguments:
-        s = s.replace("Abs" + i, "\Abs@{" + i[1:len(i) - 1] + "}")
-    return s
+    return s.replace("Infinity", "\\infty")
 
 
 def comparativeRelators(s):
@@ -566,40 +399,45 @@ def equationSetUp(s):
     return (newFile + "\\end {equation} \n\n")
 
 
-existing_file = removeInactive(existing_file)
-existing_file = replaceGreekVars(existing_file)
-existing_file = replaceSqrt(existing_file)
-existing_file = replacePolygamma(existing_file)
-existing_file = replaceCos(existing_file)
-existing_file = replaceSin(existing_file)
-existing_file = replaceTan(existing_file)
-existing_file = replaceCsc(existing_file)
-existing_file = replaceSec(existing_file)
-existing_file = replaceCot(existing_file)
-existing_file = replaceArcCos(existing_file)
-existing_file = replaceArcSin(existing_file)
-existing_file = replaceArcTan(existing_file)
-existing_file = replaceArcCsc(existing_file)
-existing_file = replaceArcSec(existing_file)
-existing_file = replaceArcCot(existing_file)
-existing_file = replaceCosh(existing_file)
-existing_file = replaceSinh(existing_file)
-existing_file = replaceTanh(existing_file)
-existing_file = replaceCsch(existing_file)
-existing_file = replaceSech(existing_file)
-existing_file = replaceCoth(existing_file)
-existing_file = replaceInfinity(existing_file)
-existing_file = ContinuedFractionK(existing_file)
-existing_file = replaceAbs(existing_file)
-existing_file = comparativeRelators(existing_file)
-
-count = 0
-position = 0
-yorn = False
-for index in range(len(existing_file)):
-    if existing_file[index: index + 2] == "(*":
-        count = index
-        position = existing_file.find("\n", index)
-        position = existing_file.find("\n", position + 1)
-        newFile.write(equationSetUp(existing_file[index: position]).replace("*", " "))
-newFile.close()
+def convert(s):
+    """Converts the greek letters, the calls of the functions in TEMPLATES,
+    Infinity and the comparative relators of Mathematica text to LaTeX."""
+    return comparativeRelators(replaceInfinity(replaceCalls(
+        replaceGreekVars(s))))
+
+
+def identities(lines):
+    """Converts an export one identity at a time: every (* tag with the line
+    after it.
+
+    :param lines: lines of the export, such as an open file
+    :returns: generator of the equations
+    """
+    lines = iter(lines)
+    line = next(lines, None)
+    while line is not None:
+        following = next(lines, None)
+        index = line.find("(*")
+        while index >= 0:
+            block = line[index:].rstrip("\n") + "\n" + \
+                (following or "").rstrip("\n")
+            yield equationSetUp(convert(block)).replace("*", " ")
+            index = line.find("(*", index + 2)
+        line = following
+
+
+def main():
+    if len(sys.argv) != 3:
+        fname = "test1.txt"
+        ofname = "newIdentities.txt"
+    else:
+        fname = sys.argv[1]
+        ofname = sys.argv[2]
+
+    with open(fname) as existing_file, open(ofname, "w") as newFile:
+        for equation in identities(existing_file):
+            newFile.write(equation)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import bisect
 import math_mode
 import re
 
@@ -9,27 +10,67 @@ def math_string(in_file):
     except:
         math_str = in_file
     output = []
-    ranges = math_mode.find_math_ranges(math_str)
+    ranges = math_mode.math_range_index(math_str)
     for i in ranges:
         new = math_str[i[0]:i[1]]
         output.append(new)
     return output
 
 
+class OffsetMap(object):
+    # Maps offsets in a document to offsets in the document after a batch of edits
+
+    def __init__(self, edits):
+        # edits: the (start, end) of every edited range and the length of its replacement, in order
+        self._starts = []
+        self._edits = []
+        shift = 0
+        for (start, end), length in edits:
+            self._starts.append(start)
+            self._edits.append((end, start + shift, start + shift + length))
+            shift += start + length - end
+        self.shift = shift
+
+    def translate(self, offset):
+        # Offsets in an edited range map to the start of its replacement, and the others move with the text around them
+        i = bisect.bisect_right(self._starts, offset) - 1
+        if i < 0:
+            return offset
+        end, new_start, new_end = self._edits[i]
+        if offset < end:
+            return new_start
+        return offset - end + new_end
+
+
+def apply_edits(string, edits):
+    # Replaces ranges of a string with new text in one pass; edits are ((start, end), replacement) pairs that
+    # may not overlap. Returns the edited string and an OffsetMap from old offsets to new ones
+    edits = sorted(edits, key=lambda edit: edit[0])
+    pieces = []
+    last = 0
+    for (start, end), replacement in edits:
+        if start < last or end < start:
+            raise ValueError("overlapping edit at ({0}, {1})".format(start, end))
+        pieces.append(string[last:start])
+        pieces.append(replacement)
+        last = end
+    pieces.append(string[last:])
+    return "".join(pieces), OffsetMap(((start, end), len(replacement)) for (start, end), replacement in edits)
+
+
 def change_original(o_file, changed_math_string_list):
     # Places changed string from math mode back into place in the original function
     try:
         o_string = open(o_file).read()
     except:
         o_string = o_file
-    math_ranges = math_mode.find_math_ranges(o_string)
-    num = 0
-    edited = o_string
-    # print math_ranges
-    for i in math_ranges[::-1]:
-        edited = edited[:i[0]] + changed_math_string_list[::-1][num] + edited[i[1]:]
-        num += 1
-    return edited
+    math_ranges = math_mode.math_range_index(o_string)
+    if len(math_ranges) != len(changed_math_string_list):
+        raise ValueError("{0} math mode ranges but {1} changed strings".format(len(math_ranges),
+                                                                              len(changed_math_string_list)))
+    # the last ranges and strings are paired up, like they were when the ranges were replaced from the end
+    edits = zip(math_ranges[::-1], changed_math_string_list[::-1])
+    return apply_edits(o_string, edits)[0]
 
 
 def formatting(file_str):
@@ -41,7 +82,7 @@ def formatting(file_str):
     in_ind = False
     previous = ""
 
-    ranges = math_mode.find_math_ranges(file_str)
+    ranges = math_mode.math_range_index(file_str)
 
     lines = file_str.split('\n')
     in_eq = False
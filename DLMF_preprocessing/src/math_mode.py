@@ -1,6 +1,11 @@
 __author__ = "Jagan Prem"
 __status__ = "Production"
 
+import bisect
+import collections
+import hashlib
+import re
+
 # Dictionary containing math mode delimiters and their respective endpoints.
 MATH_START = {"\\[": "\\]",
               "\\(": "\\)",
@@ -19,6 +24,31 @@ MATH_END = ["\\hbox{",
             "\\text{",
             "\\label{"]
 
+# Escaped delimiters, which are skipped over.
+ESCAPES = ["\\$", "\\\\]", "\\\\)", "\\\\(", "\\\\[", "\\%"]
+
+
+def _tokens(*groups):
+    # type: (*list) -> re.RegexObject
+    """
+    Compiles a pattern matching the escapes, comments, and given delimiters.
+    :param groups: Lists of delimiters, the longest of which match first.
+    :return: The compiled pattern.
+    """
+    delims = sorted(set(sum(groups, [])), key=len, reverse=True)
+    return re.compile("(?P<escape>" + "|".join(map(re.escape, ESCAPES)) +
+                      ")|%|" + "|".join(map(re.escape, delims)))
+
+
+# Patterns of the delimiters that matter in text and in math mode.
+TEXT_TOKENS = _tokens(list(MATH_START), ["{", "}"])
+MATH_TOKENS = _tokens(MATH_END, list(MATH_START.values()))
+EXIT = re.compile("|".join(map(re.escape, MATH_END)))
+
+# Number of documents whose indexes are kept by math_range_index.
+INDEX_CACHE_SIZE = 16
+_indexes = collections.OrderedDict()
+
 
 def find_first(string, delim, start=0):
     # type: (str, str, int) -> int
@@ -93,12 +123,96 @@ def skip_escaped(string, loop=True):
             s = skip_escaped(string, False)
         return index
     else:
-        for escape in ["\\$", "\\\\]", "\\\\)", "\\\\(", "\\\\[", "\\%"]:
+        for escape in ESCAPES:
             if string.startswith(escape):
                 return len(escape)
         return 0
 
 
+def _comment_end(string, i):
+    # type: (str, int) -> int
+    """
+    Finds the end of a comment.
+    :param string: The string to search within.
+    :param i: The index of the %.
+    :return: The index after the end of the line, or -1 if there is none.
+    """
+    i = string.find("\n", i)
+    return i if i == -1 else i + 1
+
+
+def _scan_math(string, i, delim, ranges):
+    # type: (str, int, str, list) -> int
+    """
+    Finds the ranges of the math mode segment starting at an index.
+    :param string: The string to parse.
+    :param i: The index of the math mode delimiter.
+    :param delim: The math mode delimiter.
+    :param ranges: The ranges of all math mode segments.
+    :return: The index after the end of the segment.
+    """
+    end = MATH_START[delim]
+    i += len(delim)
+    begin = i
+    while True:
+        match = MATH_TOKENS.search(string, i)
+        if match is None:
+            raise SyntaxError("missing " + end)
+        i = match.start()
+        if match.group("escape"):
+            i = match.end()
+        elif match.group() == "%":
+            i = _comment_end(string, i)
+            if i == -1:
+                raise SyntaxError("missing " + end)
+        elif match.group() in MATH_END:
+            if begin != i:
+                ranges.append((begin, i))
+            i = _scan_text(string, match.end(), True, ranges)
+            begin = i
+        elif string.startswith(end, i):
+            if begin != i:
+                ranges.append((begin, i))
+            return i + len(end)
+        else:
+            i += 1
+
+
+def _scan_text(string, i, closed, ranges):
+    # type: (str, int, bool, list) -> int
+    """
+    Finds the ranges of math mode within a text mode segment starting at an
+    index.
+    :param string: The string to parse.
+    :param i: The index after the text mode delimiter, if any.
+    :param closed: Whether the segment ends at an unmatched }.
+    :param ranges: The ranges of all math mode segments.
+    :return: The index after the end of the segment.
+    """
+    level = 0
+    while True:
+        match = TEXT_TOKENS.search(string, i)
+        if match is None:
+            break
+        i = match.start()
+        if match.group("escape"):
+            i = match.end()
+        elif match.group() == "%":
+            i = _comment_end(string, i)
+            if i == -1:
+                break
+        elif match.group() in MATH_START:
+            i = _scan_math(string, i, match.group(), ranges)
+        elif match.group() == "}" and level == 0 and closed:
+            return i + 1
+        else:
+            level += 1 if match.group() == "{" else -1
+            i += 1
+    if not closed and level == 0:
+        return len(string)
+    raise SyntaxError("missing end bracket")
+
+
 def parse_math(string, start, ranges):
     # type: (str) -> str, int
     """
@@ -108,31 +222,10 @@ def parse_math(string, start, ranges):
     :param ranges: The ranges of all math mode segments.
     :return i: The length of the math mode segment.
     """
-    delim = first_delim(string)
-    i = len(delim)
-    begin = start + i
-    commented = False
-    while i < len(string):
-        if not commented:
-            i += skip_escaped(string[i:])
-            sub = string[i:]
-            if sub[0] == "%":
-                commented = True
-            else:
-                if does_exit(sub):
-                    if begin != start + i:
-                        ranges.append((begin, start + i))
-                    i += parse_non_math(sub, start + i, ranges)
-                    begin = start + i
-                    i -= 1
-                if sub.startswith(MATH_START[delim]):
-                    if begin != start + i:
-                        ranges.append((begin, start + i))
-                    return i + len(MATH_START[delim]) - 1
-        elif string[i] == "\n":
-            commented = False
-        i += 1
-    raise SyntaxError("missing " + MATH_START[delim])
+    found = []
+    i = _scan_math(string, 0, first_delim(string), found)
+    ranges.extend((begin + start, end + start) for begin, end in found)
+    return i - 1
 
 
 def parse_non_math(string, start, ranges):
@@ -147,33 +240,10 @@ def parse_non_math(string, start, ranges):
     delim = first_delim(string, False)
     if not string.startswith(delim):
         delim = ""
-    level = 0
-    i = len(delim)
-    commented = False
-    while i < len(string):
-        if not commented:
-            i += skip_escaped(string[i:])
-            if i >= len(string):
-                break
-            sub = string[i:]
-            if sub[0] == "%":
-                commented = True
-            elif does_enter(sub):
-                i += parse_math(sub, start + i, ranges)
-            elif sub[0] == "{":
-                level += 1
-            elif sub[0] == "}":
-                if level == 0 and delim != "":
-                    i += 1
-                    return i
-                else:
-                    level -= 1
-        elif string[i] == "\n":
-            commented = False
-        i += 1
-    if delim == "" and level == 0:
-        return i
-    raise SyntaxError("missing end bracket")
+    found = []
+    i = _scan_text(string, len(delim), delim != "", found)
+    ranges.extend((begin + start, end + start) for begin, end in found)
+    return i
 
 
 def find_math_ranges(string):
@@ -184,5 +254,73 @@ def find_math_ranges(string):
     :return: A list of tuples denoting math mode ranges.
     """
     ranges = []
-    parse_non_math(string, 0, ranges)
-    return ranges[:]
+    delim = EXIT.match(string)
+    _scan_text(string, delim.end() if delim else 0, delim is not None, ranges)
+    return ranges
+
+
+class MathRangeIndex(object):
+    """
+    The math mode ranges of a document, sorted and not overlapping, with
+    lookups of offsets and intervals in logarithmic time. Iterating over it
+    gives the ranges like find_math_ranges does.
+    """
+
+    def __init__(self, ranges):
+        # type: (list) -> None
+        """
+        :param ranges: The ranges of math mode, in the order they appear.
+        """
+        self.ranges = tuple(ranges)
+        self._starts = [start for start, _ in self.ranges]
+        self._ends = [end for _, end in self.ranges]
+
+    def __iter__(self):
+        return iter(self.ranges)
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def __getitem__(self, index):
+        return self.ranges[index]
+
+    def in_math(self, offset):
+        # type: (int) -> bool
+        """
+        Returns whether an offset is in math mode.
+        :param offset: The index in the document.
+        :return: Whether a range contains the offset.
+        """
+        i = bisect.bisect_right(self._starts, offset) - 1
+        return i >= 0 and offset < self._ends[i]
+
+    def overlapping(self, start, end):
+        # type: (int, int) -> tuple
+        """
+        Returns the ranges that overlap an interval.
+        :param start: The first index of the interval.
+        :param end: The index after the end of the interval.
+        :return: The ranges sharing at least one index with [start, end).
+        """
+        return self.ranges[bisect.bisect_right(self._ends, start):
+                           bisect.bisect_left(self._starts, end)]
+
+
+def math_range_index(string):
+    # type: (str) -> MathRangeIndex
+    """
+    Returns the index of the math mode ranges of a document, which is shared
+    by every caller with the same content.
+    :param string: The text of the document.
+    :return: The index of its ranges.
+    """
+    data = string if isinstance(string, bytes) else string.encode("utf-8")
+    # offsets into a str and a unicode string with the same text differ
+    key = (type(string), hashlib.sha1(data).hexdigest())
+    index = _indexes.pop(key, None)
+    if index is None:
+        index = MathRangeIndex(find_math_ranges(string))
+        if len(_indexes) >= INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    _indexes[key] = index
+    return index
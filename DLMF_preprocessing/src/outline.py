@@ -0,0 +1,142 @@
+"""Builds the outline of a LaTeX document, its parts, sections and subsections with their offsets, in one scan, so that
+they can be found by title and deleted or replaced together."""
+
+import re
+
+from math_function import apply_edits
+
+# Sectioning commands, by level.
+LEVELS = {"part": 0, "section": 1, "subsection": 2, "subsubsection": 3}
+
+# Headings, with the command and title in groups 1 and 2, and the commands after which nothing belongs to the last
+# heading, with neither.
+HEADING = re.compile(r'\\(?:(' + "|".join(LEVELS) + r')\*?{((?:[^{}]|{[^{}]*})*)}|bibliographystyle{|bibliography{|'
+                     r'end{document})')
+
+
+class OutlineNode(object):
+    """
+    A part, section or subsection of a document.
+
+    kind:     the sectioning command, such as "section"
+    title:    the title in its braces
+    start:    the offset of the heading
+    end:      the offset of the next heading of the same or a higher level, or of the end of the body
+    children: the nodes of the next levels within it
+    """
+
+    def __init__(self, kind, title, start, end=None):
+        self.kind = kind
+        self.title = title
+        self.start = start
+        self.end = end
+        self.children = []
+
+    @property
+    def level(self):
+        return LEVELS.get(self.kind, -1)
+
+    def __iter__(self):
+        # type: () -> iter
+        """
+        Iterates over the node and every node within it, in the order they appear.
+        """
+        yield self
+        for child in self.children:
+            for node in child:
+                yield node
+
+    def __repr__(self):
+        return "OutlineNode({0!r}, {1!r}, {2!r}, {3!r})".format(self.kind, self.title, self.start, self.end)
+
+
+class Outline(object):
+    """
+    The tree of sectioning commands of a document, with edits to make to it in one batch.
+    """
+
+    def __init__(self, content):
+        # type: (str) -> None
+        """
+        :param content: The text of the document.
+        """
+        self.content = content
+        self.root = OutlineNode(None, None, 0, len(content))
+        self._edits = []
+
+        open_nodes = [self.root]
+        for match in HEADING.finditer(content):
+            # leave out headings in comments
+            line = content[content.rfind("\n", 0, match.start()) + 1:match.start()]
+            if re.search(r'(?<!\\)%', line):
+                continue
+
+            level = LEVELS.get(match.group(1), 0)
+            while len(open_nodes) > 1 and open_nodes[-1].level >= level:
+                open_nodes.pop().end = match.start()
+            if match.group(1) is None:
+                continue
+
+            node = OutlineNode(match.group(1), match.group(2).strip(), match.start())
+            open_nodes[-1].children.append(node)
+            open_nodes.append(node)
+
+        for node in open_nodes[1:]:
+            node.end = len(content)
+
+    def __iter__(self):
+        # type: () -> iter
+        """
+        Iterates over the nodes of the document, in the order they appear.
+        """
+        nodes = iter(self.root)
+        next(nodes)
+        return nodes
+
+    def find(self, title, kind=None):
+        # type: (str, str) -> list
+        """
+        Finds the nodes with a title.
+        :param title: The title of the nodes.
+        :param kind: The sectioning command of the nodes, or None for any.
+        :return: The nodes, in the order they appear.
+        """
+        return [node for node in self if node.title == title and kind in (None, node.kind)]
+
+    def delete(self, title, kind=None):
+        # type: (str, str) -> int
+        """
+        Deletes the nodes with a title, with everything within them, when the edits are applied.
+        :param title: The title of the nodes.
+        :param kind: The sectioning command of the nodes, or None for any.
+        :return: The number of nodes found.
+        """
+        return self.replace(title, "", kind)
+
+    def replace(self, title, text, kind=None):
+        # type: (str, str, str) -> int
+        """
+        Replaces the nodes with a title, heading included, with text when the edits are applied.
+        :param title: The title of the nodes.
+        :param text: The text that takes their place.
+        :param kind: The sectioning command of the nodes, or None for any.
+        :return: The number of nodes found.
+        """
+        nodes = self.find(title, kind)
+        self._edits.extend(((node.start, node.end), text) for node in nodes)
+        return len(nodes)
+
+    def apply(self):
+        # type: () -> tuple
+        """
+        Applies the edits together; an edit of a node within another edited node is dropped.
+        :return: The edited text, and the map of its offsets, see math_function.apply_edits.
+        """
+        edits = []
+        for (start, end), text in sorted(self._edits, key=lambda edit: (edit[0][0], -edit[0][1])):
+            if edits and start < edits[-1][0][1]:
+                continue
+            edits.append(((start, end), text))
+        self._edits = []
+        return apply_edits(self.content, edits)
+
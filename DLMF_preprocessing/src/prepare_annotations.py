@@ -38,6 +38,26 @@ BRACE_PAT = re.compile(
 
 MEASURE_PAT = re.compile(r'(\S)\\\\\[0.2cm\]')
 
+EQ_START = r'\begin{equation}'
+EQ_END = r'\end{equation}'
+
+# the comment at the end of an equation block, up to its \end{equation}
+COMMENT_PAT = re.compile(r'\n *%[\w\s\\{}()<>[\]&=@%,.:;|\'~_^$/+-]*\n\Z')
+
+# the codes the special annotations are replaced with
+ANNOTATION_CODES = {
+    "constraint": "C",
+    "substitution": "S",
+    "drmfnote": "NOTE",
+    "drmfname": "NAME",
+    "proof": "PROOF"
+}
+
+# a "~" loses the "{" and then the space after it, and "&" is escaped
+SPECIAL_STR = r'~{? ?|&'
+SPECIAL_PAT = re.compile(SPECIAL_STR)
+CODE_PAT = re.compile(r'\\(' + "|".join(ANNOTATION_CODES) + r'){? ?|' + SPECIAL_STR)
+
 
 def main():
     # get the names of the input and output files
@@ -66,43 +86,89 @@ def prepare_annotations(content):
 
     docstart = content.find(r'\begin{document}')
 
-    eq_comment_pattern = re.compile(
-        r'\\begin{equation}(?P<before>\\label{(?P<eq_label>.*?)}.*?\n^[^%]*$)(?P<comment>\n^ *%[\w\s\\{}()<>[\]&=@%,.:;|\'~_^$/+-]*?\n)\\end{equation}',
-        re.MULTILINE)
+    updated = [SPECIAL_PAT.sub(_replace_code, content[:docstart])]
+    body = content[docstart:]
+
+    # go through the equation blocks once, from left to right, moving the
+    # comments at their ends into flushright blocks
+    last = 0
+    start = body.find(EQ_START)
+
+    while start != -1:
+
+        block = _comment_block(body, start)
 
-    content = content[:docstart] + \
-        eq_comment_pattern.sub(replace_comments, content[docstart:])
+        if block is None:
+            start = body.find(EQ_START, start + 1)
+            continue
 
-    special_annotations = {
-        r'\\constraint': "C",
-        r'\\substitution': "S",
-        r'\\drmfnote': "NOTE",
-        r'\\drmfname': "NAME",
-        r'\\proof': "PROOF"
-    }
+        before, comment, end = block
 
-    # replace the annotations with their "code"
-    for annotation, code in special_annotations.iteritems():
-        content = content[
-            :docstart] + re.sub(annotation, r'{\\bf ' + code + '}:~', content[docstart:])
+        updated.append(CODE_PAT.sub(_replace_code, body[last:start]))
+        updated.append(CODE_PAT.sub(_replace_code, replace_comments(before, comment)))
 
-    content = content.replace("~{", "~")
-    content = content.replace("~ ", "~")
+        last = end
+        start = body.find(EQ_START, last)
+
+    updated.append(CODE_PAT.sub(_replace_code, body[last:]))
+
+    return "".join(updated)
+
+
+# finds the equation block starting at `start` if it ends with a comment
+def _comment_block(body, start):
+    """
+    Finds the parts of the equation block starting at `start`: its lines
+    before the comment at its end, and the comment.
+
+    Returns `before`, `comment` and the end of the block, or None if the
+    block has no comment at its end, or a comment with characters that
+    cannot be moved.
+    """
 
-    content = content.replace("&", r"\&")
+    before = start + len(EQ_START)
+    end = body.find(EQ_END, before)
 
-    return content
+    if end == -1:
+        return None
+
+    # the comment starts on the line with the first % after the first line,
+    # and runs to the end of the block
+    newline = body.find("\n", before, end)
+    percent = body.find("%", newline, end) if newline != -1 else -1
+
+    if percent == -1:
+        return None
+
+    comment_start = body.rfind("\n", newline, percent)
+
+    if body[comment_start + 1:percent].strip(" ") or not COMMENT_PAT.match(body, comment_start, end):
+        return None
+
+    return body[before:comment_start], body[comment_start:end], end + len(EQ_END)
+
+
+# replaces an annotation with its code, or a special character
+def _replace_code(match):
+
+    if match.lastindex:
+        return r'{\bf ' + ANNOTATION_CODES[match.group(1)] + '}:~'
+
+    if match.group() == "&":
+        return r'\&'
+
+    return "~"
 
 
 # moves annotations from inside equation blocks to the end of them and
 # wraps them in a flushright block
-def replace_comments(match):
+def replace_comments(before, comment):
     """
     Processes each equation block that contains comments.
 
-    Given the whole block, it returns the processed block, which has
-    all comments uncommented and placed in a flushright block after
-    the equation block.
+    Given the block's lines before its comment and the comment, it returns
+    the processed block, which has all comments uncommented and placed in a
+    flushright block after the equation block.
 
     Sample:::
 
@@ -121,14 +187,8 @@ def replace_comments(match):
         \\end{flushright}
     """
 
-    before = match.group("before")
-
-    # print("Equation label: {0}".format(match.group("eq_label")))
-
     replacement = r'\begin{equation}' + before
 
-    comment = match.group("comment")
-
     updated = []
     add_measure = False
 
@@ -1,9 +1,15 @@
 """This program begins with an unprocessed LaTeX file and removes parts that are unnecessary for the DLMF."""
 
+import bisect
+import csv
+import json
 import re
 import sys
+import time
+from collections import OrderedDict
 
 import parentheses
+from outline import Outline
 from utilities import (writeout, readin, get_line_lengths,
                        find_line)
 
@@ -18,9 +24,81 @@ EQMIX_END = r'\end{equationmix}'
 
 STD_REGEX = r'.*?###open_(\d+)###.*?###close_0###'
 
+# Removals from the whole document, in the order they are made: (name, pattern, replacement, flags). Rules that don't
+# interact are made together in one pass, see compile_rules.
+CLEANUP_RULES = [
+    ("lxID", r'\\lxID{(.*?)}', r'\1', 0),
+    # removed unecessary information that caused an error with pdflatex
+    ("acknowledgements paragraph", r'\\acknowledgements{.*?}\n\n', r'', re.DOTALL),
+    ("maketitle", r'\\maketitle', r' ', 0),
+    ("bibliography", r'\\bibliography{\.\./bib/DLMF}',
+     r'\\bibliographystyle{plain}' + "\n" + r'\\bibliography{/home/hcohl/DRMF/DLMF/DLMF.bib}', 0),
+    ("acknowledgements", r'\\acknowledgements{.*?}', r' ', 0),
+    ("math", r'\{math}', r'{equation}', 0),
+    ("galleryitem", r'\\galleryitem{.*?}{.*?}', r' ', 0),
+    ("origref", r'\\origref{.*?}{.*?}', r' ', 0),
+    ("onlyelectronic nested", r'\\onlyelectronic{.*?{.*?}.*?}', r' ', 0),
+    ("onlyelectronic", r'\\onlyelectronic{.*?}', r' ', 0),
+    ("printonly", r'\\printonly{.*?}', r' ', 0),
+    ("onlyprint", r'\\onlyprint{.*?}', r' ', re.DOTALL),
+    ("origref optional", r'\\origref\[.*?\]{.*?}', r'', re.DOTALL),
+    ("begin electroniconly", r'\\begin\{electroniconly}', r' ', 0),
+    ("end electroniconly", r'\\end\{electroniconly}', r' ', 0),
+    ("end printonly", r'\\end\{printonly}', r' ', 0),
+    ("begin printonly", r'\\begin\{printonly}', r' ', 0),
+    ("DLMF", r'\\DLMF\[.*?\]', r' ', 0),
+    ("author", r'\\author\[.*?\]{.*?}', r' ', 0),
+    # modify labels, etc
+    ("equation options", r'\\begin\{equation\}\[.*?\]+', r'\\begin{equation}', 0),
+]
+
+# Parts, sections and subsections removed, with everything within them, by sectioning command and title.
+SECTION_REMOVALS = [
+    ("section", "Special Notation"),
+    ("part", "Computation"),
+    ("part", "References"),
+    ("section", "Graphics"),
+    ("subsection", "Graphics"),
+    ("section", "Integrals"),
+    ("subsection", "Integrals"),
+    ("section", "Physical Applications"),
+]
+
+BLOCK_RULES = [(name, r'\\begin{' + name + r'}.*?\\end{' + name + r'}', r'', re.DOTALL)
+               for name in ["figuregroup", "comment", "figure", "errata", "table", "%", "sidebar"]]
+
+# Groups removed from the lines they are on, unless they are in a comment in an equation.
+TO_REMOVE = [re.compile(name, re.DOTALL) for name in [
+    r'\\citet',
+    r'\\lxDeclare\[.*?\]',
+    r'\\note',
+    r'\\origref',
+    r'\\lxRefDeclaration',
+    r'\\MarkDefn',
+    r'\\indexdefn',
+    r'\\MarkNotation',
+    r'\\affiliation.*?###open_(\d+)###.*?###close_0###',
+]]
+
+# Characters that are not literal in a pattern.
+SPECIAL = '.^$*+?()[]|'
+
+
+# Formats a metrics report can be written in.
+METRICS_FORMATS = ["json", "csv"]
+
 
 def main():
-    if len(sys.argv) != 3:
+    if sys.argv[1:] == ["--rules"]:
+        for rules in [CLEANUP_RULES, BLOCK_RULES]:
+            for earlier, later, reason in sequential(rules):
+                print("{0} -> {1}: {2}".format(earlier, later, reason))
+        return
+
+    metrics_format, args = metrics_flag(sys.argv[1:])
+    metrics = Metrics() if metrics_format else None
+
+    if len(args) != 2:
 
         fname = "../../data/ZE.tex"
         dot_ind = fname.rfind(".") + 1
@@ -28,10 +106,77 @@ def main():
 
     else:
 
-        fname = sys.argv[1]
-        ofname = sys.argv[2]
+        fname = args[0]
+        ofname = args[1]
 
-    writeout(ofname, remove_excess(readin(fname)))
+    writeout(ofname, remove_excess(readin(fname), metrics))
+    if metrics is not None:
+        metrics.save(fname + "-metrics." + metrics_format)
+
+
+def metrics_flag(args):
+    """Takes the --metrics flag out of the command line arguments: "--metrics" or "--metrics=json" asks for a JSON
+    report, "--metrics=csv" for a CSV one.
+    :param args: The command line arguments.
+    :return: The format of the report, or None without the flag, and the other arguments.
+    """
+
+    metrics_format = None
+    rest = []
+    for arg in args:
+        if arg == "--metrics" or arg.startswith("--metrics="):
+            metrics_format = arg.partition("=")[2] or "json"
+            if metrics_format not in METRICS_FORMATS:
+                raise ValueError("unknown metrics format {0}".format(metrics_format))
+        else:
+            rest.append(arg)
+
+    return metrics_format, rest
+
+
+class Metrics(object):
+    """
+    What every removal rule did to a document.
+
+    rules: the bytes removed, matches and seconds of every rule, by name, in the order they were applied
+    """
+
+    def __init__(self):
+        self.rules = OrderedDict()
+
+    def record(self, name, removed, matches, seconds):
+        """Adds a run of a rule to its totals.
+        :param name: The name of the rule.
+        :param removed: The number of bytes it removed.
+        :param matches: The number of matches it had.
+        :param seconds: The time it took.
+        """
+
+        totals = self.rules.setdefault(name, [0, 0, 0.0])
+        totals[0] += removed
+        totals[1] += matches
+        totals[2] += seconds
+
+    def report(self):
+        """Lists the totals of every rule, in the order they were applied."""
+
+        return [OrderedDict([("rule", name), ("bytes_removed", removed), ("matches", matches),
+                             ("seconds", seconds)])
+                for name, (removed, matches, seconds) in self.rules.items()]
+
+    def save(self, path):
+        """Writes the report to a file, as CSV if its name ends with .csv and as JSON otherwise.
+        :param path: The path of the file.
+        """
+
+        rows = self.report()
+        with open(path, "wb" if path.endswith(".csv") else "w") as report:
+            if path.endswith(".csv"):
+                writer = csv.writer(report)
+                writer.writerow(["rule", "bytes_removed", "matches", "seconds"])
+                writer.writerows(row.values() for row in rows)
+            else:
+                json.dump(rows, report, indent=2)
 
 
 def remove_group(name, content):
@@ -76,61 +221,259 @@ def remove_macro(name, content):
     return pattern.sub(r'\1', content)
 
 
-def remove_excess(content):
-    """Removes the excess pieces from the given content and returns the updated version as a string.
+def _literals(pattern):
+    """Returns the runs of literal text in a pattern, split wherever something else is matched; the first run is
+    empty unless the pattern starts with literal text, and there is only one run if the pattern is all literal.
+    :param pattern:
+    """
+
+    runs = [""]
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            runs[-1] += pattern[i + 1]
+            i += 2
+            continue
+
+        if char == "\\" or char in SPECIAL:
+            # a quantifier makes the character before it optional
+            if char in "*?" and runs[-1]:
+                runs[-1] = runs[-1][:-1]
+            if char == "[":
+                i = pattern.find("]", i + 2)
+            runs.append("")
+            i += 2 if char == "\\" else 1
+            continue
+
+        runs[-1] += char
+        i += 1
+
+    return runs
+
+
+def _conflict(earlier, later):
+    """Returns why one rule has to be applied in a pass before the other one, or None if they can share a pass.
+    Matches that start inside each other, and matches of the later rule across text the earlier one replaced, are
+    checked for when the pass is made, see apply_rules; what is left is text that the earlier rule writes or keeps,
+    which the later one would have to match.
+    :param earlier:
+    :param later:
+    """
+
+    replacement = earlier[2]
+    for number, group in enumerate(re.findall(r'\((?!\?)([^()]*)\)', earlier[1]), 1):
+        runs = _literals(group)
+        if "\\{0}".format(number) in replacement:
+            if len(runs) > 1:
+                return "keeps text the other may match"
+            replacement = replacement.replace("\\{0}".format(number), runs[0])
+
+    words = set(re.findall(r'[A-Za-z]{2,}', replacement))
+    if any(words.intersection(re.findall(r'[A-Za-z]{2,}', run)) for run in _literals(later[1])):
+        return "writes text the other may match"
+
+    return None
+
+
+def sequential(rules):
+    """Lists the pairs of rules that interact, as (earlier, later, reason): the ones that have to be applied one after
+    the other, and the ones that share a pass only as long as the later rule does not match across text the earlier
+    one removed, see apply_rules.
+    :param rules:
+    """
+
+    pairs = []
+    for i, earlier in enumerate(rules):
+        for later in rules[i + 1:]:
+            reason = _conflict(earlier, later)
+            if reason is None and not earlier[2]:
+                reason = "removes text the other may match across"
+            if reason is not None:
+                pairs.append((earlier[0], later[0], reason))
+
+    return pairs
+
+
+class _Interleaved(Exception):
+    """Raised when a match in a pass contains the start of a match of a rule before it, or a rule matches the result
+    of a pass across text that a rule before it replaced."""
+
+
+def _fuse(rules):
+    """Compiles rules into a pass: a pattern, a replacement, and the rules to apply one at a time if a match in the
+    pass contains the start of an earlier rule's match. The replacement takes the match and a list it adds the
+    (rule, start, end) of its text in the result to, with the end of the match.
+    :param rules:
+    """
+
+    singles = [(re.compile(pattern, flags), replacement) for _, pattern, replacement, flags in rules]
+    if len(rules) == 1:
+        return singles[0] + ([],)
+
+    pattern = re.compile("|".join("(?P<rule{0}>{1})".format(i, rule[1]) for i, rule in enumerate(rules)),
+                         rules[0][3])
+    # the literal text every earlier rule starts with, for every rule
+    starts = [None] + [re.compile("|".join(re.escape(_literals(rule[1])[0]) for rule in rules[:i]))
+                       for i in range(1, len(rules))]
+
+    def replace(match, edits):
+        i = int(match.lastgroup[4:])
+        if i and starts[i].search(match.string, match.start() + 1, match.end()):
+            raise _Interleaved
+        rule_pattern, replacement = singles[i]
+        if "\\" in replacement:
+            # fill in the groups from the rule's own match
+            replacement = rule_pattern.match(match.string, match.start()).expand(replacement)
+        start = match.start() + (edits[-1][2] - edits[-1][3] if edits else 0)
+        edits.append((i, start, start + len(replacement), match.end()))
+        return replacement
+
+    return pattern, replace, singles
+
+
+def compile_rules(rules):
+    """Compiles a table of rules into as few passes as they allow, see _conflict and _fuse.
+    :param rules:
+    """
+
+    for rule in rules:
+        if not _literals(rule[1])[0]:
+            raise ValueError("rule {0} does not start with literal text".format(rule[0]))
+
+    passes = []
+    group = []
+    for rule in rules:
+        if group and (rule[3] != group[0][3] or any(_conflict(other, rule) for other in group)):
+            passes.append(_fuse(group))
+            group = []
+        group.append(rule)
+
+    if group:
+        passes.append(_fuse(group))
+
+    return passes
+
+
+def apply_rules(passes, content, metrics=None, names=None):
+    """Applies compiled rules to the content, giving the same result as applying them one at a time.
+    A pass is made again one rule at a time if a rule matches its result across text that a rule before it replaced,
+    such as the two halves of a group around a removed one; with metrics every rule is applied on its own, so that it
+    is measured on its own.
+    :param passes:
     :param content:
+    :param metrics: The Metrics to record every rule in, if any.
+    :param names: The names of the rules, in the order they were compiled in; needed with metrics.
     """
-    oldest = content
 
-    start_eq = re.compile(EQ_START)
-    end_eq = re.compile(EQ_END)
+    if metrics is not None:
+        names = iter(names)
+        for pattern, replacement, singles in passes:
+            for single, single_replacement in singles or [(pattern, replacement)]:
+                start = time.time()
+                updated, matches = single.subn(single_replacement, content)
+                metrics.record(next(names), len(content) - len(updated), matches, time.time() - start)
+                content = updated
+        return content
+
+    for pattern, replacement, singles in passes:
+        if not singles:
+            content = pattern.sub(replacement, content)
+            continue
 
-    updated = _get_preamble()
-    old = content
-    content = remove_macro(r"\\lxID", content)
+        edits = []
+        try:
+            updated = pattern.sub(lambda match: replacement(match, edits), content)
+            if _joined(singles, updated, edits):
+                raise _Interleaved
+            content = updated
+        except _Interleaved:
+            for single, single_replacement in singles:
+                content = single.sub(single_replacement, content)
 
-    # edit single lines
-    # removed unecessary information that caused an error with pdflatex
-    pattern = re.compile(r'\\acknowledgements{.*?}\n\n', re.DOTALL)
-    content = re.sub(pattern, r'', content)
-    content = re.sub(r'\\maketitle', r' ', content)
-    content = re.sub(r'\\bibliography{\.\./bib/DLMF}',
-                     r'\\bibliographystyle{plain}' + "\n" + r'\\bibliography{/home/hcohl/DRMF/DLMF/DLMF.bib}', content)
-    content = re.sub(r'\\acknowledgements{.*?}', r' ', content)
-    content = re.sub(r'\{math}', r'{equation}', content)
-    content = re.sub(r'\\galleryitem{.*?}{.*?}', r' ', content)
-    content = re.sub(r'\\origref{.*?}{.*?}', r' ', content)
-    content = re.sub(r'\\onlyelectronic{.*?{.*?}.*?}', r' ', content)
-    content = re.sub(r'\\onlyelectronic{.*?}', r' ', content)
-    content = re.sub(r'\\printonly{.*?}', r' ', content)
-    pattern = re.compile(r'\\onlyprint{.*?}', re.DOTALL)
-    content = re.sub(pattern, r' ', content)
-    pattern = re.compile(r'\\origref\[.*?\]{.*?}', re.DOTALL)
-    content = re.sub(pattern, r'', content)
-    content = re.sub(r'\\begin\{electroniconly}', r' ', content)
-    content = re.sub(r'\\end\{electroniconly}', r' ', content)
-    content = re.sub(r'\\end\{printonly}', r' ', content)
-    content = re.sub(r'\\begin\{printonly}', r' ', content)
-    content = re.sub(r'\\DLMF\[.*?\]', r' ', content)
-    content = re.sub(r'\\author\[.*?\]{.*?}', r' ', content)
+    return content
 
-    # modify labels, etc
-    content = re.sub(r'\\begin\{equation\}\[.*?\]+', r'\\begin{equation}', content, re.DOTALL)
 
-    print(len(old) - len(content))
-    old = content
+def _joined(singles, content, edits):
+    """Returns whether a rule may match the result of a pass across the text a rule before it replaced: a literal of
+    the rule overlaps the text, or a match of the rule does, which the pass would then have missed.
+    :param singles: The rules of the pass.
+    :param content: The result of the pass.
+    :param edits: The (rule, start, end, end of the match) of every replacement made in the pass, in order.
+    """
+
+    for i, (single, _) in enumerate(singles):
+        earlier = [(start, end) for rule, start, end, _ in edits if rule < i]
+        if not earlier:
+            continue
+
+        runs = [run for run in _literals(single.pattern) if run]
+        for start, end in earlier:
+            for run in runs:
+                if content.find(run, max(0, start - len(run) + 1), end + len(run) - 1) != -1:
+                    return True
+
+        starts = [start for start, _ in earlier]
+        for match in single.finditer(content):
+            # the last replacement starting inside the match is the only one that can be inside it, as they are in
+            # order and do not overlap
+            j = bisect.bisect_left(starts, match.end()) - 1
+            if j < 0:
+                continue
+            start, end = earlier[j]
+            if match.start() < start if start == end else match.start() < end:
+                return True
 
-    content = remove_section(r'\\section{Special Notation}', r'\\part', content)
-    content = remove_section(r'\\part{Computation}', r'\\bibliographystyle{plain}', content)
-    content = remove_section(r'\\part{References}', r'\\bibliographystyle{plain}', content)
-    content = remove_section(r'\\section{Graphics}', r'\\section', content)
-    content = remove_section(r'\\section{Graphics}', r'\\section', content)
-    content = remove_section(r'\\subsection{Graphics}', r'\\subsection', content)
-    content = remove_section(r'\\section{Integrals}', r'\\section', content)
-    content = remove_section(r'\\subsection{Integrals}', r'\\subsection', content)
-    content = remove_section(r'\\section{Physical Applications}', r'\\bibliographystyle{plain}', content)
+    return False
 
-    print(len(old) - len(content))
+
+def _names(rules):
+    return [rule[0] for rule in rules]
+
+
+CLEANUP_PASSES = compile_rules(CLEANUP_RULES)
+BLOCK_PASSES = compile_rules(BLOCK_RULES)
+
+
+def remove_sections(removals, content, metrics=None):
+    """Removes parts, sections and subsections from the content, all in one pass over its outline.
+    With metrics they are removed one at a time, so that every removal is measured on its own.
+    :param removals: The (sectioning command, title) of every one to remove.
+    :param content: The content to remove them from.
+    :param metrics: The Metrics to record every removal in, if any.
+    """
+    if metrics is not None:
+        for kind, title in removals:
+            start = time.time()
+            outline = Outline(content)
+            matches = outline.delete(title, kind)
+            updated = outline.apply()[0]
+            metrics.record("{0} {1}".format(kind, title), len(content) - len(updated), matches,
+                           time.time() - start)
+            content = updated
+        return content
+
+    outline = Outline(content)
+    for kind, title in removals:
+        outline.delete(title, kind)
+    return outline.apply()[0]
+
+
+def remove_excess(content, metrics=None):
+    """Removes the excess pieces from the given content and returns the updated version as a string.
+    :param content:
+    :param metrics: The Metrics to record what every removal rule did in, if any, and then the "total" of the whole
+    step.
+    """
+    oldest = content
+    began = time.time()
+
+    start_eq = re.compile(EQ_START)
+    end_eq = re.compile(EQ_END)
+
+    updated = _get_preamble()
+    content = apply_rules(CLEANUP_PASSES, content, metrics, _names(CLEANUP_RULES))
+    content = remove_sections(SECTION_REMOVALS, content, metrics)
 
     to_join = []
     in_eq = False
@@ -158,30 +501,9 @@ def remove_excess(content):
     skip_lines = set()
 
     # remove begin/end groups
-    content = remove_begin_end("figuregroup", content)
-    content = remove_begin_end("comment", content)
-    content = remove_begin_end("figure", content)
-    content = remove_begin_end("errata", content)
-    content = remove_begin_end("table", content)
-    content = remove_begin_end("table", content)
-
-    content = remove_begin_end("%", content)
-
-    content = remove_begin_end("sidebar", content)
+    content = apply_rules(BLOCK_PASSES, content, metrics, _names(BLOCK_RULES))
     content = parentheses.remove(content, curly=True)
 
-    to_remove = [
-        r'\\citet',
-        r'\\lxDeclare\[.*?\]',
-        r'\\note',
-        r'\\origref',
-        r'\\lxRefDeclaration',
-        r'\\MarkDefn',
-        r'\\indexdefn',
-        r'\\MarkNotation',
-        r'\\affiliation.*?###open_(\d+)###.*?###close_0###',
-    ]
-
     lengths = get_line_lengths(content)
     lines = content.split('\n')
 
@@ -203,14 +525,14 @@ def remove_excess(content):
         sys.exit(-1)
 
     # go through each group and remove it
-    for name in to_remove:
-
-        # for each improper name, put it in ###open### and ###closes###
-        str_regex = name   # + STD_REGEX    not really necessary to add STD_REGEX, edit if wrong -oksana
-        pattern = re.compile(str_regex, re.DOTALL)
+    for pattern in TO_REMOVE:
+        started = time.time()
+        removed = 0
+        matches = 0
 
         # go through every match, finding start and end
         for match in pattern.finditer(content):
+            matches += 1
 
             # for each match of compiled improper name in file
 
@@ -230,8 +552,13 @@ def remove_excess(content):
                 dont_skip = True
 
             if not dont_skip:
+                if metrics is not None:
+                    removed += sum(len(lines[lnum - 1]) + 1 for lnum in range(start, end + 1) if lnum not in skip_lines)
                 skip_lines.update(range(start, end + 1))
 
+        if metrics is not None:
+            metrics.record(pattern.pattern, removed, matches, time.time() - started)
+
             # define items that cannot be at the beginning of any line or be contined in any line
     illegal_starts = [r'\documentclass{DLMF}', r'\thischapter', r'\part{Notation}', r'\begin{equationgroup',
                       r'\end{equationgroup', r'\begin{onecolumn', r'\end{onecolumn']
@@ -412,7 +739,8 @@ def remove_excess(content):
     # remove consecutive blank lines
     content = re.sub(r'(\n){3,}', '\n\n', content)
 
-    print("Final: {0}".format(len(oldest) - len(content)))
+    if metrics is not None:
+        metrics.record("total", len(oldest) - len(content), 0, time.time() - began)
 
     return content
 
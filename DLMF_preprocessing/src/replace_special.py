@@ -33,6 +33,9 @@ EQMIX_END = r'\end{equationmix}'
 
 STD_REGEX = r'.*?###open_(\d+)###.*?###close_\1###'
 
+# groups in which "i"s are left alone
+TEXT_PATS = [re.compile(r'\\text{.*?}')]
+
 
 def main():
     if len(sys.argv) != 3:
@@ -174,37 +177,49 @@ def remove_special(content):
 
     return content
 
-# replaces "i"s as necessary in words
-def _replace_i(words):
+# finds the groups in which "i"s are left alone, in order, joining the ones that overlap
+def _text_bounds(words):
 
-    text_pat = re.compile(r'\\text{.*?}')
+    bounds = []
+    for start, end in sorted((match.start(), match.end()) for pat in TEXT_PATS for match in pat.finditer(words)):
+        if bounds and start < bounds[-1][1]:
+            bounds[-1] = (bounds[-1][0], max(end, bounds[-1][1]))
+        else:
+            bounds.append((start, end))
 
-    iloc = words.find("i")
+    return bounds
 
-    # go through every occurence of "i" in the content
-    while iloc != -1:
 
-        text_bounds = [(match.start(), match.end()) for match in text_pat.finditer(words)]
+# replaces "i"s as necessary in words, in one pass from left to right
+def _replace_i(words):
 
+    text_bounds = iter(_text_bounds(words))
+    bound = next(text_bounds, None)
 
-        # go through all the text lines
-        for start, end in text_bounds:
+    updated = []
+    last = 0
 
-            # if the "i" is in the \text tag, skip it
-            if start < iloc < end:
+    iloc = words.find("i")
 
-                iloc = words.find("i", end + 1)
+    # go through every occurence of "i" in the content
+    while iloc != -1:
 
-                if len(text_bounds) > 1:
-                    continue
+        while bound is not None and bound[1] <= iloc:
+            bound = next(text_bounds, None)
+
+        # if the "i" is in the \text tag, skip it, along with the character after the tag
+        if bound is not None and bound[0] < iloc:
+            iloc = words.find("i", bound[1] + 1)
+            continue
 
         surrounding = ""
 
         # ensure "i" does not occur at the beginning of the string
         if iloc != 0:
-            surrounding += words[iloc - 1]
+            # the character before is the end of the last replacement if it was an "i"
+            surrounding += updated[-1][-1] if last == iloc else words[iloc - 1]
 
-            # ensure "i" does not occur at the end of the line
+        # ensure "i" does not occur at the end of the line
         if iloc != len(words) - 1:
             surrounding += words[iloc + 1]
 
@@ -216,7 +231,6 @@ def _replace_i(words):
             # one (but not both) of the surrounding characters IS alphabetic, may need to replace
             if any(s.isalpha() for s in surrounding):
 
-
                 if surrounding[1].isalpha():  # character after is alphabetic
 
                     # make sure we're not starting a macro
@@ -227,15 +241,15 @@ def _replace_i(words):
                 # neither of the characters surrounding the "i" are alphabetic, replace
                 replacement = r'\iunit'
 
+        updated.append(words[last:iloc])
+        updated.append(replacement)
+        last = iloc + 1
 
-        # print("Surrounding: {0} - replacement made: {1}".format(surrounding, replacement != "i"))
-        if iloc != -1:
-            words = words[:iloc] + replacement + words[iloc + 1:]
-            iloc = words.find("i", iloc + len(replacement))
-        else:
-            words = words[:iloc] + replacement
+        iloc = words.find("i", last)
+
+    updated.append(words[last:])
 
-    return words
+    return "".join(updated)
 
 
 if __name__ == "__main__":
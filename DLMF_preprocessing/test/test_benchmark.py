@@ -0,0 +1,19 @@
+from unittest import TestCase
+import benchmark
+
+
+class TestBenchmark(TestCase):
+    def test_chapter(self):
+        self.assertEqual(benchmark.chapter("$x$ ", 10), "$x$ " * 3)
+        self.assertEqual(benchmark.chapter("$x$ ", 0), "$x$ ")
+
+    def test_growth_exponent(self):
+        self.assertAlmostEqual(benchmark.growth_exponent(
+            [(100, 1.0), (200, 2.0), (400, 4.0)]), 1.0)
+        self.assertAlmostEqual(benchmark.growth_exponent(
+            [(100, 1.0), (200, 4.0)]), 2.0)
+        self.assertEqual(benchmark.growth_exponent([(100, 1.0)]), None)
+
+    def test_run(self):
+        timings, _ = benchmark.run(len, "$x$ ", [4, 8], 1)
+        self.assertEqual([size for size, _ in timings], [4, 8])
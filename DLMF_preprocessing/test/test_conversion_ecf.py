@@ -0,0 +1,46 @@
+from unittest import TestCase
+from conversion_ecf import convert, identities
+
+export = """(* {"CosSum", 1}*)
+ConditionalExpression[Cos[x + y] == Cos[x] Cos[y] - Sin[x] Sin[y], Element[x | y, Complexes]]
+(* {"Root", 2}*)
+ConditionalExpression[Sqrt[\\[Alpha]] == Abs[ArcTan[z]], Element[z, Reals]]
+"""
+
+equations = ["""\\begin {equation}
+\\cos@{x + y} == \\cos@@{x} \\cos@@{y} - \\sin@@{x} \\sin@@{y}
+%  \\constraints{
+%      x \\in \\Complex &
+%      y \\in \\Complex }
+\\end {equation} \n\n""", """\\begin {equation}
+\\sqrt{\\alpha} == \\Abs@{\\atan@@{z}}
+%  \\constraints{
+%      z \\in \\Real }
+\\end {equation} \n\n"""]
+
+
+class TestConversionEcf(TestCase):
+    def test_nested(self):
+        self.assertEqual("\\coth@{\\cosh@@{x}} \\leq \\sqrt{\\cos@{2 x}}",
+                         convert("Coth[Cosh[x]] LessEqual Sqrt[Cos[2 x]]"))
+
+    def test_templates(self):
+        self.assertEqual("\\digamma@{ z} + \\polygamma{2}@{ z}",
+                         convert("Polygamma[0, z] + Polygamma[2, z]"))
+        self.assertEqual("\\ContinuedFractionK{k}{1}{\\infty}@{z/k}",
+                         convert("ContinuedFractionK[z/k, {k, 1, Infinity}]"))
+        self.assertEqual("\\sqrt{x} + \\sin@@{y}",
+                         convert("Inactive[Sqrt][x] + Inactive[Sin[y]]"))
+
+    def test_greek(self):
+        self.assertEqual("\\beta Gamma[x] + \\cpi",
+                         convert("\\[Beta]Gamma[x] + Pi"))
+
+    def test_unclosed(self):
+        self.assertEqual("\\cos@@{x} + Sin[y", convert("Cos[x] + Sin[y"))
+        self.assertEqual("Sin[a, \\cos@@{b}", convert("Sin[a, Cos[b]"))
+        self.assertEqual("Sin[a + \\cos@@{b} \\sqrt{x}",
+                         convert("Sin[a + Cos[b] Sqrt[x]"))
+
+    def test_identities(self):
+        self.assertEqual(equations, list(identities(export.splitlines(True))))
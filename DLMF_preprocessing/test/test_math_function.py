@@ -47,7 +47,21 @@ class TestMathString(TestCase):
     def test_change_original(self):
         c_o = math_function.change_original(before, just_math)
         self.assertEqual(before, c_o)
+        self.assertRaises(ValueError, math_function.change_original,
+                          '$a$ and $b$', ['X'])
+        self.assertRaises(ValueError, math_function.change_original,
+                          '$a$ and $b$', ['X', 'Y', 'Z'])
 
     def test_formatting(self):
         formatted = math_function.formatting(before)
         self.assertEqual(no_text, formatted)
+
+    def test_apply_edits(self):
+        edited, offsets = math_function.apply_edits(
+            "abcdefghij", [((5, 7), "XYZW"), ((1, 2), "")])
+        self.assertEqual("acdeXYZWhij", edited)
+        self.assertEqual([0, 1, 1, 2, 3, 4, 4, 8, 9, 10, 11],
+                         [offsets.translate(i) for i in range(11)])
+        self.assertEqual(1, offsets.shift)
+        self.assertRaises(ValueError, math_function.apply_edits, "abc",
+                          [((0, 2), "x"), ((1, 3), "y")])
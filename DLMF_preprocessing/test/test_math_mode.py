@@ -112,5 +112,32 @@ class Testmath_mode(unittest.TestCase):
             self.assertEqual(math_mode.find_math_ranges(test["string"]), test["output"])
         self.assertRaises(SyntaxError, math_mode.find_math_ranges, "{$$}$$")
 
+    def test_long_chapter(self):
+        section = " \\text{$x$} \\[a \\hbox{$b$} \\$\\]% $c$\n$$d$$ "
+        ranges = [(8, 9), (14, 16), (23, 24), (26, 29), (39, 40)]
+        self.assertEqual(math_mode.find_math_ranges(section), ranges)
+        self.assertEqual(math_mode.find_math_ranges(section * 20000),
+                         [(begin + len(section) * i, end + len(section) * i)
+                          for i in range(20000) for begin, end in ranges])
+
+    def test_math_range_index(self):
+        index = math_mode.math_range_index("$a$ b \\[c\\] d $$e$$")
+        self.assertEqual(list(index), [(1, 2), (8, 9), (16, 17)])
+        self.assertEqual(index[-1], (16, 17))
+        self.assertEqual([i for i in range(20) if index.in_math(i)],
+                         [1, 8, 16])
+        self.assertEqual(index.overlapping(0, 8), ((1, 2),))
+        self.assertEqual(index.overlapping(2, 18), ((8, 9), (16, 17)))
+        self.assertEqual(index.overlapping(2, 8), ())
+        self.assertIs(math_mode.math_range_index("$a$ b \\[c\\] d $$e$$"),
+                      index)
+
+    def test_math_range_index_types(self):
+        text = u'caf\xe9 $x$'
+        self.assertEqual(list(math_mode.math_range_index(text.encode("utf-8"))), [(7, 8)])
+        index = math_mode.math_range_index(text)
+        self.assertEqual(list(index), [(6, 7)])
+        self.assertEqual(text[index[0][0]:index[0][1]], u'x')
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,57 @@
+from unittest import TestCase
+from outline import Outline
+
+document = """\\part{Notation}
+\\section{Special Notation}
+\\partial x
+\\part{Properties}
+\\section{Definitions}
+\\subsection{Graphics}
+g
+\\subsection{Other}
+% \\section{Commented}
+\\section*{Graphics {of} f}
+h
+\\part{References}
+\\bibliographystyle{plain}
+"""
+
+
+class TestOutline(TestCase):
+    def test_tree(self):
+        outline = Outline(document)
+        self.assertEqual(["Notation", "Properties", "References"], [node.title for node in outline.root.children])
+        self.assertEqual([("part", "Notation"), ("section", "Special Notation"), ("part", "Properties"),
+                          ("section", "Definitions"), ("subsection", "Graphics"), ("subsection", "Other"),
+                          ("section", "Graphics {of} f"), ("part", "References")],
+                         [(node.kind, node.title) for node in outline])
+
+        definitions = outline.find("Definitions")[0]
+        self.assertEqual(document.index("\\section{Definitions}"), definitions.start)
+        self.assertEqual(document.index("\\section*{"), definitions.end)
+        self.assertEqual(document.index("\\bibliographystyle"), outline.find("References")[0].end)
+
+    def test_find(self):
+        outline = Outline(document)
+        self.assertEqual(1, len(outline.find("Graphics")))
+        self.assertEqual([], outline.find("Graphics", "section"))
+        self.assertEqual([], outline.find("Commented"))
+
+    def test_delete(self):
+        outline = Outline(document)
+        self.assertEqual(1, outline.delete("Special Notation"))
+        self.assertEqual(1, outline.delete("Graphics", "subsection"))
+        outline.delete("Properties")
+        outline.delete("Definitions")
+        text, offsets = outline.apply()
+        self.assertEqual("\\part{Notation}\n\\part{References}\n\\bibliographystyle{plain}\n", text)
+        self.assertEqual(text.index("\\part{References}"), offsets.translate(document.index("\\part{References}")))
+
+    def test_replace(self):
+        outline = Outline(document)
+        outline.replace("Other", "\\subsection{Another}\n")
+        outline.delete("References", "part")
+        text = outline.apply()[0]
+        self.assertEqual(document[:document.index("\\subsection{Other}")] + "\\subsection{Another}\n" +
+                         document[document.index("\\section*{"):document.index("\\part{References}")] +
+                         "\\bibliographystyle{plain}\n", text)
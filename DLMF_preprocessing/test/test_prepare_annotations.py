@@ -0,0 +1,46 @@
+from unittest import TestCase
+from prepare_annotations import prepare_annotations
+
+content = """\\documentclass{article}
+%  \\constraint{
+\\begin{document}
+See ~ {a} & \\drmfname{b}.
+\\begin{equation}\\label{eq:ZE.EX.ZE5}
+    \\RiemannZeta'@{s} = - \\sum_{n=2}^\\infty (\\ln@@{n}) n^{-s}
+    %  \\constraint{$\\realpart{s} > 1$ &
+    %    $s \\ne 1$}
+    %  \\drmfnote{Follows from the definition.}
+\\end{equation}
+\\begin{equation}\\label{eq:ZE.EX.ZE6}
+    x = 1 % not an annotation
+\\end{equation}
+\\end{document}
+"""
+
+prepared = """\\documentclass{article}
+%  \\constraint{
+\\begin{document}
+See ~{a} \\& {\\bf NAME}:~b}.
+\\begin{equation}\\label{eq:ZE.EX.ZE5}
+    \\RiemannZeta'@{s} = - \\sum_{n=2}^\\infty (\\ln@@{n}) n^{-s}
+\\end{equation}
+\\begin{flushright}
+       {\\bf C}:~${\\displaystyle \\realpart{s} > 1}$ \\&
+          ${\\displaystyle s \\ne 1}$ \\\\[0.2cm]
+       {\\bf NOTE}:~Follows from the definition.
+\\end{flushright}
+\\begin{equation}\\label{eq:ZE.EX.ZE6}
+    x = 1 % not an annotation
+\\end{equation}
+\\end{document}
+"""
+
+
+class TestPrepareAnnotations(TestCase):
+    def test_prepare_annotations(self):
+        self.assertEqual(prepared, prepare_annotations(content))
+
+    def test_long_chapter(self):
+        equation = "\\begin{equation}\\label{eq:ZE.EX.ZE7}\n    x = 1\n\\end{equation}\n"
+        chapter = "\\begin{document}\n" + equation * 20000
+        self.assertEqual(chapter, prepare_annotations(chapter))
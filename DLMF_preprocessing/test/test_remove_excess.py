@@ -1,5 +1,19 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
 from unittest import TestCase
-from src.remove_excess import remove_section
+from src.remove_excess import remove_section, compile_rules, apply_rules, sequential, remove_sections, Metrics, \
+    remove_excess, metrics_flag, BLOCK_PASSES
+
+RULES = [
+    ("a", r'\\a{.*?}', r' ', 0),
+    ("b", r'\\b{.*?}', r'', 0),
+    ("keep", r'\\keep{(.*?)}', r'\1', 0),
+    ("c", r'\\cc{.*?}', r'\\dd{}', 0),
+    ("d", r'\\dd{.*?}', r'', 0),
+]
 
 
 class TestRemoveExcess(TestCase):
@@ -8,3 +22,65 @@ class TestRemoveExcess(TestCase):
         result = remove_section(r'{Begin}', r'{End}', content)
         self.assertEqual('AA{End}DDBB', result)
 
+    def test_sequential(self):
+        self.assertEqual([("b", "keep", "removes text the other may match across"),
+                          ("b", "c", "removes text the other may match across"),
+                          ("b", "d", "removes text the other may match across"),
+                          ("keep", "c", "keeps text the other may match"),
+                          ("keep", "d", "keeps text the other may match"),
+                          ("c", "d", "writes text the other may match")], sequential(RULES))
+        self.assertEqual(3, len(compile_rules(RULES)))
+
+    def test_apply_rules(self):
+        passes = compile_rules(RULES)
+        for content in ['x\\a{1}y\\b{2}z\\keep{\\cc{3}}', '\\b{\\a{1}}', '\\a{\\b{1}}',
+                        '\\ke\\b{1}ep{\\cc{3}}']:
+            expected = content
+            for rule in RULES:
+                expected = apply_rules(compile_rules([rule]), expected)
+            self.assertEqual(expected, apply_rules(passes, content))
+
+        # a group that is only whole once the group inside it is removed
+        content = '\\begin{com\\begin{figuregroup}x\\end{figuregroup}ment}y\\end{comment}Z'
+        self.assertEqual('Z', apply_rules(BLOCK_PASSES, content))
+
+    def test_metrics(self):
+        content = 'x\\a{1}y\\b{2}z\\a{3}\\section{Graphics}g\\section{Other}'
+        metrics = Metrics()
+        result = apply_rules(compile_rules(RULES), content, metrics, [rule[0] for rule in RULES])
+        self.assertEqual(apply_rules(compile_rules(RULES), content), result)
+        result = remove_sections([("section", "Graphics"), ("part", "Graphics")], result, metrics)
+        self.assertEqual('x yz \\section{Other}', result)
+
+        report = metrics.report()
+        self.assertEqual(["a", "b", "keep", "c", "d", "section Graphics", "part Graphics"],
+                         [row["rule"] for row in report])
+        self.assertEqual([(8, 2), (5, 1), (0, 0), (0, 0), (0, 0), (19, 1), (0, 0)],
+                         [(row["bytes_removed"], row["matches"]) for row in report])
+
+        directory = tempfile.mkdtemp()
+        try:
+            metrics.save(os.path.join(directory, "metrics.json"))
+            with open(os.path.join(directory, "metrics.json")) as saved:
+                self.assertEqual(json.loads(json.dumps(report)), json.load(saved))
+            metrics.save(os.path.join(directory, "metrics.csv"))
+            with open(os.path.join(directory, "metrics.csv"), "rb") as saved:
+                rows = list(csv.reader(saved))
+            self.assertEqual(["rule", "bytes_removed", "matches", "seconds"], rows[0])
+            self.assertEqual(["a", "8", "2"], rows[1][:3])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_remove_excess_metrics(self):
+        content = '\\begin{document}\n\\section{Graphics}\ng\n\\section{Other}\n\\end{document}\n'
+        metrics = Metrics()
+        result = remove_excess(content, metrics)
+        self.assertEqual(result, remove_excess(content))
+        self.assertEqual([21, 1], metrics.rules["section Graphics"][:2])
+        self.assertEqual(("total", len(content) - len(result)), tuple(metrics.report()[-1].values())[:2])
+
+    def test_metrics_flag(self):
+        self.assertEqual((None, ["in.tex", "out.tex"]), metrics_flag(["in.tex", "out.tex"]))
+        self.assertEqual(("json", ["in.tex"]), metrics_flag(["--metrics", "in.tex"]))
+        self.assertEqual(("csv", ["in.tex"]), metrics_flag(["in.tex", "--metrics=csv"]))
+        self.assertRaises(ValueError, metrics_flag, ["--metrics=xml"])
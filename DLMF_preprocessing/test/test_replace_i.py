@@ -1,5 +1,5 @@
 from unittest import TestCase
-from replace_special import remove_special
+from replace_special import remove_special, _replace_i
 
 mismatched = """
 %\\frac{q(t)}{p'(t) (p(t) - p(a))^{(\lambda/\mu)-1}}$, using Cauchy's integral
@@ -31,4 +31,9 @@ class TestReplaceSpecial(TestCase):
         self.assertEqual(mismatched.split('\n'), actual)
     def test_matching(self):
         result = remove_special(matched)
-        self.assertEqual(matched.split('\n'), result)
\ No newline at end of file
+        self.assertEqual(matched.split('\n'), result)
+
+    def test_replace_i(self):
+        self.assertEqual("\\iunit x + y \\iunit \\text{is i} \\iunit \\iunit \\sin \\iunit",
+                         _replace_i("i x + y i \\text{is i} ii \\sin i"))
+        self.assertEqual("\\text{i} x", _replace_i("\\text{i} x"))
@@ -5,6 +5,7 @@ sys.path.append('../../DLMF_preprocessing/src')
 from utilities import readin as readin
 from utilities import writeout
 from remove_excess import remove_excess as step1
+from remove_excess import Metrics, metrics_flag
 from replace_special import remove_special as step2
 from prepare_annotations import prepare_annotations as step3
 
@@ -16,13 +17,17 @@ from tex2Wiki import writeout as step5
 # step1 = imp.load_source('remove_excess','../../AlexDanoff/src/remove_excess.py')
 
 def main():
-    if len(sys.argv) != 2:
+    metrics_format, args = metrics_flag(sys.argv[1:])
+    if len(args) != 1:
         pattern = "../../data/[0-9]*ZE.tex"  # [A-Z][A-Z]
     else:
-        pattern = sys.argv[1]
+        pattern = args[0]
     for fname in glob.glob(pattern):
         print "Processing " + fname
-        writeout(fname + "-processed.tex", step3(step2(step1(readin(fname)))))
+        metrics = Metrics() if metrics_format else None
+        writeout(fname + "-processed.tex", step3(step2(step1(readin(fname), metrics))))
+        if metrics is not None:
+            metrics.save(fname + "-metrics." + metrics_format)
         step4(fname + "-processed.tex")
         step5(fname + "-dump.xml")
 
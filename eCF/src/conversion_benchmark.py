@@ -0,0 +1,187 @@
+"""
+
+    DRMF Project: Converting Mathematica to LaTeX
+    Benchmark of the conversion on generated identities of growing size, to
+    see how fast it is and how its time grows with the length of the lines,
+    compared against a baseline saved by an earlier run
+
+"""
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+import argparse
+import json
+import math
+import sys
+import time
+
+from identity_generator import IdentityGenerator
+from mathematica_to_latex import iter_convert
+
+# Runs slower than the baseline by more than this factor are regressions
+TOLERANCE = 1.25
+
+
+def time_conversion(lines, repeat=3, jobs=1):
+    # (list(, int, int)) -> float
+    """
+    Times the conversion of the lines of an identities file, like 'main'
+    does, but without reading or writing any file.
+
+    :param lines: lines of the identities file
+    :param repeat: number of times the lines are converted
+    :param jobs: number of processes converting lines
+    :returns: shortest time the conversion took, in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for _ in iter_convert(lines, {}, jobs):
+            pass
+        seconds = time.time() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best
+
+
+def growth_exponent(sizes):
+    # (list) -> float
+    """
+    Fits the time per line to a power of the length of the lines, by least
+    squares on their logarithms: 1 if the conversion takes linear time, 2 if
+    it takes quadratic time.
+
+    :param sizes: sizes of the report, see 'run'
+    :returns: exponent, or None with fewer than two different lengths
+    """
+    points = [(math.log(size['characters']),
+               math.log(size['seconds'] / size['lines']))
+              for size in sizes if size['seconds'] > 0]
+    if len(set(x for x, _ in points)) < 2:
+        return None
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / \
+        sum((x - mean_x) ** 2 for x, _ in points)
+
+
+def run(depths=(1, 2, 3, 4), count=200, repeat=3, jobs=1, **settings):
+    # ((tuple, int, int, int, **dict)) -> dict
+    """
+    Times the conversion of generated identities, for every depth of nesting.
+
+    :param depths: deepest nesting of function calls, for every size
+    :param count: number of identities of every size
+    :param repeat: number of times every size is converted
+    :param jobs: number of processes converting lines
+    :param settings: settings of the generator, see 'IdentityGenerator'
+    :returns: report of the sizes, with the mean length of the identities,
+              the time taken, the lines converted per second, and the growth
+              exponent, see 'growth_exponent'
+    """
+    sizes = []
+    for depth in depths:
+        generator = IdentityGenerator(depth=depth, **settings)
+        identities = generator.lines(count)
+        lines = len(identities)
+        seconds = time_conversion(identities, repeat, jobs)
+        sizes.append({
+            'depth': depth, 'lines': lines,
+            'characters': float(sum(len(line) for line in
+                                    identities[1::2])) / count,
+            'seconds': seconds,
+            'lines_per_second': lines / seconds if seconds else None})
+
+    settings.update(count=count, repeat=repeat, jobs=jobs)
+    return {'settings': settings, 'sizes': sizes,
+            'exponent': growth_exponent(sizes)}
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    # (dict, dict(, float)) -> list
+    """
+    Compares a report with a baseline, size by size.
+
+    :param report: report of this run, see 'run'
+    :param baseline: report of an earlier run
+    :param tolerance: factor the time may grow by before it is a regression
+    :returns: (depth, ratio of the times, whether it is a regression) of every
+              depth in both reports
+    """
+    previous = dict((size['depth'], size) for size in baseline['sizes'])
+    ratios = []
+    for size in report['sizes']:
+        if size['depth'] in previous and previous[size['depth']]['seconds']:
+            ratio = size['seconds'] / previous[size['depth']]['seconds']
+            ratios.append((size['depth'], ratio, ratio > tolerance))
+    return ratios
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time the conversion of generated identities of growing'
+                    ' size.')
+    parser.add_argument('--depths', type=int, nargs='+', default=[1, 2, 3, 4],
+                        help='deepest nesting of function calls, for every'
+                             ' size')
+    parser.add_argument('--count', type=int, default=200,
+                        help='number of identities of every size')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of times every size is converted; the'
+                             ' fastest time is kept')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of processes converting identities')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the generator')
+    parser.add_argument('--arguments', type=int, default=3,
+                        help='most arguments of a function call')
+    parser.add_argument('--heads', nargs='+',
+                        help='functions the calls are made from; every'
+                             ' function in data/functions if not given')
+    parser.add_argument('--fractions', type=float, default=0.2,
+                        help='chance of dividing by an operand')
+    parser.add_argument('--powers', type=float, default=0.1,
+                        help='chance of raising an operand to a power')
+    parser.add_argument('--constraints', type=int, default=2,
+                        help='most constraints of an identity')
+    parser.add_argument('--save', metavar='PATH',
+                        help='write the report to a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the times with a JSON baseline, and'
+                             ' fail if any size got slower')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='factor the time of a size may grow by before'
+                             ' it is a regression')
+    args = parser.parse_args()
+
+    results = run(args.depths, args.count, args.repeat, args.jobs,
+                  seed=args.seed, arguments=args.arguments, heads=args.heads,
+                  fractions=args.fractions, powers=args.powers,
+                  constraints=args.constraints)
+    for result in results['sizes']:
+        print '{depth:>5} {characters:>10.1f} chars {seconds:>9.3f} s ' \
+              '{lines_per_second:>10.1f} lines/s'.format(**result)
+    if results['exponent'] is not None:
+        print 'growth exponent: {0:.2f}'.format(results['exponent'])
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as previous:
+            baseline = json.load(previous)
+        regressions = 0
+        for depth, ratio, regression in compare(results, baseline,
+                                                args.tolerance):
+            print '{0:>5} {1:>6.2f}x baseline{2}'.format(
+                depth, ratio, ' REGRESSION' if regression else '')
+            regressions += regression
+        if baseline.get('exponent') is not None and \
+                results['exponent'] is not None:
+            print 'growth exponent: {0:.2f} (baseline {1:.2f})'.format(
+                results['exponent'], baseline['exponent'])
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,256 @@
+"""
+
+    DRMF Project: Converting Mathematica to LaTeX
+    On-disk cache of converted lines, and manifest of the generated file, so
+    unchanged identities are not converted again every time
+    newIdentities.tex is regenerated, and in-memory cache of converted
+    subexpressions, so they are converted once however often they appear
+
+"""
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+import hashlib
+import json
+import sqlite3
+
+# Extension of the manifest of a generated file, which is kept next to it
+MANIFEST_SUFFIX = '.manifest'
+
+
+class ConversionCache(object):
+    """
+    Maps keys, made from a line and whatever its conversion depends on, to
+    converted lines, in a sqlite database. Changes are written with 'commit',
+    or when the cache is closed.
+
+    path:   path of the database file
+    hits:   number of lookups that found a converted line
+    misses: number of lookups that did not
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        self._db.text_factory = str
+        self._db.execute('CREATE TABLE IF NOT EXISTS conversions '
+                         '(key TEXT PRIMARY KEY, latex TEXT)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, key):
+        # (str) -> str
+        """
+        Looks up a converted line.
+
+        :param key: key of the line
+        :returns: converted line, or None if it is not in the cache
+        """
+        row = self._db.execute('SELECT latex FROM conversions WHERE key = ?',
+                               (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, latex):
+        # (str, str) -> None
+        """
+        Stores a converted line.
+
+        :param key: key of the line
+        :param latex: converted line
+        :returns: None
+        """
+        self._db.execute('INSERT OR REPLACE INTO conversions VALUES (?, ?)',
+                         (key, latex))
+
+    def clear(self):
+        # () -> None
+        """
+        Removes every converted line from the cache.
+
+        :returns: None
+        """
+        self._db.execute('DELETE FROM conversions')
+        self._db.commit()
+
+    def commit(self):
+        # () -> None
+        """
+        Writes the stored lines to disk.
+
+        :returns: None
+        """
+        self._db.commit()
+
+    def close(self):
+        # () -> None
+        """
+        Writes the stored lines to disk and closes the database.
+
+        :returns: None
+        """
+        self._db.commit()
+        self._db.close()
+
+    def __len__(self):
+        row = self._db.execute('SELECT COUNT(*) FROM conversions').fetchone()
+        return row[0]
+
+
+class OutputManifest(object):
+    """
+    Index of the blocks of a generated file, kept next to it, so that the
+    blocks of identities that have not changed can be copied from it the
+    next time the file is generated. The blocks are found by a key, see
+    'mathematica_to_latex.entry_key', and the index is only used if the file
+    is still what was written with it.
+
+    path:    path of the generated file
+    entries: (tag, key, offset, length) of every block written this time
+    hits:    number of blocks found in the previous file
+    misses:  number of blocks that were not
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self.hits = 0
+        self.misses = 0
+        self._text = ''
+        self._blocks = {}
+
+        try:
+            with open(path + MANIFEST_SUFFIX) as manifest:
+                previous = json.load(manifest)
+            with open(path, 'rb') as generated:
+                text = generated.read()
+        except (IOError, ValueError):
+            return
+
+        if hashlib.sha1(text).hexdigest() == previous.get('digest'):
+            self._text = text
+            self._blocks = dict((key, (offset, length)) for
+                                _, key, offset, length in
+                                previous.get('entries', []))
+
+    def get(self, key):
+        # (str) -> str
+        """
+        Looks up the block of an identity in the previous file.
+
+        :param key: key of the identity
+        :returns: block, or None if it is not in the previous file
+        """
+        block = self._blocks.get(key)
+        if block is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self._text[block[0]:block[0] + block[1]]
+
+    def add(self, tag, key, offset, length):
+        # (str, str, int, int) -> None
+        """
+        Records where the block of an identity was written this time.
+
+        :param tag: Mathematica tag of the identity
+        :param key: key of the identity
+        :param offset: offset of the block in the file
+        :param length: length of the block
+        :returns: None
+        """
+        self.entries.append((tag, key, offset, length))
+
+    def save(self):
+        # () -> None
+        """
+        Writes the manifest of the file, once it has been generated.
+
+        :returns: None
+        """
+        with open(self.path, 'rb') as generated:
+            digest = hashlib.sha1(generated.read()).hexdigest()
+        with open(self.path + MANIFEST_SUFFIX, 'w') as manifest:
+            manifest.write(json.dumps({'digest': digest,
+                                       'entries': self.entries}))
+
+
+class ConversionMemo(object):
+    """
+    Maps the text of subexpressions to their conversions, in memory, keeping
+    at most 'size' of them. They are kept in two halves: lookups move what
+    they find into the newer half, and once it is full, the older half is
+    dropped, so the conversions dropped are the least recently used ones.
+
+    size:   largest number of subexpressions kept
+    hits:   number of lookups that found a conversion
+    misses: number of lookups that did not
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._new = {}
+        self._old = {}
+
+    def get(self, key):
+        # (str) -> object
+        """
+        Looks up a conversion, marking it as recently used.
+
+        :param key: text of the subexpression
+        :returns: conversion, or None if it is not kept
+        """
+        value = self._new.get(key)
+        if value is None:
+            value = self._old.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self.put(key, value)
+
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        # (str, object) -> None
+        """
+        Keeps a conversion, dropping the older half of them if the newer one
+        is full.
+
+        :param key: text of the subexpression
+        :param value: conversion
+        :returns: None
+        """
+        self._new[key] = value
+        if len(self._new) * 2 >= self.size:
+            self._old = self._new
+            self._new = {}
+
+    def clear(self):
+        # () -> None
+        """
+        Drops every conversion, and resets the counts of hits and misses.
+
+        :returns: None
+        """
+        self._new = {}
+        self._old = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._new) + len(self._old)
@@ -0,0 +1,119 @@
+"""
+
+    DRMF Project: Converting Mathematica to LaTeX
+    Timings of the conversion, to see which stages and functions the time goes
+    to, and which identities are slowest to convert
+
+"""
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+import collections
+import heapq
+import json
+
+
+class ConversionProfile(object):
+    """
+    Time spent converting identities: in every stage of the conversion, in
+    the template of every function, and on the slowest lines.
+
+    stages:  [seconds, calls] of every stage, in the order they were first run
+    rows:    [seconds, calls] of every function, not counting the functions
+             in its arguments
+    slowest: number of slowest lines that are kept
+    """
+
+    def __init__(self, slowest=10):
+        self.stages = collections.OrderedDict()
+        self.rows = {}
+        self.slowest = slowest
+        self._lines = []
+        self._tags = {}
+
+    def add_stage(self, name, seconds):
+        # (str, float) -> None
+        """
+        Records one run of a stage of the conversion.
+
+        :param name: name of the stage
+        :param seconds: time it took
+        :returns: None
+        """
+        timing = self.stages.setdefault(name, [0.0, 0])
+        timing[0] += seconds
+        timing[1] += 1
+
+    def add_row(self, name, seconds):
+        # (str, float) -> None
+        """
+        Records the conversion of one call of a function.
+
+        :param name: name of the function
+        :param seconds: time it took
+        :returns: None
+        """
+        timing = self.rows.setdefault(name, [0.0, 0])
+        timing[0] += seconds
+        timing[1] += 1
+
+    def add_line(self, line, seconds):
+        # (str, float) -> None
+        """
+        Records the conversion of a whole line, keeping it if it is one of the
+        slowest so far.
+
+        :param line: line that was converted
+        :param seconds: time it took
+        :returns: None
+        """
+        if len(self._lines) < self.slowest:
+            heapq.heappush(self._lines, (seconds, line))
+        elif self._lines and seconds > self._lines[0][0]:
+            heapq.heapreplace(self._lines, (seconds, line))
+
+    def label(self, line, tag):
+        # (str, str) -> None
+        """
+        Gives a line its Mathematica tag, if it is one of the slowest. Lines
+        that are the same get the last tag they are given.
+
+        :param line: line that was converted
+        :param tag: Mathematica tag of the line
+        :returns: None
+        """
+        for _, slow in self._lines:
+            if slow == line:
+                self._tags[line] = tag
+
+    def report(self):
+        # () -> dict
+        """
+        Sums up the timings, with the functions and lines from slowest to
+        fastest.
+
+        :returns: dictionary of the stages, functions and slowest lines
+        """
+        return {
+            'stages': [{'name': name, 'seconds': seconds, 'calls': calls}
+                       for name, (seconds, calls) in self.stages.items()],
+            'functions': [{'name': name, 'seconds': seconds, 'calls': calls}
+                          for name, (seconds, calls) in
+                          sorted(self.rows.items(), key=lambda item: item[1],
+                                 reverse=True)],
+            'lines': [{'tag': self._tags.get(line), 'seconds': seconds,
+                       'line': line}
+                      for seconds, line in sorted(self._lines, reverse=True)],
+            'total': sum(seconds for seconds, _ in self.stages.values())}
+
+    def save(self, path):
+        # (str) -> None
+        """
+        Writes the report to a JSON file.
+
+        :param path: path of the file
+        :returns: None
+        """
+        with open(path, 'w') as report:
+            json.dump(self.report(), report, indent=2, sort_keys=True)
@@ -0,0 +1,134 @@
+"""
+
+    DRMF Project: Converting Mathematica to LaTeX
+    Conversion of identities in worker processes, each under a time budget,
+    so that an identity which raises or never finishes is set aside in a
+    quarantine report instead of stopping the whole run
+
+"""
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+import json
+import multiprocessing
+import time
+
+
+class Fault(object):
+    """
+    Stands in for the result of an item that could not be converted.
+
+    error:   the exception raised, or why the worker was stopped
+    seconds: time spent on the item
+    """
+
+    def __init__(self, error, seconds):
+        self.error = error
+        self.seconds = seconds
+
+    def __repr__(self):
+        return 'Fault({0!r}, {1!r})'.format(self.error, self.seconds)
+
+
+def _run(function, item):
+    # (function, object) -> tuple
+    """
+    Applies a function to an item in a worker, catching whatever it raises.
+
+    :param function: function to be applied, defined at the module level
+    :param item: item to be converted
+    :returns: whether it succeeded, the result or the error, and the time it
+              took
+    """
+    start = time.time()
+    try:
+        return True, function(item), time.time() - start
+    except Exception as error:
+        return False, '{0}: {1}'.format(type(error).__name__, error), \
+            time.time() - start
+
+
+class Watchdog(object):
+    """
+    Applies a function to items in a pool of worker processes. Every item is
+    given at least 'budget' seconds; when one takes longer, the workers are
+    stopped and started again for the items after it. Items that raise or run
+    out of time give a Fault instead of a result, and are kept with
+    'quarantine'.
+
+    budget: seconds an item may take
+    jobs:   number of worker processes
+    faults: (tag, line, error, seconds) of every quarantined item
+    """
+
+    def __init__(self, budget, jobs=1):
+        self.budget = budget
+        self.jobs = max(1, jobs)
+        self.faults = []
+
+    def imap(self, function, items):
+        # (function, iterable) -> generator
+        """
+        Applies a function to every item, in order.
+
+        :param function: function to be applied, defined at the module level
+        :param items: items to be converted
+        :returns: generator of the results, with a Fault for every item that
+                  raised or ran out of time
+        """
+        items = list(items)
+        done = 0
+        while done < len(items):
+            pool = multiprocessing.Pool(self.jobs)
+            try:
+                results = [pool.apply_async(_run, (function, item))
+                           for item in items[done:]]
+                for result in results:
+                    try:
+                        succeeded, value, seconds = result.get(self.budget)
+                    except multiprocessing.TimeoutError:
+                        done += 1
+                        yield Fault('out of time after {0}s'.format(
+                            self.budget), self.budget)
+                        break
+
+                    done += 1
+                    yield value if succeeded else Fault(value, seconds)
+            finally:
+                pool.terminate()
+                pool.join()
+
+    def quarantine(self, tag, line, fault):
+        # (str, str, Fault) -> None
+        """
+        Records an item that could not be converted.
+
+        :param tag: Mathematica tag of the identity, if any
+        :param line: line of the identity
+        :param fault: what went wrong
+        :returns: None
+        """
+        self.faults.append((tag, line, fault.error, fault.seconds))
+
+    def report(self):
+        # () -> list
+        """
+        Lists the quarantined items, in the order they were found.
+
+        :returns: list of the tag, line, error and time of every item
+        """
+        return [{'tag': tag, 'line': line, 'error': error,
+                 'seconds': seconds}
+                for tag, line, error, seconds in self.faults]
+
+    def save(self, path):
+        # (str) -> None
+        """
+        Writes the quarantine report to a JSON file.
+
+        :param path: path of the file
+        :returns: None
+        """
+        with open(path, 'w') as report:
+            json.dump(self.report(), report, indent=2, sort_keys=True)
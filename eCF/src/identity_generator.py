@@ -0,0 +1,130 @@
+"""
+
+    DRMF Project: Converting Mathematica to LaTeX
+    Seeded generator of random Mathematica identities, in the format of
+    Identities.m, for benchmarking the conversion
+
+"""
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+import random
+
+from mathematica_to_latex import FUNCTION_CONVERSIONS
+
+ATOMS = ('a', 'b', 'n', 'k', 'q', 'x', 'z', '1', '2', 'Pi', 'E', 'Infinity',
+         '\\[Alpha]', '\\[Nu]', '\\[Gamma]')
+OPERATORS = ('+', '-', '*')
+CONSTRAINTS = ('Element[z,Complexes]', 'Element[n,Integers]', 'Abs[z]<1',
+               'Re[a]>0', 'NotElement[x,Reals]', 'n>=0',
+               'Inequality[0,Less,x,LessEqual,1]')
+# Functions whose first two arguments are lists, and whose templates have
+# two more argument placings than arguments, see 'fill_template'
+LIST_ARGUMENTS = ('HypergeometricPFQ', 'QHypergeometricPFQ')
+
+
+class IdentityGenerator(object):
+    """
+    Writes random identities, the same ones for the same seed and settings.
+
+    depth:       deepest nesting of function calls
+    arguments:   most arguments of a call; templates with more are not used
+    heads:       (function, number of arguments) pairs calls are made from
+    fractions:   chance of dividing by an operand
+    powers:      chance of raising an operand to a power
+    constraints: most constraints of an identity; none if 0
+    """
+
+    def __init__(self, seed=0, depth=3, arguments=3, heads=None,
+                 fractions=0.2, powers=0.1, constraints=2):
+        self.depth = depth
+        self.arguments = arguments
+        self.fractions = fractions
+        self.powers = powers
+        self.constraints = constraints
+        self.heads = []
+        for row in FUNCTION_CONVERSIONS:
+            if heads is not None and row[0] not in heads:
+                continue
+            for count in sorted(set(i.count('-') for i in row[2])):
+                if row[0] in LIST_ARGUMENTS:
+                    count -= 2
+                if count <= arguments:
+                    self.heads.append((row[0], count))
+        self._random = random.Random(seed)
+
+    def expression(self, depth=None):
+        # ((int)) -> str
+        """
+        Writes a random expression.
+
+        :param depth: deepest nesting of function calls in it; 'depth' if not
+                      given
+        :returns: expression
+        """
+        if depth is None:
+            depth = self.depth
+        choice = self._random.random()
+
+        if depth <= 0 or not self.heads or choice < 0.2:
+            expression = self._random.choice(ATOMS)
+        elif choice < 0.9:
+            expression = self._call(depth - 1)
+        else:
+            expression = '(' + self.expression(depth - 1) + ')'
+
+        while self._random.random() < 0.3:
+            expression += self._random.choice(OPERATORS) + \
+                self.expression(depth - 1)
+        if self._random.random() < self.fractions:
+            expression += '/(' + self.expression(depth - 1) + ')'
+        if self._random.random() < self.powers:
+            expression = '(' + expression + ')^' + \
+                self._random.choice(ATOMS)
+        return expression
+
+    def _call(self, depth):
+        # (int) -> str
+        """
+        Writes a call of a random function.
+
+        :param depth: deepest nesting of function calls in its arguments
+        :returns: call
+        """
+        head, count = self._random.choice(self.heads)
+        args = [self.expression(depth) for _ in range(count)]
+        if head in LIST_ARGUMENTS:
+            args[:2] = ['{' + ','.join(self.expression(depth) for _ in
+                                       range(self._random.randint(0, 3))) +
+                        '}' for _ in range(2)]
+        return head + '[' + ','.join(args) + ']'
+
+    def identity(self):
+        # () -> str
+        """
+        Writes a random identity, with its constraints, if any.
+
+        :returns: identity
+        """
+        identity = self.expression() + '==' + self.expression()
+        if self.constraints <= 0 or self._random.random() < 0.5:
+            return identity
+
+        count = self._random.randint(1, self.constraints)
+        return 'ConditionalExpression[' + identity + ',' + '&&'.join(
+            self._random.choice(CONSTRAINTS) for _ in range(count)) + ']'
+
+    def lines(self, count):
+        # (int) -> list
+        """
+        Writes random identities, each after its tag, like in Identities.m.
+
+        :param count: number of identities
+        :returns: lines of the identities
+        """
+        lines = []
+        for index in range(count):
+            lines.append('(* {"Generated%d", %d}*)' % (index, index))
+            lines.append(self.identity())
+        return lines
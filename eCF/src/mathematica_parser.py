@@ -0,0 +1,643 @@
+"""
+
+    DRMF Project: Converting Mathematica to LaTeX
+    Single-pass parser for the function calls in a Mathematica line, and
+    reader of the expressions in a Mathematica file
+
+"""
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+import bisect
+import re
+
+OPENING = frozenset('([{')
+CLOSING = frozenset(')]}')
+BRACKETS = re.compile(r'[][(){}]')
+
+
+class Call(object):
+    """
+    A call of a known function, e.g. 'Gamma[a,z]', found in a line. Only the
+    positions are stored; the text itself stays in the line.
+
+    head:     name of the function
+    start:    index of the first character of the name
+    end:      index after the closing bracket
+    args:     (start, end) indices of every argument, excluding the commas
+    children: calls nested inside the arguments, in order of appearance
+    """
+    __slots__ = ('head', 'start', 'end', 'args', 'children')
+
+    def __init__(self, head, start):
+        self.head = head
+        self.start = start
+        self.end = None
+        self.args = []
+        self.children = []
+
+    def __repr__(self):
+        return 'Call({0!r}, {1}, {2})'.format(self.head, self.start, self.end)
+
+
+class HeadMatcher(object):
+    """
+    Finds the calls of a fixed set of names in one scan of a line. The names
+    are put in a trie, which is written out as a single regular expression, so
+    a name is only tried where its first letters match. Since spaces are
+    removed before conversion, names are glued to whatever precedes them
+    ('zGamma[z]'); the leftmost match in front of a bracket is the longest
+    name, so exceptions like 'ArcCos' keep 'Cos' from matching.
+
+    names: dictionary of names; True for functions that should be converted,
+           False for names that should be left alone
+    """
+
+    def __init__(self, names, pattern=None):
+        self.names = dict(names)
+        if pattern is None:
+            pattern = _trie_pattern(self.names)
+        self.pattern = pattern
+        self.calls = re.compile('(' + pattern + r')\[')
+        self.tokens = re.compile('(' + pattern + r')\[|[][(){},]')
+
+    def restrict(self, heads):
+        # (tuple) -> HeadMatcher
+        """
+        Returns a matcher that only converts some of the functions, but still
+        recognizes all of the names.
+
+        :param heads: functions to convert
+        :returns: new matcher
+        """
+        return HeadMatcher(((name, name in heads and value) for name, value in
+                            self.names.items()), self.pattern)
+
+    def find(self, line):
+        # (str) -> list
+        """
+        Finds the calls of the functions in a line.
+
+        :param line: line to be searched
+        :returns: list of (name, index) pairs, in order
+        """
+        return [(match.group(1), match.start(1))
+                for match in self.calls.finditer(line)
+                if self.names[match.group(1)]]
+
+    def heads(self, line):
+        # (str) -> set
+        """
+        Finds which functions are called in a line.
+
+        :param line: line to be searched
+        :returns: set of names
+        """
+        return set(name for name, _ in self.find(line))
+
+
+def _trie_pattern(names):
+    # (iterable) -> str
+    """
+    Writes a set of names as a regular expression with the shape of a trie,
+    e.g. 'Cos', 'Cosh' and 'Cot' become 'Co(?:s(?:h)?|t)'.
+
+    :param names: names to be matched
+    :returns: regular expression
+    """
+    trie = {}
+    for name in names:
+        node = trie
+        for char in name:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    return _node_pattern(trie) or '(?!)'
+
+
+def _node_pattern(node):
+    # (dict) -> str
+    """
+    Writes a node of a trie as a regular expression, see '_trie_pattern'.
+
+    :param node: node of the trie
+    :returns: regular expression
+    """
+    branches = [re.escape(char) + _node_pattern(child)
+                for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+
+    pattern = branches[0]
+    if len(branches) > 1:
+        pattern = '(?:' + '|'.join(branches) + ')'
+    # A name ends here, but longer ones are tried first
+    if '' in node:
+        pattern = '(?:' + pattern + ')?'
+
+    return pattern
+
+
+class Substitution(object):
+    """
+    Makes many replacements in one pass over a line, instead of one
+    'str.replace' each. Everything to be replaced is put in a single
+    alternation, and where two texts could start at the same place the
+    longest one wins; nothing that was put in is looked at again. The table
+    is written as a trie, like the names of 'HeadMatcher'.
+
+    table: replacement for every text to be replaced
+    rules: (regular expression, function) pairs, for texts that are replaced
+           depending on what they are; the expressions cannot have groups,
+           and are tried before the table
+    """
+
+    def __init__(self, table, rules=()):
+        self.table = dict(table)
+        self.rules = [(re.compile(expression + '$'), function)
+                      for expression, function in rules]
+
+        alternatives = [expression for expression, _ in rules]
+        alternatives.append(_trie_pattern(self.table))
+        self.pattern = re.compile('(' + '|'.join(alternatives) + ')')
+
+    def sub(self, line):
+        # (str) -> str
+        """
+        Makes all of the replacements in a line.
+
+        :param line: line to be converted
+        :returns: converted line
+        """
+        parts = self.pattern.split(line)
+        if len(parts) == 1:
+            return line
+
+        table = self.table
+        parts[1::2] = [table[text] if text in table else self._rule(text)
+                       for text in parts[1::2]]
+        return ''.join(parts)
+
+    def _rule(self, text):
+        # (str) -> str
+        """
+        Replaces a text that was matched by one of the rules.
+
+        :param text: text to be replaced
+        :returns: replacement
+        """
+        for expression, function in self.rules:
+            if expression.match(text):
+                return function(text)
+        return text
+
+
+class ExceptionSpans(object):
+    """
+    The places where some names occur in a line, e.g. 'NotElement' when
+    looking for 'Element', as intervals sorted by where they start; a match
+    inside any of them is part of another name.
+
+    starts: start index of every occurrence, sorted
+    ends:   end index of every occurrence, in the same order
+    """
+
+    def __init__(self, line, names):
+        spans = []
+        for name in names:
+            i = line.find(name) if name else -1
+            while i != -1:
+                spans.append((i, i + len(name)))
+                i = line.find(name, i + 1)
+        spans.sort()
+
+        self.starts = [span[0] for span in spans]
+        self.ends = [span[1] for span in spans]
+        self._longest = max(len(name) for name in names) if names else 0
+
+    def covering(self, start, end, lower=0):
+        # (int, int(, int)) -> int
+        """
+        Finds the occurrences that contain the text between two indices.
+
+        :param start: index of the first character of the text
+        :param end: index after the text
+        :param lower: only occurrences starting here or later count
+        :returns: end of the longest reaching occurrence, or None if there
+                  is none
+        """
+        # Only names starting at most one name length before the end can
+        # contain the text
+        lowest = max(lower, end - self._longest)
+        first = bisect.bisect_left(self.starts, lowest)
+        last = bisect.bisect_right(self.starts, start)
+
+        covered = [self.ends[k] for k in range(first, last)
+                   if self.ends[k] >= end]
+        return max(covered) if covered else None
+
+
+def exception_spans(line, names):
+    # (str, tuple) -> ExceptionSpans
+    """
+    Returns the exception spans of a line, reusing the last ones if neither
+    the line nor the names have changed since.
+
+    :param line: line to be searched
+    :param names: names of the exceptions
+    :returns: spans of the names
+    """
+    last_line, last_names, spans = _LAST_SPANS
+    if last_names != names or (last_line is not line and last_line != line):
+        spans = ExceptionSpans(line, names)
+        _LAST_SPANS[:] = [line, names, spans]
+    return spans
+
+_LAST_SPANS = [None, None, None]
+
+
+def parse(line, names):
+    # (str, HeadMatcher) -> list
+    """
+    Parses a line into a tree of function calls, in one pass. Brackets of any
+    kind are counted the same way, like in 'find_surrounding', and commas only
+    separate arguments when they are directly inside the call's brackets.
+
+    :param line: line to be parsed
+    :param names: matcher for the functions, or a dictionary of names, see
+                  'HeadMatcher'
+    :returns: list of the outermost calls
+    """
+    if not isinstance(names, HeadMatcher):
+        names = HeadMatcher(names)
+
+    roots = []
+    calls = []
+    brackets = []
+    arg_start = []
+
+    for match in names.tokens.finditer(line):
+        i = match.end() - 1
+        char = line[i]
+
+        if char in OPENING:
+            call = None
+            head = match.group(1)
+            if head is not None and names.names[head]:
+                call = Call(head, match.start())
+                (calls[-1].children if calls else roots).append(call)
+                calls.append(call)
+                arg_start.append(i + 1)
+            brackets.append(call)
+
+        elif char in CLOSING:
+            if not brackets:
+                continue
+            call = brackets.pop()
+            if call is not None:
+                call.args.append((arg_start.pop(), i))
+                call.end = i + 1
+                calls.pop()
+
+        elif brackets and brackets[-1] is not None:
+            brackets[-1].args.append((arg_start[-1], i))
+            arg_start[-1] = i + 1
+
+    if calls:
+        raise ValueError('unbalanced brackets after ' + calls[-1].head)
+
+    return roots
+
+
+class BracketIndex(object):
+    """
+    The brackets of a line, found once: the bracket count before every
+    character, and the partner of every matched bracket. Brackets of any kind
+    are counted the same way, like the helpers in 'mathematica_to_latex' do,
+    so '(]' is a pair.
+
+    line:    line that was indexed
+    depth:   number of open brackets before each index, up to len(line)
+    partner: index of the matching bracket, for every matched bracket
+    """
+
+    def __init__(self, line):
+        self.line = line
+        self.partner = partner = {}
+        self._depth = None
+        self._stops = {}
+
+        opened = []
+        for match in BRACKETS.finditer(line):
+            i = match.start()
+            if line[i] in OPENING:
+                opened.append(i)
+            elif opened:
+                j = opened.pop()
+                partner[i] = j
+                partner[j] = i
+
+    @property
+    def depth(self):
+        # Only needed for splitting, so it is counted on first use
+        if self._depth is None:
+            self._depth = depth = []
+            level = last = 0
+            for match in BRACKETS.finditer(self.line):
+                i = match.start()
+                depth.extend([level] * (i + 1 - last))
+                last = i + 1
+                level += 1 if self.line[i] in OPENING else -1
+            depth.extend([level] * (len(self.line) + 1 - last))
+        return self._depth
+
+    def close(self, i):
+        # (int) -> int
+        """
+        Finds where the bracket count returns to what it was before index i,
+        counting from i; that is i itself if it is not a bracket.
+
+        :param i: index of an opening bracket
+        :returns: index of the closing bracket, or None if the bracket at i
+                  is a closing or unmatched one
+        """
+        if self.line[i] in OPENING:
+            return self.partner.get(i)
+        if self.line[i] in CLOSING:
+            return None
+        return i
+
+    def split(self, sep):
+        # (str) -> list
+        """
+        Finds the separators that are not inside any brackets.
+
+        :param sep: separator (character)
+        :returns: list of indices
+        """
+        found = []
+        i = self.line.find(sep)
+        while i != -1:
+            if self.depth[i + 1] == 0:
+                found.append(i)
+            i = self.line.find(sep, i + 1)
+
+        return found
+
+    def search(self, i, sign, direction):
+        # (int, list, int) -> int
+        """
+        Finds the first sign at the same level as index i, or the bracket
+        around i, in one direction, jumping over the bracketed groups in
+        between.
+
+        :param i: the starting point
+        :param sign: list of signs, which cannot be brackets
+        :param direction: direction of search, left: -1, right: 1
+        :returns: index of the sign or bracket; len(line) or -1 if there is
+                  none, or None if an unmatched bracket is in the way
+        """
+        stops = self._stops.get(tuple(sign))
+        if stops is None:
+            stops = [match.start() for match in
+                     _stop_pattern(sign).finditer(self.line)]
+            self._stops[tuple(sign)] = stops
+
+        if direction == 1:
+            k = bisect.bisect_right(stops, i)
+            while k < len(stops):
+                j = stops[k]
+                if self.line[j] not in OPENING:
+                    return j
+                if j not in self.partner:
+                    return None
+                k = bisect.bisect_right(stops, self.partner[j])
+            return len(self.line)
+
+        k = bisect.bisect_left(stops, i) - 1
+        while k >= 0:
+            j = stops[k]
+            if self.line[j] not in CLOSING:
+                return j
+            if j not in self.partner:
+                return None
+            k = bisect.bisect_left(stops, self.partner[j]) - 1
+        return -1
+
+
+def bracket_index(line):
+    # (str) -> BracketIndex
+    """
+    Returns the bracket index of a line, once the same line has been asked for
+    a few times in a row; the index is built once, and reused until the line
+    changes. Lines that change after every lookup or two are cheaper to scan
+    with 'scan_close' and 'scan_search'.
+
+    :param line: line to be indexed
+    :returns: index of the line, or None
+    """
+    last, uses, index = _LAST_INDEX
+    if last is not line and last != line:
+        _LAST_INDEX[:] = [line, 1, None]
+        return None
+
+    if index is None:
+        if uses < LOOKUPS_BEFORE_INDEX:
+            _LAST_INDEX[1] = uses + 1
+            return None
+        index = _LAST_INDEX[2] = BracketIndex(line)
+    return index
+
+# Lookups of an unchanged line after which 'bracket_index' builds its index
+LOOKUPS_BEFORE_INDEX = 2
+_LAST_INDEX = [None, 0, None]
+
+
+def scan_close(line, i):
+    # (str, int) -> int
+    """
+    Works like 'BracketIndex.close', without an index, by counting the
+    brackets from index i.
+
+    :param line: line to be searched
+    :param i: index of an opening bracket
+    :returns: index where the count returns to zero, or None if it never does
+    """
+    if line[i] not in OPENING and line[i] not in CLOSING:
+        return i
+
+    count = 0
+    for match in BRACKETS.finditer(line, i):
+        count += 1 if line[match.start()] in OPENING else -1
+        if count == 0:
+            return match.start()
+
+    return None
+
+
+def scan_split(line, sep):
+    # (str, str) -> list
+    """
+    Works like 'BracketIndex.split', without an index, by counting the
+    brackets between the separators.
+
+    :param line: line to be split
+    :param sep: separator (character), which cannot be a bracket
+    :returns: list of indices
+    """
+    found = []
+    count = 0
+    for match in _stop_pattern(sep).finditer(line):
+        i = match.start()
+        if line[i] in OPENING:
+            count += 1
+        elif line[i] in CLOSING:
+            count -= 1
+        elif count == 0:
+            found.append(i)
+
+    return found
+
+
+def scan_search(line, i, sign, direction):
+    # (str, int, list, int) -> int
+    """
+    Works like 'BracketIndex.search', without an index, by counting the
+    brackets between index i and the sign.
+
+    :param line: line to be searched
+    :param i: the starting point
+    :param sign: list of signs, which cannot be brackets
+    :param direction: direction of search, left: -1, right: 1
+    :returns: index of the sign or bracket; len(line) or -1 if there is
+              none, or None if the brackets in between are unbalanced
+    """
+    count = 0
+
+    if direction == 1:
+        for match in _stop_pattern(sign).finditer(line, i + 1):
+            j = match.start()
+            if line[j] in OPENING:
+                count += 1
+            elif line[j] in CLOSING:
+                count -= 1
+            elif count == 0:
+                return j
+            if count < 0:
+                return j
+        return len(line) if count == 0 else None
+
+    end = len(line) - 1
+    for match in _stop_pattern(sign).finditer(line[::-1], end + 1 - i):
+        j = end - match.start()
+        if line[j] in CLOSING:
+            count += 1
+        elif line[j] in OPENING:
+            count -= 1
+        elif count == 0:
+            return j
+        if count < 0:
+            return j
+    return -1 if count == 0 else None
+
+
+def _stop_pattern(sign):
+    # (list) -> SRE_Pattern
+    """
+    Compiles the pattern of the characters a search has to stop at: the signs
+    and the brackets.
+
+    :param sign: list of signs
+    :returns: compiled pattern
+    """
+    key = tuple(sign)
+    if key not in _STOP_PATTERNS:
+        _STOP_PATTERNS[key] = re.compile(
+            '[' + re.escape(''.join(sign)) + '()[\\]{}]')
+    return _STOP_PATTERNS[key]
+
+_STOP_PATTERNS = {}
+
+# Longest expression 'read_expressions' collects over line breaks
+EXPRESSION_LIMIT = 1 << 20
+# What changes the state of 'read_expressions': escaped quotes, comments,
+# strings and brackets
+TOKENS = re.compile(r'\\"|\(\*|\*\)|"|[][(){}]')
+# Characters that leave an expression unfinished at the end of a line, as
+# Mathematica wraps long ones after an operator or a comma
+CONTINUED = tuple('+-*/^=,&|<>@:')
+
+
+def read_expressions(lines, limit=EXPRESSION_LIMIT):
+    # (iterable(, int)) -> generator
+    """
+    Reads a Mathematica file one expression at a time, holding only the
+    current one. An expression goes on over line breaks while a bracket, a
+    string or a comment is still open, or after a line ending in an operator
+    or a comma, and its lines are joined with spaces; every other line, like
+    the comments with the tags and the blank lines, is read as it is. A line
+    that is a whole comment always starts a new expression, so an unclosed
+    bracket only runs on until the next tag, and an expression that grows
+    longer than 'limit' is given as it is so far.
+
+    :param lines: lines of the file, with or without the newlines
+    :param limit: longest expression, in characters
+    :returns: generator of the expressions, without the newlines
+    """
+    parts = []
+    for line in lines:
+        line = line.replace('\n', '')
+        if parts and line.startswith('(*') and _complete(line):
+            yield ' '.join(parts)
+            parts = []
+        if not parts:
+            if _complete(line):
+                yield line
+                continue
+            length = depth = comments = 0
+            string = False
+
+        for match in TOKENS.finditer(line):
+            token = match.group()
+            if string:
+                string = token != '"'
+            elif comments:
+                comments += {'(*': 1, '*)': -1}.get(token, 0)
+            elif token == '"':
+                string = True
+            elif token == '(*':
+                comments = 1
+            elif token in OPENING:
+                depth += 1
+            elif token in CLOSING:
+                depth -= 1
+
+        parts.append(line)
+        length += len(line)
+        if depth <= 0 and not string and not comments and \
+                not line.rstrip().endswith(CONTINUED) or length > limit:
+            yield ' '.join(parts)
+            parts = []
+
+    if parts:
+        yield ' '.join(parts)
+
+
+def _complete(line):
+    # (str) -> bool
+    """
+    Checks quickly whether a line holds a whole expression or comment, which
+    is how almost every line of an identities file looks.
+
+    :param line: line to be checked
+    :returns: whether the line certainly needs no other line
+    """
+    if line.startswith('(*'):
+        return line.endswith('*)') and line.count('(*') == 1 and \
+            line.count('*)') == 1
+    return '"' not in line and '(*' not in line and '*)' not in line and \
+        not line.rstrip().endswith(CONTINUED) and \
+        line.count('[') == line.count(']') and \
+        line.count('(') == line.count(')') and \
+        line.count('{') == line.count('}')
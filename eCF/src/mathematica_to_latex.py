@@ -11,10 +11,60 @@ __author__ = 'Kevin Chen'
 __status__ = 'Development'
 __credits__ = ["Divya Gandla", "Kevin Chen"]
 
+import argparse
+import cPickle
+import hashlib
+import itertools
+import multiprocessing
 import os
+import sys
+import time
+
+import mathematica_parser
+from conversion_cache import ConversionCache, ConversionMemo, OutputManifest
+from conversion_profile import ConversionProfile
+from conversion_watchdog import Fault, Watchdog
+from mathematica_parser import (BracketIndex, HeadMatcher, Substitution,
+                                bracket_index, exception_spans, parse,
+                                read_expressions, scan_close, scan_search,
+                                scan_split)
 
 DIR_NAME = os.path.dirname(os.path.realpath(__file__)) + '/../data/'
 
+CACHE_PATH = DIR_NAME + 'conversions.db'
+QUARANTINE_PATH = DIR_NAME + 'quarantine.json'
+TEMPLATES_PATH = DIR_NAME + 'functions.cache'
+
+# Number of converted calls kept in MEMO by the command line '--memo' flag
+MEMO_SIZE = 1 << 14
+
+# Lines with at most this many denominators in parentheses are converted in
+# place by 'convert_fraction'; indexing the line first only pays off once
+# the fractions nest, as in continued fractions
+IN_PLACE_LIMIT = 6
+
+# Everything in newIdentities.tex before the identities
+HEADER = ('\n\\documentclass{article}\n\n'
+          '\\usepackage{amsmath}\n'
+          '\\usepackage{amsfonts}\n'
+          '\\usepackage{amssymb}\n'
+          '\\usepackage{breqn}\n'
+          '\\usepackage{DLMFmath}\n'
+          '\\usepackage{DRMFfcns}\n'
+          '\\usepackage[paperwidth=15in, paperheight=20in, margin=0.5in]'
+          '{geometry}\n\n'
+          '\\begin{document}\n\n\n')
+
+# Profile of the conversion, only set by 'main' while it is being profiled
+PROFILE = None
+
+# Buffer size of newIdentities.tex, so it is written in large blocks
+WRITE_BUFFER = 1 << 16
+
+# Number of chunks each process gets when converting in parallel; more chunks
+# even out lines of different lengths, fewer cut the cost of passing them
+CHUNKS_PER_JOB = 4
+
 SYMBOLS = {
     'Alpha': 'alpha', 'Beta': 'beta', 'Gamma': 'gamma', 'Delta': 'delta',
     'Epsilon': 'epsilon', 'Zeta': 'zeta', 'Eta': 'eta', 'Theta': 'theta',
@@ -51,6 +101,19 @@ TRIG_INNER = ('Cos', 'Cot', 'Csc', 'Sec', 'Sin', 'Tan',
 E_EXCEPT = ('EulerGamma', 'Epsilon', 'EulerConstant', 'EulerBeta',
             'ExpIntn', 'ExpInti', 'CompEllIntE', 'CompEllIntK')
 
+# Operators and constants replaced by 'replace_operators'; the words with an
+# 'E' in them that is not the constant are kept as they are. Runs of '=',
+# with '!', '<' or '>' in front, are replaced by '_equals'
+OPERATORS_TABLE = {
+    '||': ' \\lor ', 'LessEqual': ' \\leq ', 'Less': ' < ', '>': ' > ',
+    '<': ' < ', '^': ' ^ ', '*': ' ', '+': ' + ', '-': ' - ', ',': ', ',
+    '"a"': 'a', 'Catalan': '\\CatalansConstant',
+    'GoldenRatio': '\\GoldenRatio', 'Pi': '\\pi',
+    'CalculateData`Private`nu': '\\nu', 'E': '\\expe'}
+OPERATORS_TABLE.update((word, word) for word in E_EXCEPT)
+EQUALS = {'': ' = ', '!': ' \\ne ', '<': ' \\leq ', '>': ' \\geq '}
+PARENTHESES = {'(': '\\left( ', ')': ' \\right)'}
+
 
 def find_surrounding(line, function, ex=(), start=0):
     # (str, str(, tuple, int)) -> tuple
@@ -70,25 +133,36 @@ def find_surrounding(line, function, ex=(), start=0):
     :returns: positions of opening and ending brackets
     """
     positions = [0, 0]
-    line = line[start:]
-    positions[0] = line.find(function)
+    rest = line[start:]
+    positions[0] = rest.find(function)
 
     # Finds the exceptions (if any) and returns indeces after the exception
-    if ex != '' and len(ex) >= 1:
-        for e in ex:
-            if (line.find(e) != -1 and
-                line.find(e) <= positions[0] and
-                    line.find(e) + len(e) >= positions[0] + len(function)):
-                return [line.find(e) + len(e) + start,
-                        line.find(e) + len(e) + start]
-
-    # Finds the start and end of a function
+    if ex != '' and len(ex) >= 1 and positions[0] != -1:
+        after = exception_spans(line, tuple(ex)).covering(
+            positions[0] + start, positions[0] + len(function) + start, start)
+        if after is not None:
+            return [after, after]
+
+    # Finds the start and end of a function from the brackets of the line
+    first = positions[0] + len(function) + start
+    if first < len(line):
+        index = bracket_index(line)
+        if index is None:
+            end = scan_close(line, first)
+        else:
+            end = index.close(first)
+        if end == first:
+            return start, start
+        if end is not None:
+            return positions[0] + start, end + 1
+
+    # Unmatched brackets are counted one by one
     count = 0
-    for j in range(positions[0] + len(function), len(line) + 1):
+    for j in range(positions[0] + len(function), len(rest) + 1):
 
-        if line[j] in list('([{'):
+        if rest[j] in LEFT_BRACKETS:
             count += 1
-        if line[j] in list(')]}'):
+        if rest[j] in RIGHT_BRACKETS:
             count -= 1
         if count == 0:
             if j == positions[0] + len(function):
@@ -110,23 +184,23 @@ def arg_split(line, sep):
     :param sep: seperator (character)
     :returns: list of segments
     """
-    args = []
-    count = i = 0
-    end = len(line) + 1
-    line = line + sep
+    index = bracket_index(line)
+    if index is None:
+        found = scan_split(line, sep)
+        balanced = line.count('(') + line.count('[') + line.count('{') == \
+            line.count(')') + line.count(']') + line.count('}')
+    else:
+        found = index.split(sep)
+        balanced = index.depth[-1] == 0
 
-    while i != end:
-        if line[i] in LEFT_BRACKETS:
-            count += 1
-        if line[i] in RIGHT_BRACKETS:
-            count -= 1
-        if count == 0 and line[i] == sep:
-            args.append(line[:i])
-            end -= i + 1
-            line = line[i + 1:]
-            i = 0
-        else:
-            i += 1
+    args = []
+    last = 0
+    for i in found:
+        args.append(line[last:i])
+        last = i + 1
+    # The last segment is dropped when the brackets do not add up
+    if balanced:
+        args.append(line[last:])
 
     return args
 
@@ -142,6 +216,17 @@ def search(line, i, sign, direction=-1):
     :param direction: direction of search, left: -1, right: 1
     :returns: indice of end
     """
+    if 0 <= i < len(line) and len(''.join(sign)) == len(sign) and \
+            not any(s in LEFT_BRACKETS or s in RIGHT_BRACKETS for s in sign):
+        index = bracket_index(line)
+        if index is None:
+            j = scan_search(line, i, sign, direction)
+        else:
+            j = index.search(i, sign, direction)
+        if j is not None:
+            return j - 1 if direction == 1 else j
+
+    # Unmatched brackets are counted one by one
     j = i + direction
     if direction == -1:
         end = -1
@@ -201,69 +286,195 @@ def master_function(line, params):
                    exceptions, if any
     :returns: converted line
     """
-    m, l, sep, ex = params[:5]
-    sep = [i.split('-') for i in sep]
-    multi = list('+-*/')
-    for _ in range(line.count(m)):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, m, ex=ex)
+    if params[0] + '[' not in line:
+        return line
+
+    names = dict((name, False) for name in NAMES)
+    names.update((e, False) for e in params[3] if e.isalnum())
+    names[params[0]] = True
+
+    return _convert(line, HeadMatcher(names), {params[0]: params})
+
+
+def convert_functions(line, heads=None):
+    # (str(, tuple)) -> str
+    """
+    Converts Mathematica functions to their LaTeX macros, using the templates
+    in FUNCTION_CONVERSIONS and the converters in SPECIAL_CONVERSIONS. The line
+    is parsed once and every call is converted from the inside out, instead of
+    rescanning the line for every function. Lines without any known function
+    are returned after a single scan. When all functions are converted, calls
+    already converted, in this line or an earlier one, are taken from MEMO if
+    it is set.
+
+    :param line: line to be converted
+    :param heads: functions to convert; all known functions if not given
+    :returns: converted line
+    """
+    if heads is not None:
+        matcher = MATCHER.restrict(heads)
+        if matcher.calls.search(line) is None:
+            return line
+        return _convert(line, matcher, ROWS)
+
+    if MATCHER.calls.search(line) is None:
+        return line
+    return _convert(line, MATCHER, ROWS, MEMO)
+
+
+def _convert(line, matcher, rows, memo=None):
+    # (str, HeadMatcher, dict(, ConversionMemo)) -> str
+    """
+    Parses a line and converts all the calls of functions marked in 'matcher'.
+
+    :param line: line to be converted
+    :param matcher: names of functions and exceptions, see 'HeadMatcher'
+    :param rows: rows of FUNCTION_CONVERSIONS, by function name
+    :param memo: calls already converted with 'matcher' and 'rows', if any
+    :returns: converted line
+    """
+    return _render(line, 0, len(line), parse(line, matcher), rows, memo)
+
+
+def _render(line, start, end, calls, rows, memo=None):
+    # (str, int, int, list, dict(, ConversionMemo)) -> str
+    """
+    Rebuilds a part of the line, with the calls in it converted.
+
+    :param line: line to be converted
+    :param start: start of the part
+    :param end: end of the part
+    :param calls: calls in the part, in order
+    :param rows: rows of FUNCTION_CONVERSIONS, by function name
+    :param memo: calls already converted, if any
+    :returns: converted part of the line
+    """
+    parts = []
+    for call in calls:
+        parts.append(line[start:call.start])
+        text, start = _convert_call(line, call, rows, memo)
+        parts.append(text)
+    parts.append(line[start:end])
+
+    return ''.join(parts)
+
+
+def _convert_call(line, call, rows, memo=None):
+    # (str, Call, dict(, ConversionMemo)) -> tuple
+    """
+    Converts a single call, after converting the calls in its arguments. A
+    call is looked up in 'memo' by its text, along with the power after it
+    for trig functions, since that changes how they are converted.
+
+    :param line: line to be converted
+    :param call: call to be converted
+    :param rows: rows of FUNCTION_CONVERSIONS, by function name
+    :param memo: calls already converted, if any
+    :returns: converted call and the index in the line where it ends
+    """
+    if memo is not None:
+        key = line[call.start:call.end]
+        if line[call.end:call.end + 1] == '^' and \
+                (call.head in TRIG_OUTER or call.head in TRIG_INNER):
+            key = line[call.start:call.end + 4]
+        known = memo.get(key)
+        if known is not None:
+            return known[0], call.start + known[1]
+
+    args = []
+    k = 0
+    for start, end in call.args:
+        inside = k
+        while k != len(call.children) and call.children[k].start < end:
+            k += 1
+        args.append(_render(line, start, end, call.children[inside:k], rows,
+                            memo))
+
+    if PROFILE is None:
+        converted = _fill(line, call, args, rows)
+    else:
+        start = time.time()
+        converted = _fill(line, call, args, rows)
+        PROFILE.add_row(call.head, time.time() - start)
+
+    if memo is not None:
+        memo.put(key, (converted[0], converted[1] - call.start))
+    return converted
+
+
+def _fill(line, call, args, rows):
+    # (str, Call, list, dict) -> tuple
+    """
+    Converts a single call, with its arguments already converted.
+
+    :param line: line to be converted
+    :param call: call to be converted
+    :param args: converted arguments
+    :param rows: rows of FUNCTION_CONVERSIONS, by function name
+    :returns: converted call and the index in the line where it ends
+    """
+    if call.head in SPECIAL_CONVERSIONS:
+        return SPECIAL_CONVERSIONS[call.head](args), call.end
+
+    return fill_template(rows[call.head], args, line, call)
+
+
+def fill_template(params, args, line, call):
+    # (tuple, list, str, Call) -> tuple
+    """
+    Fills in the template of a row of FUNCTION_CONVERSIONS.
+
+    :param params: tuple containing Mathematica function, equivalent LaTeX
+                   function, the format, using "-" as argument placings, and
+                   exceptions, if any
+    :param args: converted arguments of the call
+    :param line: line the call is in, as it was before conversion
+    :param call: call to be converted
+    :returns: converted call and the index in the line where it ends
+    """
+    m = params[0]
+    templates = TEMPLATES
+    if ROWS.get(m) != params:
+        templates = compile_templates((params,))
+    end = call.end
+
+    # Special functions that change the order of arguments:
+    if m == 'GegenbauerC':
+        args[0], args[1] = args[1], args[0]
+    if m == 'HarmonicNumber' and len(args) == 2:
+        args[0], args[1] = args[1], args[0]
+    if m == 'LaguerreL' and len(args) == 3:
+        args[0], args[1] = args[1], args[0]
+    if m in ('HypergeometricPFQ', 'QHypergeometricPFQ'):
+        if args[1] == '{}':
+            args.insert(0, '0')
         else:
-            pos = find_surrounding(line, m, ex=ex,
-                                   start=pos[0] + (0, len(l) + 1)
-                                   [(1, 0).index(pos[1] == pos[0])])
+            args.insert(0, str(len(arg_split(args[1][1:-1], ','))))
+        if args[1] == '{}':
+            args.insert(0, '0')
+        else:
+            args.insert(0, str(len(arg_split(args[1][1:-1], ','))))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + len(m) + 1:pos[1] - 1], ',')
-
-            # Special functions that change the order of arguments:
-            if m == 'GegenbauerC':
-                args[0], args[1] = args[1], args[0]
-            if m == 'HarmonicNumber' and len(args) == 2:
-                args[0], args[1] = args[1], args[0]
-            if m == 'LaguerreL' and len(args) == 3:
-                args[0], args[1] = args[1], args[0]
-            if m in ('HypergeometricPFQ', 'QHypergeometricPFQ'):
-                if args[1] == '{}':
-                    args.insert(0, 0)
-                else:
-                    args.insert(0, len(arg_split(args[1][1:-1], ',')))
-                if args[1] == '{}':
-                    args.insert(0, 0)
-                else:
-                    args.insert(0, len(arg_split(args[1][1:-1], ',')))
-
-            # If the arguments in a trig function are more than one variable,
-            # then instead of "@@" make it "@"
-            if (m in TRIG_OUTER or m in TRIG_INNER) and \
-                    sum([args[0].count(element) for element in multi]) != 0:
-                sep[0][0] = sep[0][0].replace('@@', '@')
-
-            # Add parens around ambiguous functions (trig functions)
-            if m in TRIG_OUTER and len(line) != pos[1] and line[pos[1]] == '^':
-                line = line[:pos[0]] + '(' + l + \
-                       '%s'.join(sep[[len(y) for y in sep]
-                                 .index(len(args) + 1)]) + ')' + line[pos[1]:]
-            # Add the inner square, like \cos^2{x}
-            elif m in TRIG_INNER and len(line) != pos[1] and \
-                    line[pos[1]] == '^':
-                if line[pos[1] + 1] == '{' and line[pos[1] + 3] == '}':
-                    line = line[:pos[0]] + l + line[pos[1]:pos[1] + 4] + \
-                           '%s'.join(sep[[len(y) for y in sep].
-                                     index(len(args) + 1)]) + line[pos[1] + 4:]
-                else:
-                    line = line[:pos[0]] + '(' + l + \
-                           '%s'.join(sep[[len(y) for y in sep].
-                                     index(len(args) + 1)]) + ')' + \
-                           line[pos[1]:]
-            else:
-                line = line[:pos[0]] + l + \
-                       '%s'.join(sep[[len(y) for y in sep].
-                                 index(len(args) + 1)]) + line[pos[1]:]
-            line %= tuple(args)
+    if (m, len(args)) not in templates:
+        raise ValueError('%s has no template with %d arguments' %
+                         (m, len(args)))
 
-    return line
+    # If the arguments in a trig function are more than one variable,
+    # then instead of "@@" make it "@"
+    first = line[call.args[0][0]:call.args[0][1]]
+    formats = templates[m, len(args)][
+        '+' in first or '-' in first or '*' in first or '/' in first]
+
+    # Add parens around ambiguous functions (trig functions)
+    if m in TRIG_OUTER and line[end:end + 1] == '^':
+        return formats[1].format(*args), end
+    # Add the inner square, like \cos^2{x}
+    elif m in TRIG_INNER and line[end:end + 1] == '^':
+        if line[end + 1:end + 2] == '{' and line[end + 3:end + 4] == '}':
+            return formats[2].format(*args, power=line[end:end + 4]), end + 4
+        return formats[1].format(*args), end
+
+    return formats[0].format(*args), end
 
 
 def remove_inactive(line):
@@ -350,28 +561,20 @@ def beta(line):
     :param line: line to be convertedmathematica_to_latex.py:324
     :returns: converted line
     """
-    for _ in range(line.count('Beta')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'Beta',
-                                   ex=('BetaRegularized', '[Beta]'))
-        else:
-            pos = find_surrounding(line, 'Beta',
-                                   ex=('BetaRegularized', '[Beta]'),
-                                   start=pos[0] + (0, 9)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('Beta',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 5:pos[1] - 1], ',')
-            if len(args) == 2:
-                line = (line[:pos[0]] + '\\EulerBeta@{{{0}}}{{{1}}}'
-                        .format(args[0], args[1]) + line[pos[1]:])
-            else:
-                line = (line[:pos[0]] + '\\IncBeta{{{0}}}@{{{1}}}{{{2}}}'
-                        .format(args[0], args[1], args[2]) + line[pos[1]:])
 
-    return line
+def _beta(args):
+    # (list) -> str
+    """
+    Template for 'Beta', see 'beta'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    if len(args) == 2:
+        return '\\EulerBeta@{{{0}}}{{{1}}}'.format(args[0], args[1])
+    return '\\IncBeta{{{0}}}@{{{1}}}{{{2}}}'.format(args[0], args[1], args[2])
 
 
 def cfk(line):
@@ -382,31 +585,23 @@ def cfk(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('ContinuedFractionK')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'ContinuedFractionK', ex='')
-        else:
-            pos = find_surrounding(line, 'ContinuedFractionK', ex='',
-                                   start=pos[0] + (0, 5)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('ContinuedFractionK',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 19:pos[1] - 1], ',')
-            moreargs = arg_split(args[-1][1:-1], ',')
-            if len(args) == 3:
-                line = (line[:pos[0]] +
-                        '\\CFK{{{0}}}{{{1}}}{{{2}}}@@{{{3}}}{{{4}}}'
-                        .format(moreargs[0], moreargs[1], moreargs[2],
-                                args[0], args[1]) + line[pos[1]:])
-            else:
-                line = (line[:pos[0]] +
-                        '\\CFK{{{0}}}{{{1}}}{{{2}}}@@{{1}}{{{3}}}'
-                        .format(moreargs[0], moreargs[1], moreargs[2],
-                                args[0]) + line[pos[1]:])
 
-    return line
+def _cfk(args):
+    # (list) -> str
+    """
+    Template for 'ContinuedFractionK', see 'cfk'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    moreargs = arg_split(args[-1][1:-1], ',')
+    if len(args) == 3:
+        return '\\CFK{{{0}}}{{{1}}}{{{2}}}@@{{{3}}}{{{4}}}' \
+            .format(moreargs[0], moreargs[1], moreargs[2], args[0], args[1])
+    return '\\CFK{{{0}}}{{{1}}}{{{2}}}@@{{1}}{{{3}}}' \
+        .format(moreargs[0], moreargs[1], moreargs[2], args[0])
 
 
 def gamma(line):
@@ -418,39 +613,23 @@ def gamma(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('Gamma')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'Gamma',
-                                   ex=('PolyGamma', 'CapitalGamma', 'LogGamma',
-                                       'EulerGamma', 'IncGamma', 'Gamma]',
-                                       'GammaQ', 'GammaRegularized',
-                                       'StieltjesGamma'))
-        else:
-            pos = find_surrounding(line, 'Gamma',
-                                   ex=('PolyGamma', 'CapitalGamma', 'LogGamma',
-                                       'EulerGamma', 'IncGamma', 'Gamma]',
-                                       'GammaQ', 'GammaRegularized',
-                                       'StieltjesGamma'),
-                                   start=pos[0] + (0, 11)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('Gamma',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 6:pos[1] - 1], ',')
-            if len(args) == 1:
-                line = (line[:pos[0]] + '\\EulerGamma@{{{0}}}'
-                        .format(args[0]) + line[pos[1]:])
-            elif len(args) == 2:
-                line = (line[:pos[0]] + '\\IncGamma@{{{0}}}{{{1}}}'
-                        .format(args[0], args[1]) + line[pos[1]:])
-            else:
-                line = (line[:pos[0]] + '\\Incgamma@{{{0}}}{{{1}}} - '
-                        .format(args[0], args[1]) + '\\Incgamma@{{{0}}}{{{1}}}'
-                        .format(args[0], args[2]) + line[pos[1]:])
 
-    return line.replace('Incgamma', 'IncGamma')
-    # needed or the addition of an 'IncGamma' would screw up the rest
+def _gamma(args):
+    # (list) -> str
+    """
+    Template for 'Gamma', see 'gamma'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    if len(args) == 1:
+        return '\\EulerGamma@{{{0}}}'.format(args[0])
+    elif len(args) == 2:
+        return '\\IncGamma@{{{0}}}{{{1}}}'.format(args[0], args[1])
+    return ('\\IncGamma@{{{0}}}{{{1}}} - '.format(args[0], args[1]) +
+            '\\IncGamma@{{{0}}}{{{1}}}'.format(args[0], args[2]))
 
 
 def integrate(line):
@@ -461,24 +640,20 @@ def integrate(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('Integrate')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'Integrate', ex='')
-        else:
-            pos = find_surrounding(line, 'Integrate', ex='',
-                                   start=pos[0] + (0, 10)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('Integrate',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 10:pos[1] - 1], ',')
-            moreargs = arg_split(args[1][1:-1], ',')
-            line = (line[:pos[0]] + '\\int_{{{1}}}^{{{2}}}{{{3}}}d{{{0}}}'
-                    .format(moreargs[0], moreargs[1], moreargs[2], args[0]) +
-                    line[pos[1]:])
 
-    return line
+def _integrate(args):
+    # (list) -> str
+    """
+    Template for 'Integrate', see 'integrate'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    moreargs = arg_split(args[1][1:-1], ',')
+    return '\\int_{{{1}}}^{{{2}}}{{{3}}}d{{{0}}}' \
+        .format(moreargs[0], moreargs[1], moreargs[2], args[0])
 
 
 def legendrep(line):
@@ -490,32 +665,25 @@ def legendrep(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('LegendreP')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'LegendreP', ex='')
-        else:
-            pos = find_surrounding(line, 'LegendreP', ex='',
-                                   start=pos[0] + (0, 10)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('LegendreP',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 10:pos[1] - 1], ',')
-            if len(args) == 2:
-                line = (line[:pos[0]] + '\\LegendreP{{{0}}}@{{{1}}}'
-                        .format(args[0], args[1]) + line[pos[1]:])
-            else:
-                # len(args) == 4
-                if args[2] in ('1', '2'):
-                    line = (line[:pos[0]] + '\\FerrersP[{1}]{{{0}}}@{{{2}}}'
-                            .format(args[0], args[1], args[3]) + line[pos[1]:])
-                else:
-                    # args[2] == 3
-                    line = (line[:pos[0]] + '\\LegendreP[{1}]{{{0}}}@{{{2}}}'
-                            .format(args[0], args[1], args[3]) + line[pos[1]:])
 
-    return line
+def _legendrep(args):
+    # (list) -> str
+    """
+    Template for 'LegendreP', see 'legendrep'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    if len(args) == 2:
+        return '\\LegendreP{{{0}}}@{{{1}}}'.format(args[0], args[1])
+    # len(args) == 4
+    if args[2] in ('1', '2'):
+        return '\\FerrersP[{1}]{{{0}}}@{{{2}}}'.format(args[0], args[1],
+                                                      args[3])
+    # args[2] == 3
+    return '\\LegendreP[{1}]{{{0}}}@{{{2}}}'.format(args[0], args[1], args[3])
 
 
 def legendreq(line):
@@ -527,32 +695,25 @@ def legendreq(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('LegendreQ')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'LegendreQ', ex='')
-        else:
-            pos = find_surrounding(line, 'LegendreQ', ex='',
-                                   start=pos[0] + (0, 10)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('LegendreQ',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 10:pos[1] - 1], ',')
-            if len(args) == 2:
-                line = (line[:pos[0]] + '\\LegendreQ{{{0}}}@{{{1}}}'
-                        .format(args[0], args[1]) + line[pos[1]:])
-            else:
-                # len(args) == 4
-                if args[2] in ('1', '2'):
-                    line = (line[:pos[0]] + '\\FerrersQ[{1}]{{{0}}}@{{{2}}}'
-                            .format(args[0], args[1], args[3]) + line[pos[1]:])
-                else:
-                    # args[2] == 3
-                    line = (line[:pos[0]] + '\\LegendreQ[{1}]{{{0}}}@{{{2}}}'
-                            .format(args[0], args[1], args[3]) + line[pos[1]:])
 
-    return line
+def _legendreq(args):
+    # (list) -> str
+    """
+    Template for 'LegendreQ', see 'legendreq'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    if len(args) == 2:
+        return '\\LegendreQ{{{0}}}@{{{1}}}'.format(args[0], args[1])
+    # len(args) == 4
+    if args[2] in ('1', '2'):
+        return '\\FerrersQ[{1}]{{{0}}}@{{{2}}}'.format(args[0], args[1],
+                                                      args[3])
+    # args[2] == 3
+    return '\\LegendreQ[{1}]{{{0}}}@{{{2}}}'.format(args[0], args[1], args[3])
 
 
 def polyeulergamma(line):
@@ -564,26 +725,20 @@ def polyeulergamma(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('PolyGamma')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'PolyGamma', ex='')
-        else:
-            pos = find_surrounding(line, 'PolyGamma', ex='',
-                                   start=pos[0] + (0, 10)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('PolyGamma',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 10:pos[1] - 1], ',')
-            if len(args) == 2:
-                line = (line[:pos[0]] + '\\polygamma{{{0}}}@{{{1}}}'
-                        .format(args[0], args[1]) + line[pos[1]:])
-            else:
-                line = (line[:pos[0]] + '\\digamma@{{{0}}}'
-                        .format(args[0]) + line[pos[1]:])
 
-    return line
+def _polyeulergamma(args):
+    # (list) -> str
+    """
+    Template for 'PolyGamma', see 'polyeulergamma'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    if len(args) == 2:
+        return '\\polygamma{{{0}}}@{{{1}}}'.format(args[0], args[1])
+    return '\\digamma@{{{0}}}'.format(args[0])
 
 
 def product(line):
@@ -594,24 +749,20 @@ def product(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('Product')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'Product', ex='')
-        else:
-            pos = find_surrounding(line, 'Product', ex='',
-                                   start=pos[0] + (0, 6)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('Product',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 8:pos[1] - 1], ',')
-            moreargs = arg_split(args[-1][1:-1], ',')
-            line = (line[:pos[0]] + '\\Prod{{{0}}}{{{1}}}{{{2}}}@{{{3}}}'
-                    .format(moreargs[0], moreargs[1], moreargs[2], args[0]) +
-                    line[pos[1]:])
 
-    return line
+def _product(args):
+    # (list) -> str
+    """
+    Template for 'Product', see 'product'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    moreargs = arg_split(args[-1][1:-1], ',')
+    return '\\Prod{{{0}}}{{{1}}}{{{2}}}@{{{3}}}' \
+        .format(moreargs[0], moreargs[1], moreargs[2], args[0])
 
 
 def qpochhammer(line):
@@ -623,30 +774,26 @@ def qpochhammer(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('QPochhammer')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'QPochhammer', ex='')
-        else:
-            pos = find_surrounding(line, 'QPochhammer', ex='',
-                                   start=pos[0] + (0, 13)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('QPochhammer',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 12:pos[1] - 1], ',')
 
-            if len(args) == 1:
-                line = (line[:pos[0]] + '\\qPochhammer{{{0}}}{{{1}}}{2}'
-                        .format(args[0], args[0], '{\\infty}') + line[pos[1]:])
-            elif len(args) == 2:
-                line = (line[:pos[0]] + '\\qPochhammer{{{0}}}{{{1}}}{2}'
-                        .format(args[0], args[1], '{\\infty}') + line[pos[1]:])
-            else:  # len(args) = 3
-                line = (line[:pos[0]] + '\\qPochhammer{{{0}}}{{{1}}}{{{2}}}'
-                        .format(args[0], args[1], args[2]) + line[pos[1]:])
+def _qpochhammer(args):
+    # (list) -> str
+    """
+    Template for 'QPochhammer', see 'qpochhammer'.
 
-    return line
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    if len(args) == 1:
+        return '\\qPochhammer{{{0}}}{{{1}}}{2}'.format(args[0], args[0],
+                                                       '{\\infty}')
+    elif len(args) == 2:
+        return '\\qPochhammer{{{0}}}{{{1}}}{2}'.format(args[0], args[1],
+                                                       '{\\infty}')
+    # len(args) = 3
+    return '\\qPochhammer{{{0}}}{{{1}}}{{{2}}}'.format(args[0], args[1],
+                                                      args[2])
 
 
 def summation(line):
@@ -657,24 +804,32 @@ def summation(line):
     :param line: line to be converted
     :returns: converted line
     """
-    for _ in range(line.count('Sum')):
-        try:
-            pos
-        except NameError:
-            pos = find_surrounding(line, 'Sum', ex='')
-        else:
-            pos = find_surrounding(line, 'Sum', ex='',
-                                   start=pos[0] + (0, 5)
-                                   [(1, 0).index(pos[1] == pos[0])])
+    return convert_functions(line, ('Sum',))
 
-        if pos[0] != pos[1]:
-            args = arg_split(line[pos[0] + 4:pos[1] - 1], ',')
-            moreargs = arg_split(args[-1][1:-1], ',')
-            line = (line[:pos[0]] + '\\Sum{{{0}}}{{{1}}}{{{2}}}@{{{3}}}'
-                    .format(moreargs[0], moreargs[1], moreargs[2], args[0]) +
-                    line[pos[1]:])
 
-    return line
+def _summation(args):
+    # (list) -> str
+    """
+    Template for 'Sum', see 'summation'.
+
+    :param args: converted arguments
+    :returns: LaTeX macro
+    """
+    moreargs = arg_split(args[-1][1:-1], ',')
+    return '\\Sum{{{0}}}{{{1}}}{{{2}}}@{{{3}}}' \
+        .format(moreargs[0], moreargs[1], moreargs[2], args[0])
+
+
+# Converters for the functions that do not fit a template in 'functions',
+# along with the names that contain them but should not be converted
+SPECIAL_CONVERSIONS = {'Beta': _beta, 'ContinuedFractionK': _cfk,
+                       'Gamma': _gamma, 'Integrate': _integrate,
+                       'LegendreP': _legendrep, 'LegendreQ': _legendreq,
+                       'PolyGamma': _polyeulergamma, 'Product': _product,
+                       'QPochhammer': _qpochhammer, 'Sum': _summation}
+SPECIAL_EXCEPTIONS = ('BetaRegularized', 'PolyGamma', 'CapitalGamma',
+                      'LogGamma', 'EulerGamma', 'IncGamma', 'GammaQ',
+                      'GammaRegularized', 'StieltjesGamma')
 
 
 def constraint(line):
@@ -761,6 +916,63 @@ def convert_fraction(line):
     Converts Mathematica fractions, which are only '/', to LaTeX
     \\frac{}{}-ions.
 
+    Nested fractions are found in the original line and the line is written
+    out once, instead of being rebuilt at every fraction. A fraction converted
+    earlier leaves a brace where its '/' was, so the numerator of the next
+    one in its denominator starts after that '/'.
+
+    :param line: line to be converted
+    :returns: converted line
+    """
+    if line.count('/(') <= IN_PLACE_LIMIT:
+        return _convert_fraction_in_place(line)
+
+    index = BracketIndex(line)
+    sign = list('*+-=,<>&')
+    left = sign + ['/']
+    before = {}
+    replaced = {}
+    after = {}
+    i = line.find('/')
+    while i != -1:
+        j = index.search(i, left, -1)
+        k = index.search(i, sign, 1)
+        if j is None or k is None or j + 1 in before or i + 1 == len(line):
+            return _convert_fraction_in_place(line)
+        k -= 1
+
+        edits = [(i, '}{')]
+        # Removes extra surrounding parentheses, if there are any; see
+        # '_convert_fraction_in_place' for the ones that do not pair up
+        if line[j + 1] == '(' and line[i - 1] == ')':
+            if index.partner.get(j + 1) != i - 1:
+                return _convert_fraction_in_place(line)
+            edits += [(j + 1, ''), (i - 1, '')]
+        if line[i + 1] == '(' and line[k] == ')':
+            if index.partner.get(i + 1) != k:
+                return _convert_fraction_in_place(line)
+            edits += [(i + 1, ''), (k, '}')]
+        else:
+            after[k] = after.get(k, '') + '}'
+
+        for position, text in edits:
+            if position in replaced or position in before:
+                return _convert_fraction_in_place(line)
+            replaced[position] = text
+        before[j + 1] = '\\frac{'
+
+        i = line.find('/', i + 1)
+
+    return _rewrite(line, before, replaced, after)
+
+
+def _convert_fraction_in_place(line):
+    # (str) -> str
+    """
+    Works like 'convert_fraction', rebuilding the line at every fraction. Used
+    for lines with few nested fractions, brackets that do not pair up, or a
+    '/' at the very end.
+
     :param line: line to be converted
     :returns: converted line
     """
@@ -803,6 +1015,31 @@ def convert_fraction(line):
     return line
 
 
+def _rewrite(line, before, replaced, after):
+    # (str, dict, dict, dict) -> str
+    """
+    Writes out a line with edits at some of its characters, in one pass.
+
+    :param line: line to be edited
+    :param before: text to insert before a character, by index
+    :param replaced: text to replace a character with, by index
+    :param after: text to insert after a character, by index
+    :returns: edited line
+    """
+    chunks = []
+    last = 0
+
+    for i in sorted(set(before) | set(replaced) | set(after)):
+        chunks.append(line[last:i])
+        chunks.append(before.get(i, ''))
+        chunks.append(replaced.get(i, line[i]))
+        chunks.append(after.get(i, ''))
+        last = i + 1
+    chunks.append(line[last:])
+
+    return ''.join(chunks)
+
+
 def piecewise(line):
     # (str) -> str
     """
@@ -846,177 +1083,752 @@ def replace_operators(line):
     :param line: line to be converted
     :returns: converted line
     """
-    line = line.replace('==', '=')
-    line = line.replace('!=', ' \\ne ')
-    line = line.replace('||', ' \\lor ')
-    line = line.replace('>=', ' \\geq ')
-    line = line.replace('<=', ' \\leq ')
-    line = line.replace('LessEqual', ' \\leq ')
-    line = line.replace('Less', '<')
-    line = line.replace('>', ' > ')
-    line = line.replace('<', ' < ')
-    line = line.replace('=', ' = ')
-    line = line.replace('^', ' ^ ')
-    line = line.replace('*', ' ')
-    line = line.replace('+', ' + ')
-    line = line.replace('-', ' - ')
-    line = line.replace(',', ', ')
+    return _substitute(line, OPERATORS, CONSTRAINT_OPERATORS)
+
+
+def replace_vars(line):
+    # (str) -> str
+    """
+    Replaces the easy to convert variables in Mathematica to its equivalent
+    LaTeX code in the dictionary 'symbols'.
+
+    :param line: line to be converted
+    :returns: converted line
+    """
+    return VARIABLES.sub(line)
+
+
+def replace_operators_and_vars(line):
+    # (str) -> str
+    """
+    Does what 'replace_operators' and then 'replace_vars' do, in one pass.
+    Variables that 'replace_operators' would already have changed, like the
+    'Pi' in '\\[CapitalPi]', are left to it, as before.
+
+    :param line: line to be converted
+    :returns: converted line
+    """
+    return _substitute(line, OPERATORS_AND_VARIABLES,
+                       CONSTRAINT_OPERATORS_AND_VARIABLES)
+
+
+def _substitute(line, substitution, constraint_substitution):
+    # (str, Substitution, Substitution) -> str
+    """
+    Replaces operators in a line, with one substitution before the constraint
+    and another in it.
 
+    :param line: line to be converted
+    :param substitution: substitution for the part before the constraint
+    :param constraint_substitution: substitution for the constraint
+    :returns: converted line
+    """
     # This is so that things in a constraint, which is denoted by percentage
-    # signs, don't get operators converted
+    # signs, don't get parentheses converted or spaces removed
     if '%' in line:
         parts = (line[:line.index('%')], line[line.index('%'):])
-        line = parts[0]
-        line = line.replace('(', '\\left( ')
-        line = line.replace(')', ' \\right)')
-        line = line.replace('  ', ' ')
-        line += parts[1]
+        line = (substitution.sub(parts[0]).replace('  ', ' ') +
+                constraint_substitution.sub(parts[1]))
     else:
-        line = line.replace('(', '\\left( ')
-        line = line.replace(')', ' \\right)')
-        line = line.replace('  ', ' ')
-
-    line = line.replace('"a"', 'a')
-    line = line.replace('Catalan', '\\CatalansConstant')
-    line = line.replace('GoldenRatio', '\\GoldenRatio')
-    line = line.replace('Pi', '\\pi')
-    line = line.replace('CalculateData`Private`nu', '\\nu')
-    line = line.replace('\\Jacobisn@{t}{m ^ {2}} ^ {2}',
-                        '\\Jacobisn^{2}@{t}{m ^ {2}}')
-
-    # Replaces "E" constant with "\\expe"
-    for word in E_EXCEPT:
-        line = line.replace(word, word.replace('E', 'A'))
-    line = line.replace('E', '\\expe')
-    for word in E_EXCEPT:
-        line = line.replace(word.replace('E', 'A'), word)
+        line = substitution.sub(line).replace('  ', ' ')
+
+    if '\\Jacobisn' in line:
+        line = line.replace('\\Jacobisn@{t}{m ^ {2}} ^ {2}',
+                            '\\Jacobisn^{2}@{t}{m ^ {2}}')
 
     return line
 
 
-def replace_vars(line):
+def _equals(text):
     # (str) -> str
     """
-    Replaces the easy to convert variables in Mathematica to its equivalent
-    LaTeX code in the dictionary 'symbols'.
+    Replaces a run of '=', which may have '!', '<' or '>' in front. Every '=='
+    counts as one '=', and the first '=' goes with the sign in front of it.
 
-    :param line: line to be converted
-    :returns: converted line
+    :param text: text to be replaced
+    :returns: replacement
+    """
+    sign = text.rstrip('=')
+    count = (len(text) - len(sign) + 1) // 2
+    return EQUALS[sign] + ' = ' * (count - 1)
+
+
+def _variables_table():
+    # () -> dict
     """
+    Builds the replacements made by 'replace_vars', from 'SYMBOLS'.
+
+    :returns: dictionary of replacements
+    """
+    table = {}
     for word in SYMBOLS:
         if SYMBOLS[word][0] == ' ':
-            line = line.replace('\\[' + word + ']', SYMBOLS[word][1:])
+            table['\\[' + word + ']'] = SYMBOLS[word][1:]
         elif word == 'Infinity':
-            line = line.replace('Infinity', '\\infty')
+            table['Infinity'] = '\\infty'
         else:
-            line = line.replace('[' + word + ']', SYMBOLS[word])
+            table['[' + word + ']'] = SYMBOLS[word]
+
+    return table
+
+
+def convert_identity(line):
+    # (str) -> str
+    """
+    Converts one line of Mathematica to LaTeX, with every stage in STAGES.
+    Only depends on the conversion tables, so lines can be converted in any
+    order, or in other processes.
+
+    :param line: line to be converted, without the newline
+    :returns: converted line
+    """
+    if PROFILE is not None:
+        return _convert_profiled(line)
+
+    for _, stage in STAGES:
+        line = stage(line)
 
     return line
 
 
+def _convert_profiled(line):
+    # (str) -> str
+    """
+    Works like 'convert_identity', recording how long every stage and the
+    whole line take in PROFILE.
+
+    :param line: line to be converted, without the newline
+    :returns: converted line
+    """
+    original = line
+    begin = time.time()
+    for name, stage in STAGES:
+        start = time.time()
+        line = stage(line)
+        PROFILE.add_stage(name, time.time() - start)
+    if original:
+        PROFILE.add_line(original, time.time() - begin)
+
+    return line
+
+
+def _remove_spaces(line):
+    # (str) -> str
+    """
+    Removes the spaces in a line, before it is converted.
+
+    :param line: line to be converted
+    :returns: converted line
+    """
+    return line.replace(' ', '')
+
+
+def _euler_constant(line):
+    # (str) -> str
+    """
+    Replaces 'EulerGamma', before 'Gamma' is converted.
+
+    :param line: line to be converted
+    :returns: converted line
+    """
+    return line.replace('EulerGamma', '\\EulerConstant')
+
+
+# Stages of 'convert_identity', in order, with the names they have in a
+# 'ConversionProfile'
+STAGES = (('remove_spaces', _remove_spaces),
+          ('remove_inactive', remove_inactive),
+          ('remove_conditionalexpression', remove_conditionalexpression),
+          ('remove_symbol', remove_symbol),
+          ('euler_constant', _euler_constant),
+          ('carat', carat),
+          ('convert_functions', convert_functions),
+          ('convert_fraction', convert_fraction),
+          ('constraint', constraint),
+          ('piecewise', piecewise),
+          ('replace_operators_and_vars', replace_operators_and_vars))
+
+
+def _convert_entry(line):
+    # (str) -> str
+    """
+    Converts a line of the identities file, leaving the comments with the
+    Mathematica tags to 'iter_convert'.
+
+    :param line: line to be converted, without the newline
+    :returns: converted line, or None for a comment
+    """
+    if _is_tag(line):
+        return None
+    return convert_identity(line)
+
+
+def _is_tag(line):
+    # (str) -> bool
+    """
+    Checks whether a line of the identities file is a comment with the
+    Mathematica tag of the next identity.
+
+    :param line: line to be checked
+    :returns: whether the line is a comment
+    """
+    return '(*' in line and '*)' in line
+
+
+def _imap(function, items, jobs, watchdog=None):
+    # (function, iterable, int(, Watchdog)) -> generator
+    """
+    Applies a function to every item, in order. With more than one job, the
+    items, which must then be a list, are handed to a pool of processes in
+    chunks. With a watchdog, the items are handed to its workers instead.
+
+    :param function: function to be applied, defined at the module level
+    :param items: items to be converted
+    :param jobs: number of processes
+    :param watchdog: watchdog to convert the items under, if any
+    :returns: generator of the results, with a Fault for every item the
+              watchdog quarantined
+    """
+    if watchdog is not None:
+        for item in watchdog.imap(function, items):
+            yield item
+        return
+
+    if jobs <= 1 or len(items) <= 1:
+        for item in itertools.imap(function, items):
+            yield item
+        return
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        chunk_size = max(1, len(items) // (jobs * CHUNKS_PER_JOB))
+        for item in pool.imap(function, items, chunk_size):
+            yield item
+    finally:
+        pool.terminate()
+
+
+def cache_key(line):
+    # (str) -> str
+    """
+    Makes the key of a line in the conversion cache, from the line, the code
+    of the converter and the templates of the functions named in the line, so
+    that editing a template only affects the lines that use it.
+
+    :param line: line of the identities file
+    :returns: key of the line
+    """
+    stripped = line.replace(' ', '')
+    parts = [CODE_VERSION, line]
+    parts.extend(digest for name, digest in ROW_DIGESTS if name in stripped)
+
+    return hashlib.sha1('\n'.join(parts)).hexdigest()
+
+
+def _convert_cached(lines, jobs, cache, watchdog=None):
+    # (list, int, ConversionCache(, Watchdog)) -> list
+    """
+    Converts the lines of the identities file, taking the lines converted
+    before from the cache, and storing the others.
+
+    :param lines: lines to be converted
+    :param jobs: number of processes converting lines
+    :param cache: cache of converted lines
+    :param watchdog: watchdog to convert the lines under, if any
+    :returns: list of converted lines, with None for comments, and a Fault
+              for the lines the watchdog quarantined, which are not stored
+    """
+    keys = [None if _is_tag(line) else cache_key(line) for line in lines]
+    converted = [None if key is None else cache.get(key) for key in keys]
+
+    missing = [i for i, key in enumerate(keys)
+               if key is not None and converted[i] is None]
+    for i, line in zip(missing, _imap(convert_identity,
+                                      [lines[i] for i in missing], jobs,
+                                      watchdog)):
+        converted[i] = line
+        if not isinstance(line, Fault):
+            cache.put(keys[i], line)
+
+    cache.commit()
+    return converted
+
+
+def convert_line(line, references=None, tag=None):
+    # (str(, dict, str)) -> str
+    """
+    Converts one line of the identities file to what goes in
+    newIdentities.tex: a comment with a Mathematica tag opens an equation,
+    and the identity after it is converted and closes it. Use 'iter_convert'
+    to keep track of the tags over a whole file.
+
+    :param line: line to be converted, without the newline
+    :param references: references of the identities, by tag
+    :param tag: Mathematica tag of the identity, from the comment before it
+    :returns: LaTeX of the line
+    """
+    return _format_entry(_convert_entry(line), references, tag)
+
+
+def iter_convert(lines, references=None, jobs=1, cache=None, watchdog=None):
+    # (iterable(, dict, int, ConversionCache, Watchdog)) -> generator
+    """
+    Converts the lines of an identities file, in order. An expression
+    wrapped over several lines is joined into one first, see
+    'read_expressions'. With one job, no cache and no watchdog, each line is
+    converted as it is read; otherwise all of the lines are read first, see
+    'main'.
+
+    :param lines: lines to be converted, with or without the newlines
+    :param references: references of the identities, by tag
+    :param jobs: number of processes converting lines
+    :param cache: cache of converted lines, if any
+    :param watchdog: watchdog to convert the lines under, if any
+    :returns: generator of (tag, latex) pairs, one for every joined line, with
+              the tag of the identity the line belongs to, or None before the
+              first one
+    """
+    for tag, _, latex in _iter_entries(lines, references, jobs, cache,
+                                       watchdog=watchdog):
+        yield tag, latex
+
+
+def _iter_entries(lines, references=None, jobs=1, cache=None,
+                  manifest=None, watchdog=None):
+    # (iterable(, dict, int, ConversionCache, OutputManifest,
+    #   Watchdog)) -> generator
+    """
+    Converts the lines of an identities file, like 'iter_convert'. With the
+    manifest of the previous output, the identities whose key is in it are
+    copied from there, and only the others are converted. With a watchdog,
+    the identities it quarantines are recorded in it with their tag, and
+    their equation only holds a comment with the error.
+
+    :param lines: lines to be converted, with or without the newlines
+    :param references: references of the identities, by tag
+    :param jobs: number of processes converting lines
+    :param cache: cache of converted lines, if any
+    :param manifest: manifest of the previous output, if any
+    :param watchdog: watchdog to convert the lines under, if any
+    :returns: generator of (tag, key, latex) triples, with the key of every
+              identity if there is a manifest, and None otherwise or if the
+              identity was quarantined
+    """
+    lines = read_expressions(lines)
+    copied = {}
+    if jobs <= 1 and cache is None and manifest is None and watchdog is None:
+        lines, items = itertools.tee(lines)
+        keys = itertools.repeat(None)
+    else:
+        lines = list(lines)
+        keys = [None] * len(lines)
+        if manifest is not None:
+            tag = None
+            for i, line in enumerate(lines):
+                if _is_tag(line):
+                    tag = _read_tag(line)
+                elif line:
+                    reference = (references or {}).get(tag)
+                    keys[i] = entry_key(line, tag, reference)
+                    block = manifest.get(keys[i])
+                    if block is not None:
+                        copied[i] = block
+        items = [line for i, line in enumerate(lines) if i not in copied]
+
+    if cache is None:
+        converted = _imap(_convert_entry, items, jobs, watchdog)
+    else:
+        converted = iter(_convert_cached(items, jobs, cache, watchdog))
+
+    tag = None
+    for i, (line, key) in enumerate(itertools.izip(lines, keys)):
+        if i in copied:
+            yield tag, key, copied[i]
+            continue
+
+        latex = next(converted)
+        if isinstance(latex, Fault):
+            watchdog.quarantine(tag, line, latex)
+            yield tag, None, _format_entry(
+                '%  quarantined: ' + latex.error.replace('\n', ' '),
+                references, tag)
+            continue
+        if latex is None:
+            tag = _read_tag(line)
+        elif PROFILE is not None:
+            PROFILE.label(line, tag)
+        yield tag, key, _format_entry(latex, references, tag)
+
+
+def _read_tag(line):
+    # (str) -> str
+    """
+    Reads the Mathematica tag from its comment in the identities file.
+
+    :param line: comment with the tag
+    :returns: tag
+    """
+    return line[4:-3].replace('"', '')
+
+
+def entry_key(line, tag, reference):
+    # (str, str, str) -> str
+    """
+    Makes the key of an identity in the manifest of newIdentities.tex, from
+    everything its block depends on: its line, its tag and its reference, and
+    the code of the converter with all of the templates. Unlike 'cache_key',
+    editing any template changes every key, which is quicker to check; the
+    conversion cache still keeps the identities that do not use it.
+
+    :param line: line of the identity
+    :param tag: Mathematica tag of the identity, if any
+    :param reference: reference of the identity, if any
+    :returns: key of the identity
+    """
+    return hashlib.sha1('\n'.join((CODE_VERSION, TABLE_VERSION, line,
+                                   tag or '', reference or ''))).hexdigest()
+
+
+def _format_entry(latex, references, tag):
+    # (str, dict, str) -> str
+    """
+    Puts a converted line of the identities file in its equation, with its
+    tag and reference.
+
+    :param latex: converted line, or None for a comment
+    :param references: references of the identities, by tag, if any
+    :param tag: Mathematica tag of the identity, if any
+    :returns: LaTeX of the line
+    """
+    if latex is None:
+        return '\\begin{equation}'
+    if latex == '':
+        return latex
+
+    if tag is not None:
+        latex += '\n%  \\mathematicatag{$\\tt{' + tag + '}$}'
+        if references and tag in references:
+            latex += '\n%  \\mathematicareference{$\\text{' + \
+                     references[tag] + '}$}'
+
+    return '  ' + latex + '\n\\end{equation}'
+
+
 def main(pathw=DIR_NAME + 'newIdentities.tex',
          pathr=DIR_NAME + 'Identities.m',
-         pathref=DIR_NAME + 'References.txt'):
-    # ((str, str)) -> None
+         pathref=DIR_NAME + 'References.txt',
+         jobs=1, cache=None, verbose=False, manifest=None, profile=None,
+         watchdog=None):
+    # ((str, str, str, int, ConversionCache, bool, OutputManifest,
+    #   ConversionProfile, Watchdog)) -> None
     """
     Opens Mathematica file with identities and puts converted lines into
-    newIdentities.tex.
+    newIdentities.tex. The file is read an expression at a time, so an identity
+    may be wrapped over several lines. With more than one job, the lines are
+    converted in a pool of processes, in chunks, and written in their original
+    order. With a cache, only the lines that are not in it are converted. With
+    the manifest of newIdentities.tex, the identities that have not changed
+    since it was last generated are copied from it, and the manifest is
+    rewritten. With a profile, the time spent on every line is recorded in it,
+    and the lines are converted in this process. With a watchdog, the lines are
+    converted by its workers, and the identities that raise or run out of time
+    are quarantined in it instead of stopping the run.
 
     :param pathw: directory of file to be written to
     :param pathr: directory of file to be read from
     :param pathref: directory of file with references to be inserted
+    :param jobs: number of processes converting lines
+    :param cache: cache of converted lines, if any
+    :param verbose: whether to print every converted line
+    :param manifest: manifest of the file to be written to, if any
+    :param profile: profile to record the timings in, if any
+    :param watchdog: watchdog to convert the lines under, if any
     :returns: None
     """
-    references = process_references(pathref)
-
-    with open(pathw, 'w') as latex:
-        with open(pathr, 'r') as mathematica:
-
-            latex.write('\n\\documentclass{article}\n\n'
-                        '\\usepackage{amsmath}\n'
-                        '\\usepackage{amsfonts}\n'
-                        '\\usepackage{amssymb}\n'
-                        '\\usepackage{breqn}\n'
-                        '\\usepackage{DLMFmath}\n'
-                        '\\usepackage{DRMFfcns}\n'
-                        '\\usepackage[paperwidth=15in, paperheight=20in, '
-                        'margin=0.5in]{geometry}\n\n'
-                        '\\begin{document}\n\n\n')
-
-            for line in mathematica:
-                line = line.replace('\n', '')
-
-                if '(*' in line and '*)' in line:
-                    mtt = line[4:-3].replace('"', '')
-                    line = '\\begin{equation}'
-                    latex.write(line + '\n')
-                else:
-                    line = line.replace(' ', '')
-
-                    line = remove_inactive(line)
-                    line = remove_conditionalexpression(line)
-                    line = remove_symbol(line)
-
-                    line = line.replace('EulerGamma', '\\EulerConstant')
-
-                    line = carat(line)
-
-                    for func in FUNCTION_CONVERSIONS:
-                        line = master_function(line, func)
-
-                    line = beta(line)
-                    line = cfk(line)
-                    line = gamma(line)
-                    line = integrate(line)
-                    line = legendrep(line)
-                    line = legendreq(line)
-                    line = polyeulergamma(line)
-                    line = product(line)
-                    line = qpochhammer(line)
-                    line = summation(line)
-
-                    line = convert_fraction(line)
-                    line = constraint(line)
-                    line = piecewise(line)
-                    line = replace_operators(line)
-                    line = replace_vars(line)
-
-                    if line != '':
-                        line += '\n%  \\mathematicatag{$\\tt{' + mtt + '}$}'
-                        try:
-                            line += '\n%  \\mathematicareference{$\\text{' + \
-                                    references[mtt] + '}$}'
-                        except KeyError:
-                            pass
-                        line = '  ' + line + '\n\\end{equation}'
+    global PROFILE
 
+    references = process_references(pathref)
+    if profile is not None:
+        if watchdog is not None:
+            raise ValueError('a profile cannot time lines converted by a'
+                             ' watchdog')
+        jobs = 1
+        PROFILE = profile
+
+    try:
+        with open(pathr, 'r') as mathematica, \
+                open(pathw, 'w', WRITE_BUFFER) as latex:
+            latex.write(HEADER)
+            offset = len(HEADER)
+
+            for tag, key, line in _iter_entries(mathematica, references, jobs,
+                                                cache, manifest, watchdog):
+                if verbose:
                     print line
-                    latex.write(line + '\n')
+                latex.write(line + '\n')
+                if key is not None:
+                    manifest.add(tag, key, offset, len(line))
+                offset += len(line) + 1
 
             latex.write('\n\n\\end{document}\n')
+    finally:
+        PROFILE = None
 
+    if manifest is not None:
+        manifest.save()
 
-# Open data/functions, and process the data into a comprehensible tuple that
-# gets fed into the "master_function" function
-with open(DIR_NAME + 'functions') as functions:
-    FUNCTION_CONVERSIONS = list(arg_split(line.replace(' ', ''), ',') for line
-                                in functions.read().split('\n')
-                                if (line != '' and '#' not in line))
 
-for index, item in enumerate(FUNCTION_CONVERSIONS):
-    FUNCTION_CONVERSIONS[index][2] = \
-        tuple(arg_split(FUNCTION_CONVERSIONS[index][2][1:-1], ','))
+def read_functions(path):
+    # (str) -> tuple
+    """
+    Reads the conversion templates from the 'functions' file.
 
-    if FUNCTION_CONVERSIONS[index][3] == '()':
-        FUNCTION_CONVERSIONS[index][3] = ''
-    else:
-        FUNCTION_CONVERSIONS[index][3] = \
-            tuple(FUNCTION_CONVERSIONS[index][3][1:-1].split(','))
+    :param path: path of the file
+    :returns: rows of the file, each a tuple containing the Mathematica
+              function, the equivalent LaTeX function, the formats, using "-"
+              as argument placings, and the exceptions, if any
+    """
+    with open(path) as functions:
+        rows = list(arg_split(line.replace(' ', ''), ',') for line
+                    in functions.read().split('\n')
+                    if (line != '' and '#' not in line))
+
+    for row in rows:
+        row[2] = tuple(arg_split(row[2][1:-1], ','))
+        row[3] = '' if row[3] == '()' else tuple(row[3][1:-1].split(','))
+
+    return tuple(tuple(row) for row in rows)
+
+
+def _escape(text):
+    # (str) -> str
+    """
+    Escapes the braces in a piece of a template, for 'str.format'.
+
+    :param text: piece of a template
+    :returns: escaped piece
+    """
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def _formats(latex, pieces):
+    # (str, list) -> tuple
+    """
+    Builds the format strings of a template: as it is, in parentheses, and
+    with the power of the call, the field 'power', after the LaTeX function.
 
-    FUNCTION_CONVERSIONS[index] = tuple(FUNCTION_CONVERSIONS[index])
+    :param latex: LaTeX function
+    :param pieces: format of the template, split at the argument placings
+    :returns: the three format strings, to be filled with the arguments
+    """
+    latex = _escape(latex)
+    body = _escape(pieces[0]) + ''.join('{%d}' % i + _escape(piece) for
+                                        i, piece in enumerate(pieces[1:]))
+    return latex + body, '(' + latex + body + ')', latex + '{power}' + body
 
-FUNCTION_CONVERSIONS = tuple(FUNCTION_CONVERSIONS)
+
+def compile_templates(rows):
+    # (tuple) -> dict
+    """
+    Compiles the templates of rows of FUNCTION_CONVERSIONS, for
+    'fill_template'. The first format with the right number of argument
+    placings is the one used for a call.
+
+    :param rows: rows of FUNCTION_CONVERSIONS
+    :returns: dictionary from (Mathematica function, number of arguments) to
+              the format strings of the call (see '_formats'), and those used
+              when the first argument of a trig function is more than one
+              variable, and "@@" becomes "@"
+    """
+    templates = {}
+    for row in rows:
+        m, l = row[:2]
+        trig = m in TRIG_OUTER or m in TRIG_INNER
+        for index, pieces in enumerate(i.split('-') for i in row[2]):
+            if (m, len(pieces) - 1) in templates:
+                continue
+
+            formats = _formats(l, pieces)
+            single = formats
+            if index == 0 and trig:
+                single = _formats(l, [pieces[0].replace('@@', '@')] +
+                                  pieces[1:])
+            templates[m, len(pieces) - 1] = formats, single
+
+    return templates
+
+
+def load_templates(path, cache_path):
+    # (str, str) -> tuple
+    """
+    Reads and compiles the 'functions' file, or loads them from the cache
+    when neither the file nor the converter have changed since it was
+    written.
+
+    :param path: path of the 'functions' file
+    :param cache_path: path of the cache
+    :returns: the rows of the file and their templates, see 'read_functions'
+              and 'compile_templates'
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime, stat.st_size, CODE_VERSION)
+    try:
+        with open(cache_path, 'rb') as cache:
+            cached = cPickle.load(cache)
+        if cached[0] == version:
+            return cached[1:]
+    except (IOError, EOFError, ValueError, TypeError, IndexError,
+            cPickle.UnpicklingError):
+        pass
+
+    rows = read_functions(path)
+    templates = compile_templates(rows)
+    try:
+        with open(cache_path + '.tmp', 'wb') as cache:
+            cPickle.dump((version, rows, templates), cache,
+                         cPickle.HIGHEST_PROTOCOL)
+        os.rename(cache_path + '.tmp', cache_path)
+    except (IOError, OSError):
+        pass
+
+    return rows, templates
+
+
+def _source_digest(*paths):
+    # (*str) -> str
+    """
+    Hashes the source code of modules, so that cached conversions are dropped
+    whenever the converter changes.
+
+    :param paths: paths of the modules, or of their compiled files
+    :returns: digest of the source
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(os.path.splitext(path)[0] + '.py') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+# Version of the converter, for 'load_templates', 'cache_key' and 'entry_key'
+CODE_VERSION = _source_digest(__file__, mathematica_parser.__file__)
+
+# The rows of data/functions, each a tuple that gets fed into the
+# "master_function" function, and their compiled templates
+FUNCTION_CONVERSIONS, TEMPLATES = load_templates(DIR_NAME + 'functions',
+                                                 TEMPLATES_PATH)
+
+# Calls converted by 'convert_functions', shared by every line, if set to a
+# ConversionMemo. Off by default: in Identities.m few calls repeat, and the
+# lookups cost more than the conversions they save
+MEMO = None
+
+# Lookup tables for 'convert_functions': the rows by function name, and every
+# name the parser has to recognize, mapped to whether it gets converted, along
+# with the matcher built from them
+ROWS = dict((item[0], item) for item in FUNCTION_CONVERSIONS)
+NAMES = dict((e, False) for e in SPECIAL_EXCEPTIONS)
+for item in FUNCTION_CONVERSIONS:
+    NAMES.update((e, False) for e in item[3] if e.isalnum())
+NAMES.update((name, True) for name in ROWS)
+NAMES.update((name, True) for name in SPECIAL_CONVERSIONS)
+MATCHER = HeadMatcher(NAMES)
+
+EQUALS_RULES = ((r'[!<>]?=+', _equals),)
+OPERATORS = Substitution(OPERATORS_TABLE.items() + PARENTHESES.items(),
+                         EQUALS_RULES)
+CONSTRAINT_OPERATORS = Substitution(OPERATORS_TABLE, EQUALS_RULES)
+VARIABLES = Substitution(_variables_table())
+# The variables that the operators leave alone, which can be replaced in the
+# same pass as them
+KEPT_VARIABLES = [(text, latex) for text, latex in VARIABLES.table.items()
+                  if CONSTRAINT_OPERATORS.sub(text) == text]
+OPERATORS_AND_VARIABLES = Substitution(
+    OPERATORS.table.items() + KEPT_VARIABLES, EQUALS_RULES)
+CONSTRAINT_OPERATORS_AND_VARIABLES = Substitution(
+    CONSTRAINT_OPERATORS.table.items() + KEPT_VARIABLES, EQUALS_RULES)
+
+# Version of every template, for 'cache_key' and 'entry_key'
+ROW_DIGESTS = tuple((item[0], hashlib.sha1(repr(item)).hexdigest())
+                    for item in FUNCTION_CONVERSIONS)
+TABLE_VERSION = hashlib.sha1(''.join(digest for _, digest in
+                                     ROW_DIGESTS)).hexdigest()
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(
+        description='Convert the Mathematica identities in Identities.m to'
+                    ' LaTeX in newIdentities.tex.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of processes converting identities;'
+                             ' 0 uses one per CPU')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='convert every identity, without reading or'
+                             ' writing the conversion cache')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='empty the conversion cache before converting')
+    parser.add_argument('--no-manifest', action='store_true',
+                        help='convert every identity, instead of copying the'
+                             ' unchanged ones from newIdentities.tex')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='print every converted line')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='write the time spent in every stage and'
+                             ' function, and on the slowest identities, to a'
+                             ' JSON report; identities taken from the cache'
+                             ' or the manifest are not timed')
+    parser.add_argument('--slowest', type=int, default=10,
+                        help='number of slowest identities in the report')
+    parser.add_argument('--memo', type=int, nargs='?', const=MEMO_SIZE,
+                        metavar='SIZE',
+                        help='keep up to SIZE converted function calls in'
+                             ' memory, to be reused wherever they appear'
+                             ' again (default: %(const)s)')
+    parser.add_argument('--budget', type=float, metavar='SECONDS',
+                        help='convert every identity in a worker process,'
+                             ' giving it SECONDS to finish; identities that'
+                             ' raise or run out of time are quarantined'
+                             ' instead of stopping the run')
+    parser.add_argument('--quarantine', metavar='PATH',
+                        default=QUARANTINE_PATH,
+                        help='JSON report of the quarantined identities,'
+                             ' with --budget (default: data/quarantine.json)')
+    args = parser.parse_args()
+    if args.budget is not None and args.profile:
+        parser.error('--profile cannot time identities converted with'
+                     ' --budget')
+
+    if args.memo:
+        MEMO = ConversionMemo(args.memo)
+    jobs = args.jobs or multiprocessing.cpu_count()
+    watchdog = None
+    if args.budget is not None:
+        watchdog = Watchdog(args.budget, jobs)
+    blocks = None
+    if not args.no_manifest:
+        blocks = OutputManifest(DIR_NAME + 'newIdentities.tex')
+    timings = None
+    if args.profile:
+        timings = ConversionProfile(args.slowest)
+    if args.no_cache:
+        main(jobs=jobs, verbose=args.verbose, manifest=blocks,
+             profile=timings, watchdog=watchdog)
+    else:
+        with ConversionCache(CACHE_PATH) as conversions:
+            if args.clear_cache:
+                conversions.clear()
+            main(jobs=jobs, cache=conversions, verbose=args.verbose,
+                 manifest=blocks, profile=timings, watchdog=watchdog)
+            sys.stderr.write('conversion cache: {0} hits, {1} misses\n'.format(
+                conversions.hits, conversions.misses))
+    if blocks is not None:
+        sys.stderr.write('manifest: {0} copied, {1} converted\n'.format(
+            blocks.hits, blocks.misses))
+    if MEMO is not None and jobs == 1 and watchdog is None:
+        sys.stderr.write('subexpressions: {0} reused, {1} converted\n'.format(
+            MEMO.hits, MEMO.misses))
+    if timings is not None:
+        timings.save(args.profile)
+    if watchdog is not None:
+        watchdog.save(args.quarantine)
+        sys.stderr.write('quarantined: {0} identities, see {1}\n'.format(
+            len(watchdog.faults), args.quarantine))
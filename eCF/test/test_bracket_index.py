@@ -0,0 +1,55 @@
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+from unittest import TestCase
+from mathematica_parser import (BracketIndex, LOOKUPS_BEFORE_INDEX,
+                                bracket_index, scan_close, scan_search,
+                                scan_split)
+
+LINE = 'f[a,(b+c)/d]+g[{x,y},z]'
+SIGN = list('*+-=,<>&')
+
+
+class TestBracketIndex(TestCase):
+
+    def test_tables(self):
+        index = BracketIndex('a[b(c)]d')
+        self.assertEqual(index.depth, [0, 0, 1, 1, 2, 2, 1, 0, 0])
+        self.assertEqual(index.partner, {1: 6, 6: 1, 3: 5, 5: 3})
+
+    def test_close(self):
+        index = BracketIndex(LINE)
+        for i in (1, 4, 14, 15):
+            self.assertEqual(index.close(i), scan_close(LINE, i))
+        self.assertEqual(index.close(1), 11)
+        self.assertEqual(index.close(0), 0)
+        self.assertEqual(BracketIndex('f[a').close(1), None)
+        self.assertEqual(scan_close('f[a', 1), None)
+
+    def test_split(self):
+        self.assertEqual(BracketIndex(LINE).split(','), [])
+        self.assertEqual(BracketIndex('a,f[b,c],{d,e}').split(','), [1, 8])
+        self.assertEqual(scan_split('a,f[b,c],{d,e}', ','), [1, 8])
+
+    def test_search(self):
+        index = BracketIndex(LINE)
+        self.assertEqual(index.search(9, SIGN, -1), 3)
+        self.assertEqual(index.search(9, SIGN, 1), 11)
+        self.assertEqual(index.search(12, SIGN, -1), -1)
+        self.assertEqual(index.search(12, SIGN, 1), len(LINE))
+        for i in range(len(LINE)):
+            for direction in (-1, 1):
+                self.assertEqual(index.search(i, SIGN, direction),
+                                 scan_search(LINE, i, SIGN, direction))
+        self.assertEqual(BracketIndex('a)b').search(2, SIGN, -1), None)
+        self.assertEqual(scan_search('a)b', 2, SIGN, -1), None)
+
+    def test_reuse(self):
+        line = 'f[a,' + 'b]'
+        for _ in range(LOOKUPS_BEFORE_INDEX):
+            self.assertEqual(bracket_index(line), None)
+        index = bracket_index(line)
+        self.assertEqual(index.line, line)
+        self.assertTrue(bracket_index('f[a,b]') is index)
+        self.assertEqual(bracket_index('f[a,c]'), None)
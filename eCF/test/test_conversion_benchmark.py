@@ -0,0 +1,35 @@
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+from unittest import TestCase
+from conversion_benchmark import compare, growth_exponent, run
+
+
+def size(depth, characters, seconds):
+    return {'depth': depth, 'lines': 10, 'characters': characters,
+            'seconds': seconds}
+
+
+class TestConversionBenchmark(TestCase):
+
+    def test_exponent(self):
+        linear = [size(1, 10.0, 1.0), size(2, 100.0, 10.0)]
+        quadratic = [size(1, 10.0, 1.0), size(2, 100.0, 100.0)]
+        self.assertAlmostEqual(growth_exponent(linear), 1.0)
+        self.assertAlmostEqual(growth_exponent(quadratic), 2.0)
+        self.assertEqual(growth_exponent(linear[:1]), None)
+
+    def test_compare(self):
+        baseline = {'sizes': [size(1, 10.0, 1.0), size(2, 100.0, 10.0)]}
+        report = {'sizes': [size(1, 10.0, 1.1), size(2, 100.0, 20.0),
+                            size(3, 500.0, 50.0)]}
+        self.assertEqual([(depth, regression) for depth, _, regression in
+                          compare(report, baseline)],
+                         [(1, False), (2, True)])
+
+    def test_run(self):
+        report = run(depths=(1, 2), count=5, repeat=1, seed=2)
+        self.assertEqual([s['depth'] for s in report['sizes']], [1, 2])
+        self.assertEqual(report['sizes'][0]['lines'], 10)
+        self.assertEqual(report['settings']['seed'], 2)
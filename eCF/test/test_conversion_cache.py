@@ -0,0 +1,111 @@
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+from unittest import TestCase
+from conversion_cache import (MANIFEST_SUFFIX, ConversionCache, ConversionMemo,
+                              OutputManifest)
+
+import mathematica_to_latex
+import os
+import tempfile
+
+
+class TestConversionCache(TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_lookup(self):
+        with ConversionCache(self.path) as cache:
+            self.assertEqual(cache.get('a'), None)
+            cache.put('a', '\\sin@@{x}')
+            self.assertEqual(cache.get('a'), '\\sin@@{x}')
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        with ConversionCache(self.path) as cache:
+            self.assertEqual(cache.get('a'), '\\sin@@{x}')
+            self.assertEqual(len(cache), 1)
+            cache.clear()
+            self.assertEqual(cache.get('a'), None)
+            self.assertEqual(len(cache), 0)
+
+    def test_key(self):
+        bessel = mathematica_to_latex.cache_key('BesselJ[n, z] == 1')
+        sin = mathematica_to_latex.cache_key('Sin[z] == 1')
+        self.assertNotEqual(bessel, sin)
+
+        digests = mathematica_to_latex.ROW_DIGESTS
+        try:
+            mathematica_to_latex.ROW_DIGESTS = tuple(
+                (name, 'edited' if name == 'BesselJ' else digest)
+                for name, digest in digests)
+            self.assertNotEqual(
+                mathematica_to_latex.cache_key('BesselJ[n, z] == 1'), bessel)
+            self.assertEqual(
+                mathematica_to_latex.cache_key('Sin[z] == 1'), sin)
+        finally:
+            mathematica_to_latex.ROW_DIGESTS = digests
+
+
+class TestOutputManifest(TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.tex')
+        os.close(handle)
+
+    def tearDown(self):
+        for path in (self.path, self.path + MANIFEST_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_blocks(self):
+        self.assertEqual(OutputManifest(self.path).get('a'), None)
+
+        with open(self.path, 'w') as generated:
+            generated.write('head\nblock a\nblock b\n')
+        manifest = OutputManifest(self.path)
+        manifest.add('tag a', 'a', 5, 7)
+        manifest.add('tag b', 'b', 13, 7)
+        manifest.save()
+
+        manifest = OutputManifest(self.path)
+        self.assertEqual(manifest.get('b'), 'block b')
+        self.assertEqual(manifest.get('c'), None)
+        self.assertEqual((manifest.hits, manifest.misses), (1, 1))
+
+    def test_changed(self):
+        with open(self.path, 'w') as generated:
+            generated.write('block a\n')
+        manifest = OutputManifest(self.path)
+        manifest.add('tag a', 'a', 0, 7)
+        manifest.save()
+
+        with open(self.path, 'w') as generated:
+            generated.write('block A\n')
+        self.assertEqual(OutputManifest(self.path).get('a'), None)
+
+
+class TestConversionMemo(TestCase):
+
+    def test_lookup(self):
+        memo = ConversionMemo(4)
+        self.assertEqual(memo.get('Gamma[z]'), None)
+        memo.put('Gamma[z]', ('\\EulerGamma@{z}', 8))
+        self.assertEqual(memo.get('Gamma[z]'), ('\\EulerGamma@{z}', 8))
+        self.assertEqual((memo.hits, memo.misses), (1, 1))
+        memo.clear()
+        self.assertEqual((len(memo), memo.hits, memo.misses), (0, 0, 0))
+
+    def test_size(self):
+        memo = ConversionMemo(4)
+        for key in 'abcdef':
+            memo.put(key, key.upper())
+            memo.get('a')
+        self.assertTrue(len(memo) <= 4)
+        self.assertEqual(memo.get('a'), 'A')
+        self.assertEqual(memo.get('b'), None)
@@ -0,0 +1,61 @@
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+from unittest import TestCase
+from conversion_profile import ConversionProfile
+from mathematica_to_latex import STAGES, main
+
+import json
+import os
+import tempfile
+
+PATHW = os.path.dirname(os.path.realpath(__file__)) + '/data/test.tex'
+PATHR = os.path.dirname(os.path.realpath(__file__)) + '/data/test.m'
+PATHREF = os.path.dirname(os.path.realpath(__file__)) + '/data/testref.txt'
+
+
+class TestConversionProfile(TestCase):
+
+    def test_timings(self):
+        profile = ConversionProfile(slowest=2)
+        profile.add_stage('carat', 1.0)
+        profile.add_stage('carat', 2.0)
+        profile.add_row('Sin', 0.5)
+        for seconds, line in ((1.0, 'a'), (3.0, 'b'), (2.0, 'c')):
+            profile.add_line(line, seconds)
+        profile.label('b', 'tag b')
+        profile.label('a', 'tag a')
+
+        report = profile.report()
+        self.assertEqual(report['stages'],
+                         [{'name': 'carat', 'seconds': 3.0, 'calls': 2}])
+        self.assertEqual(report['functions'],
+                         [{'name': 'Sin', 'seconds': 0.5, 'calls': 1}])
+        self.assertEqual(report['lines'],
+                         [{'tag': 'tag b', 'seconds': 3.0, 'line': 'b'},
+                          {'tag': None, 'seconds': 2.0, 'line': 'c'}])
+        self.assertEqual(report['total'], 3.0)
+
+    def test_main(self):
+        profile = ConversionProfile()
+        main(pathw=PATHW, pathr=PATHR, pathref=PATHREF, jobs=2,
+             profile=profile)
+
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            profile.save(path)
+            with open(path) as report:
+                report = json.load(report)
+        finally:
+            os.remove(path)
+
+        self.assertEqual([stage['name'] for stage in report['stages']],
+                         [name for name, _ in STAGES])
+        self.assertEqual([stage['calls'] for stage in report['stages']],
+                         [3] * len(STAGES))
+        self.assertEqual([line['line'] for line in report['lines']],
+                         ['equation', 'equation'])
+        self.assertEqual([line['tag'] for line in report['lines']],
+                         ['nodescription, number'] * 2)
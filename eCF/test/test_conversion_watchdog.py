@@ -0,0 +1,51 @@
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+from unittest import TestCase
+from conversion_watchdog import Fault, Watchdog
+
+import json
+import os
+import tempfile
+import time
+
+
+def convert(item):
+    if item == 'slow':
+        time.sleep(60)
+    if item == 'bad':
+        raise ValueError('bad line')
+    return item.upper()
+
+
+class TestWatchdog(TestCase):
+
+    def test_imap(self):
+        watchdog = Watchdog(1)
+        results = list(watchdog.imap(convert, ['a', 'bad', 'slow', 'b']))
+        self.assertEqual((results[0], results[3]), ('A', 'B'))
+        self.assertTrue(isinstance(results[1], Fault))
+        self.assertEqual(results[1].error, 'ValueError: bad line')
+        self.assertEqual(results[2].error, 'out of time after 1s')
+
+    def test_jobs(self):
+        items = ['a', 'slow', 'b', 'bad', 'c']
+        results = list(Watchdog(1, 2).imap(convert, items))
+        self.assertEqual([result for result in results
+                          if not isinstance(result, Fault)], ['A', 'B', 'C'])
+
+    def test_save(self):
+        watchdog = Watchdog(1)
+        watchdog.quarantine('a, 1', 'bad', Fault('ValueError: bad line', 0.5))
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            watchdog.save(path)
+            with open(path) as report:
+                self.assertEqual(json.load(report),
+                                 [{'tag': 'a, 1', 'line': 'bad',
+                                   'error': 'ValueError: bad line',
+                                   'seconds': 0.5}])
+        finally:
+            os.remove(path)
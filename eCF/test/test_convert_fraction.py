@@ -3,6 +3,7 @@ __author__ = 'Kevin Chen'
 __status__ = 'Development'
 
 from unittest import TestCase
+import mathematica_to_latex
 from mathematica_to_latex import convert_fraction
 
 
@@ -37,3 +38,12 @@ class TestConvertFraction(TestCase):
 
     def test_none(self):
         self.assertEqual(convert_fraction('nofraction'), 'nofraction')
+
+    def test_nested(self):
+        line = '1'
+        for k in range(mathematica_to_latex.IN_PLACE_LIMIT + 2):
+            line = 'a{0}+b{0}/({1})'.format(k, line)
+        self.assertEqual(convert_fraction(line),
+                         mathematica_to_latex._convert_fraction_in_place(line))
+        self.assertEqual(convert_fraction('a/(b+c/(d+e/(f)))'),
+                         '\\frac{a}{b+\\frac{c}{d+\\frac{e}{f}}}')
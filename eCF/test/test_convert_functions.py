@@ -0,0 +1,62 @@
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+from unittest import TestCase
+from conversion_cache import ConversionMemo
+from mathematica_to_latex import convert_functions
+
+import mathematica_to_latex
+
+
+class TestConvertFunctions(TestCase):
+
+    def test_mixed(self):
+        self.assertEqual(convert_functions('Sin[Gamma[a,z]]+Sqrt[Abs[x]]'),
+                         '\\sin@@{\\IncGamma@{a}{z}}+\\sqrt{\\abs{x}}')
+        self.assertEqual(convert_functions('zGamma[z]==Gamma[z+1]'),
+                         'z\\EulerGamma@{z}==\\EulerGamma@{z+1}')
+        self.assertEqual(convert_functions('Sum[QPochhammer[a,q,k],{k,0,n}]'),
+                         '\\Sum{k}{0}{n}@{\\qPochhammer{a}{q}{k}}')
+
+    def test_nested_gamma(self):
+        self.assertEqual(convert_functions('Gamma[Gamma[a,b,c],z]'),
+                         '\\IncGamma@{\\IncGamma@{a}{b} - '
+                         '\\IncGamma@{a}{c}}{z}')
+
+    def test_trig(self):
+        self.assertEqual(convert_functions('Sin[a+b]Sin[c]'),
+                         '\\sin@{a+b}\\sin@@{c}')
+        self.assertEqual(convert_functions('Cos[x]^{2}+ArcCos[x]^{2}'),
+                         '\\cos^{2}@@{x}+(\\acos@@{x})^{2}')
+        self.assertEqual(convert_functions('Tan[x]^{n+1}'),
+                         '(\\tan@@{x})^{n+1}')
+
+    def test_shadowed(self):
+        # Names that contain another name don't stop later conversions
+        self.assertEqual(convert_functions('Erfc[x]+Erf[y]'),
+                         '\\erfc@{x}+\\erf@{y}')
+        self.assertEqual(convert_functions('KroneckerDelta[a,b]D[f,x]'),
+                         '\\Kronecker{a}{b}\\deriv{f}{x}')
+        self.assertEqual(convert_functions('SphericalBesselI[n,z]'),
+                         'SphericalBesselI[n,z]')
+
+    def test_heads(self):
+        self.assertEqual(convert_functions('Gamma[Sin[x]]', ('Gamma',)),
+                         '\\EulerGamma@{Sin[x]}')
+
+    def test_none(self):
+        self.assertEqual(convert_functions('f[x]+\\[Gamma]'), 'f[x]+\\[Gamma]')
+
+    def test_memo(self):
+        mathematica_to_latex.MEMO = ConversionMemo(16)
+        try:
+            self.assertEqual(convert_functions('Sin[Gamma[z]]+Sin[x]^{2}'),
+                             '\\sin@@{\\EulerGamma@{z}}+\\sin^{2}@@{x}')
+            self.assertEqual(convert_functions('Gamma[z]Sin[x]+Sin[x]^{2}'),
+                             '\\EulerGamma@{z}\\sin@@{x}+\\sin^{2}@@{x}')
+            self.assertEqual(convert_functions('Gamma[z]', ('Gamma',)),
+                             '\\EulerGamma@{z}')
+            self.assertEqual(mathematica_to_latex.MEMO.hits, 2)
+        finally:
+            mathematica_to_latex.MEMO = None
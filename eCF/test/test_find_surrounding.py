@@ -6,3 +6,19 @@ from unittest import TestCase
 from mathematica_to_latex import find_surrounding
 
 
+class TestFindSurrounding(TestCase):
+
+    def test_find_surrounding(self):
+        self.assertEqual(find_surrounding('a+Sin[(x)]', 'Sin'), (2, 10))
+        self.assertEqual(find_surrounding('Sin[x]+Sin[y]', 'Sin', start=1),
+                         (7, 13))
+        self.assertEqual(find_surrounding('Sinx', 'Sin'), (0, 0))
+
+    def test_exceptions(self):
+        line = 'NotElement[x,Reals]&&NotElement[y,Reals]&&Element[z,Reals]'
+        self.assertEqual(find_surrounding(line, 'Element',
+                                          ex=('NotElement',)), [10, 10])
+        self.assertEqual(find_surrounding(line, 'Element', ex=('NotElement',),
+                                          start=10), [31, 31])
+        self.assertEqual(find_surrounding(line, 'Element', ex=('NotElement',),
+                                          start=31), (42, 58))
@@ -0,0 +1,30 @@
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+from unittest import TestCase
+from identity_generator import IdentityGenerator
+from mathematica_to_latex import convert_line
+
+
+class TestIdentityGenerator(TestCase):
+
+    def test_seed(self):
+        self.assertEqual(IdentityGenerator(seed=3).lines(5),
+                         IdentityGenerator(seed=3).lines(5))
+        self.assertNotEqual(IdentityGenerator(seed=3).lines(5),
+                            IdentityGenerator(seed=4).lines(5))
+
+    def test_heads(self):
+        generator = IdentityGenerator(heads=('Sin', 'HypergeometricPFQ'),
+                                      arguments=3)
+        self.assertEqual(sorted(generator.heads),
+                         [('HypergeometricPFQ', 3), ('Sin', 1)])
+        self.assertEqual(IdentityGenerator(arguments=0, depth=5).identity(),
+                         IdentityGenerator(arguments=0, depth=0).identity())
+
+    def test_lines(self):
+        lines = IdentityGenerator(seed=1, depth=4, constraints=3).lines(20)
+        self.assertEqual(lines[2], '(* {"Generated1", 1}*)')
+        for line in lines[1::2]:
+            self.assertTrue(convert_line(line).endswith('\\end{equation}'))
@@ -3,9 +3,13 @@ __author__ = 'Kevin Chen'
 __status__ = 'Development'
 
 from unittest import TestCase
-from mathematica_to_latex import main
+from conversion_cache import ConversionCache, OutputManifest
+from conversion_watchdog import Watchdog
+from mathematica_to_latex import convert_line, iter_convert, main
 
 import os
+import shutil
+import tempfile
 
 PATHW = os.path.dirname(os.path.realpath(__file__)) + '/data/test.tex'
 PATHR = os.path.dirname(os.path.realpath(__file__)) + '/data/test.m'
@@ -46,3 +50,101 @@ class TestMain(TestCase):
                     '\n'
                     '\n'
                     '\\end{document}\n'))
+
+    def test_parallel(self):
+        main(pathw=PATHW, pathr=PATHR, pathref=PATHREF)
+        with open(PATHW, 'r') as l:
+            serial = l.read()
+        main(pathw=PATHW, pathr=PATHR, pathref=PATHREF, jobs=2)
+        with open(PATHW, 'r') as l:
+            self.assertEqual(l.read(), serial)
+
+    def test_cache(self):
+        main(pathw=PATHW, pathr=PATHR, pathref=PATHREF)
+        with open(PATHW, 'r') as l:
+            uncached = l.read()
+
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        try:
+            for hits in (0, 3):
+                with ConversionCache(path) as cache:
+                    main(pathw=PATHW, pathr=PATHR, pathref=PATHREF,
+                         cache=cache)
+                    self.assertEqual((cache.hits, cache.misses),
+                                     (hits, 3 - hits))
+                with open(PATHW, 'r') as l:
+                    self.assertEqual(l.read(), uncached)
+        finally:
+            os.remove(path)
+
+
+    def test_manifest(self):
+        main(pathw=PATHW, pathr=PATHR, pathref=PATHREF)
+        with open(PATHW, 'r') as l:
+            full = l.read()
+
+        directory = tempfile.mkdtemp()
+        try:
+            pathw = os.path.join(directory, 'test.tex')
+            pathr = os.path.join(directory, 'test.m')
+            shutil.copy(PATHR, pathr)
+            for hits in (0, 2):
+                manifest = OutputManifest(pathw)
+                main(pathw=pathw, pathr=pathr, pathref=PATHREF,
+                     manifest=manifest)
+                self.assertEqual((manifest.hits, manifest.misses),
+                                 (hits, 2 - hits))
+                with open(pathw, 'r') as l:
+                    self.assertEqual(l.read(), full)
+
+            with open(pathr, 'a') as m:
+                m.write('\n(* {"new", number}*)\nPi\n')
+            manifest = OutputManifest(pathw)
+            main(pathw=pathw, pathr=pathr, pathref=PATHREF, manifest=manifest)
+            self.assertEqual((manifest.hits, manifest.misses), (2, 1))
+            with open(pathw, 'r') as l:
+                copied = l.read()
+            main(pathw=pathw, pathr=pathr, pathref=PATHREF)
+            with open(pathw, 'r') as l:
+                self.assertEqual(copied, l.read())
+        finally:
+            shutil.rmtree(directory)
+
+class TestLibrary(TestCase):
+
+    def test_iter_convert(self):
+        lines = ['(* "a, 1" *)\n', 'x==y\n', '', '(* "b, 2" *)', 'Pi']
+        self.assertEqual(
+            list(iter_convert(lines, {'a, 1': 'ref'})),
+            [('a, 1', '\\begin{equation}'),
+             ('a, 1', '  x = y\n%  \\mathematicatag{$\\tt{a, 1}$}\n'
+                      '%  \\mathematicareference{$\\text{ref}$}\n'
+                      '\\end{equation}'),
+             ('a, 1', ''),
+             ('b, 2', '\\begin{equation}'),
+             ('b, 2', '  \\pi\n%  \\mathematicatag{$\\tt{b, 2}$}\n'
+                      '\\end{equation}')])
+
+    def test_convert_line(self):
+        self.assertEqual(convert_line('(* "a" *)'), '\\begin{equation}')
+        self.assertEqual(convert_line('x==y'), '  x = y\n\\end{equation}')
+        self.assertEqual(convert_line('x', tag='t'),
+                         '  x\n%  \\mathematicatag{$\\tt{t}$}\n'
+                         '\\end{equation}')
+        self.assertEqual(convert_line(''), '')
+
+    def test_watchdog(self):
+        watchdog = Watchdog(5)
+        lines = ['(* "a, 1" *)', 'Gamma[a,Sin[z]==1', '(* "b, 2" *)', 'Pi']
+        self.assertEqual(
+            list(iter_convert(lines, watchdog=watchdog))[1:],
+            [('a, 1', '  %  quarantined: ValueError: unbalanced brackets'
+                      ' after Gamma\n%  \\mathematicatag{$\\tt{a, 1}$}\n'
+                      '\\end{equation}'),
+             ('b, 2', '\\begin{equation}'),
+             ('b, 2', '  \\pi\n%  \\mathematicatag{$\\tt{b, 2}$}\n'
+                      '\\end{equation}')])
+        self.assertEqual([fault[:3] for fault in watchdog.faults],
+                         [('a, 1', 'Gamma[a,Sin[z]==1',
+                           'ValueError: unbalanced brackets after Gamma')])
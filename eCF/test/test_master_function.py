@@ -3,8 +3,10 @@ __author__ = 'Kevin Chen'
 __status__ = 'Development'
 
 import os
+import shutil
+import tempfile
 from unittest import TestCase
-from mathematica_to_latex import master_function
+from mathematica_to_latex import load_templates, master_function
 from mathematica_to_latex import arg_split
 
 
@@ -108,3 +110,41 @@ class TestMasterFunction(TestCase):
     def test_none(self):
         for func in FUNCTION_CONVERSIONS:
             self.assertEqual(master_function('nofunction', func), 'nofunction')
+
+
+class TestTemplates(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'functions')
+        with open(self.path, 'w') as functions:
+            functions.write(' Sin,  \\sin,  (@@{-}),  ()\n'
+                            ' Beta, \\Beta, (@{-}{-},_{-}@{-}{-}), (Beta)\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_compile(self):
+        rows, templates = load_templates(self.path, self.path + '.cache')
+        self.assertEqual(rows[1], ('Beta', '\\Beta', ('@{-}{-}', '_{-}@{-}{-}'),
+                                   ('Beta',)))
+        self.assertEqual(templates['Sin', 1],
+                         (('\\sin@@{{{0}}}', '(\\sin@@{{{0}}})',
+                           '\\sin{power}@@{{{0}}}'),
+                          ('\\sin@{{{0}}}', '(\\sin@{{{0}}})',
+                           '\\sin{power}@{{{0}}}')))
+        self.assertEqual(templates['Beta', 3][0][0].format('x', 'a', 'b'),
+                         '\\Beta_{x}@{a}{b}')
+        self.assertEqual(templates['Beta', 2][0], templates['Beta', 2][1])
+
+    def test_cache(self):
+        compiled = load_templates(self.path, self.path + '.cache')
+        self.assertTrue(os.path.exists(self.path + '.cache'))
+        self.assertEqual(load_templates(self.path, self.path + '.cache'),
+                         compiled)
+
+        with open(self.path, 'a') as functions:
+            functions.write(' Cos,  \\cos,  (@@{-}),  ()\n')
+        rows, templates = load_templates(self.path, self.path + '.cache')
+        self.assertEqual(rows[2][0], 'Cos')
+        self.assertTrue(('Cos', 1) in templates)
@@ -0,0 +1,130 @@
+
+__author__ = 'Kevin Chen'
+__status__ = 'Development'
+
+from unittest import TestCase
+from mathematica_parser import (ExceptionSpans, HeadMatcher, Substitution,
+                                parse, read_expressions)
+
+NAMES = {'Gamma': True, 'Sin': True, 'Cos': True, 'ArcCos': True,
+         'LogGamma': False}
+
+
+class TestParse(TestCase):
+
+    def test_single(self):
+        calls = parse('Gamma[a,z]', NAMES)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0].head, 'Gamma')
+        self.assertEqual((calls[0].start, calls[0].end), (0, 10))
+        self.assertEqual(calls[0].args, [(6, 7), (8, 9)])
+        self.assertEqual(calls[0].children, [])
+
+    def test_nested(self):
+        calls = parse('Sin[Gamma[{a,b},c]]+Cos[x]', NAMES)
+        self.assertEqual([c.head for c in calls], ['Sin', 'Cos'])
+        self.assertEqual(calls[0].args, [(4, 18)])
+        self.assertEqual(calls[0].children[0].head, 'Gamma')
+        self.assertEqual(calls[0].children[0].args, [(10, 15), (16, 17)])
+        self.assertEqual(calls[1].args, [(24, 25)])
+
+    def test_unknown(self):
+        calls = parse('f[g[x,Sin[y]],z]', NAMES)
+        self.assertEqual([c.head for c in calls], ['Sin'])
+        self.assertEqual(calls[0].args, [(10, 11)])
+
+    def test_glued(self):
+        self.assertEqual([c.head for c in parse('zGamma[z]', NAMES)],
+                         ['Gamma'])
+        self.assertEqual([c.head for c in parse('2ArcCos[z]', NAMES)],
+                         ['ArcCos'])
+
+    def test_exceptions(self):
+        self.assertEqual(parse('LogGamma[z]', NAMES), [])
+        self.assertEqual(parse('\\[Gamma]+Gamma', NAMES), [])
+        self.assertEqual(parse('\\IncGamma@{a}{z}', NAMES), [])
+
+    def test_empty(self):
+        self.assertEqual(parse('Gamma[]', NAMES)[0].args, [(6, 6)])
+        self.assertEqual(parse('', NAMES), [])
+
+    def test_unbalanced(self):
+        self.assertRaises(ValueError, parse, 'Gamma[a,Sin[z]', NAMES)
+        self.assertEqual(parse('f[x', NAMES), [])
+
+
+class TestHeadMatcher(TestCase):
+
+    def test_find(self):
+        matcher = HeadMatcher(NAMES)
+        self.assertEqual(matcher.find('Sin[x]+zGamma[Cos[y]]'),
+                         [('Sin', 0), ('Gamma', 8), ('Cos', 14)])
+        self.assertEqual(matcher.find('ArcCos[x]+LogGamma[y]+Cos'),
+                         [('ArcCos', 0)])
+        self.assertEqual(matcher.heads('Sin[Sin[x]]+Gamma'), set(['Sin']))
+
+    def test_restrict(self):
+        matcher = HeadMatcher(NAMES).restrict(('Cos',))
+        self.assertEqual(matcher.find('Sin[Cos[x]]+ArcCos[y]'), [('Cos', 4)])
+        self.assertEqual([c.head for c in parse('ArcCos[Cos[x]]', matcher)],
+                         ['Cos'])
+
+    def test_no_names(self):
+        self.assertEqual(HeadMatcher({}).find('Gamma[z]'), [])
+        self.assertEqual(parse('Gamma[z]', {}), [])
+
+
+class TestExceptionSpans(TestCase):
+
+    def test_covering(self):
+        spans = ExceptionSpans('NotElement[x]&&Element[y]&&NotElement[z]',
+                               ('NotElement',))
+        self.assertEqual(spans.starts, [0, 27])
+        self.assertEqual(spans.covering(3, 10), 10)
+        self.assertEqual(spans.covering(30, 37), 37)
+        self.assertEqual(spans.covering(15, 22), None)
+        self.assertEqual(spans.covering(3, 10, lower=1), None)
+        self.assertEqual(ExceptionSpans('Element[y]', ()).covering(0, 7), None)
+
+
+class TestSubstitution(TestCase):
+
+    def test_longest(self):
+        substitution = Substitution({'a': 'b', 'ab': 'c', 'b': 'a'})
+        self.assertEqual(substitution.sub('abba'), 'cab')
+        self.assertEqual(substitution.sub('xyz'), 'xyz')
+
+    def test_rules(self):
+        substitution = Substitution({'-': '+'}, ((r'\d+', lambda n: n * 2),))
+        self.assertEqual(substitution.sub('1-23'), '11+2323')
+        self.assertEqual(Substitution({}).sub('abc'), 'abc')
+
+
+class TestReadExpressions(TestCase):
+
+    def test_single(self):
+        lines = ['(* {"a", 1}*)\n', 'Sin[x]==y\n', '\n', 'Pi']
+        self.assertEqual(list(read_expressions(lines)),
+                         ['(* {"a", 1}*)', 'Sin[x]==y', '', 'Pi'])
+
+    def test_wrapped(self):
+        lines = ['(* {"a", 1}*)', 'Sin[x,\n', '  y]==Gamma[\n', 'z]+\n',
+                 '1', 'Pi']
+        self.assertEqual(list(read_expressions(lines)),
+                         ['(* {"a", 1}*)', 'Sin[x,   y]==Gamma[ z]+ 1', 'Pi'])
+
+    def test_strings_and_comments(self):
+        lines = ['f["a[", (* ] *)', 'x]', '(* long', 'comment *)', 'y']
+        self.assertEqual(list(read_expressions(lines)),
+                         ['f["a[", (* ] *) x]', '(* long comment *)', 'y'])
+        self.assertEqual(list(read_expressions(['"\\"[" ]', 'x'])),
+                         ['"\\"[" ]', 'x'])
+
+    def test_limit(self):
+        self.assertEqual(list(read_expressions(['f[a', 'b', 'c', 'd'], 3)),
+                         ['f[a b', 'c', 'd'])
+        self.assertEqual(list(read_expressions(['f[a', 'b'])), ['f[a b'])
+
+    def test_unclosed(self):
+        lines = ['(* {"a", 1}*)', 'Gamma[a,Sin[z]==1', '(* {"b", 2}*)', 'Pi']
+        self.assertEqual(list(read_expressions(lines)), lines)
@@ -3,7 +3,7 @@ __author__ = 'Kevin Chen'
 __status__ = 'Development'
 
 from unittest import TestCase
-from mathematica_to_latex import replace_operators
+from mathematica_to_latex import replace_operators, replace_operators_and_vars
 
 
 class TestReplaceOperators(TestCase):
@@ -44,4 +44,18 @@ class TestReplaceOperators(TestCase):
 
     def test_none(self):
         self.assertEqual(replace_operators(''), '')
-        self.assertEqual(replace_operators('%'), '%')
\ No newline at end of file
+        self.assertEqual(replace_operators('%'), '%')
+
+    def test_equals(self):
+        self.assertEqual(replace_operators('==='), ' = = ')
+        self.assertEqual(replace_operators('!=='), ' \\ne ')
+        self.assertEqual(replace_operators('>==='), ' \\geq = ')
+        self.assertEqual(replace_operators('=!='), ' = \\ne ')
+
+    def test_with_vars(self):
+        self.assertEqual(replace_operators_and_vars('\\[Alpha]+Infinity'),
+                         '\\alpha + \\infty')
+        self.assertEqual(replace_operators_and_vars('\\[CapitalAlpha]*E'),
+                         'A \\expe')
+        self.assertEqual(replace_operators_and_vars('\\[Epsilon]-E'),
+                         '\\epsilon - \\expe')
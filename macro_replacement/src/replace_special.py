@@ -43,6 +43,9 @@ EQMIX_END = r'\end{equationmix}'
 
 STD_REGEX = r'.*?###open_(\d+)###.*?###close_\1###'
 
+# groups in which "i"s are left alone
+TEXT_PATS = [re.compile(r'\\text{.*?}'), re.compile(r'\\mathrm{.*?}'), re.compile(r'\\textrm{.*?}')]
+
 
 def main():
     if len(sys.argv) != 3:
@@ -321,49 +324,57 @@ def remove_special(content):
     return content
 
 
-# replaces "i"s as necessary in words
+# finds the groups in which "i"s are left alone, in order, joining the ones that overlap
+def _text_bounds(words):
+
+    bounds = []
+    for start, end in sorted((match.start(), match.end())
+                             for pat in TEXT_PATS for match in pat.finditer(words)):
+        if bounds and start < bounds[-1][1]:
+            bounds[-1] = (bounds[-1][0], max(end, bounds[-1][1]))
+        else:
+            bounds.append((start, end))
+
+    return bounds
+
+
+# replaces "i"s as necessary in words, in one pass from left to right
 def _replace_i(words):
-    text_pat = re.compile(r'\\text{.*?}')
-    mathrm_pat = re.compile(r'\\mathrm{.*?}')
-    textrm_pat = re.compile(r'\\textrm{.*?}')
+
+    text_bounds = iter(_text_bounds(words))
+    bound = next(text_bounds, None)
+
+    updated = []
+    last = 0
 
     iloc = words.find("i")
 
     # go through every occurence of "i" in the content
     while iloc != -1:
 
-        text_bounds = [(match.start(), match.end())
-                       for match in text_pat.finditer(words)]
-        mathrm_bounds = [(match.start(), match.end())
-                         for match in mathrm_pat.finditer(words)]
-        textrm_bounds = [(match.start(), match.end())
-                         for match in textrm_pat.finditer(words)]
-
-        avoid_bounds = text_bounds + mathrm_bounds + textrm_bounds
-        avoid_bounds = sorted(avoid_bounds)
-
-        # go through all the text/mathrm/label lines
-        for start, end in avoid_bounds:
+        while bound is not None and bound[1] <= iloc:
+            bound = next(text_bounds, None)
 
-            # if the "i" is in the \text tag, skip it
-            if start < iloc < end:
-                # print(avoid_bounds)
-                # print('START: {0:4}, ILOC: {1:4}, END: {2:4}'.format(start, iloc, end))
-                iloc = words.find("i", end + 1)
-                continue
+        # if the "i" is in a text/mathrm group, skip it, along with the
+        # character after the group
+        if bound is not None and bound[0] < iloc:
+            iloc = words.find("i", bound[1] + 1)
+            continue
 
-        if iloc == -1:
-            break
+        # the character before is the end of the last replacement if it was
+        # an "i" (and the last character of words for the first one)
+        before = updated[-1][-1] if last == iloc and updated else words[iloc - 1]
+        after = words[iloc + 1:iloc + 2]
 
         surrounding = ""
 
         # ensure "i" does not occur at the beginning of the string
         if iloc != 0:
-            surrounding += words[iloc - 1]
+            surrounding += before
 
         # ensure "i" does not occur at the end of the line
         if iloc != len(words) - 1:
-            surrounding += words[iloc + 1]
+            surrounding += after
 
         replacement = words[iloc]
 
@@ -372,25 +383,10 @@ def _replace_i(words):
         if not surrounding.isalpha():
 
             # avoids 'infty', 'is', 'it', 'in', 'instead', 'immediately'
-            if not (
-                ' ' in words[
-                    iloc -
-                    1] and (
-                    'nfty' in words[
-                        iloc +
-                        1:iloc +
-                        5] or 's' in words[
-                    iloc +
-                    1] or 't' in words[
-                        iloc +
-                        1] or 'n' in words[
-                            iloc +
-                            1]) or 'mmed' in words[
-                                iloc +
-                                1:iloc +
-                                5] or 'label{' in words[
-                                    iloc -
-                    6:iloc]):
+            if not (before == ' ' and (words.startswith('nfty', iloc + 1) or
+                                       after in ('s', 't', 'n') and after) or
+                    words.startswith('mmed', iloc + 1) or
+                    words.endswith('label{', 0, iloc)):
 
                 # one (but not both) of the surrounding characters IS
                 # alphabetic, may need to replace
@@ -413,12 +409,15 @@ def _replace_i(words):
 
                     replacement = r'\iunit'
 
-        # print("Surrounding: {0} - replacement made: {1}".format(surrounding, replacement != "i"))
-        words = words[:iloc] + replacement + words[iloc + 1:]
+        updated.append(words[last:iloc])
+        updated.append(replacement)
+        last = iloc + 1
+
+        iloc = words.find("i", last)
 
-        iloc = words.find("i", iloc + len(replacement))
+    updated.append(words[last:])
 
-    return words
+    return "".join(updated)
 
 
 if __name__ == "__main__":